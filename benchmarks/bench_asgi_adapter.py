@@ -0,0 +1,54 @@
+"""
+Latency and throughput of the generated app module with one ASGI adapter
+shared by every invocation (what the app does) against a new
+`func.AsgiMiddleware` built for every request (what it used to do).
+
+    python benchmarks/bench_asgi_adapter.py --concurrency 1,8,32 --requests 2000
+"""
+import argparse
+
+from stand_in import make_deployable, print_report
+
+from bentoctl_azfunctions.benchmark import InProcessHost, make_profile
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def use_middleware_per_request(app_module):
+    """Route the app's requests through a new AsgiMiddleware each time."""
+    import azure.functions as func
+
+    async def handle_with_new_middleware(req):
+        return await func.AsgiMiddleware(app_module.asgi_app).handle_async(req)
+
+    app_module._handle_asgi = handle_with_new_middleware
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    profile = make_profile("echo", body={"features": [5.1, 3.5, 1.4, 0.2]})
+    report = {"shared_adapter": [], "middleware_per_request": []}
+    with InProcessHost(make_deployable()) as host:
+        host.measure_cold_start(profile)
+        host.run(profile, 1, 20)
+        for concurrency in args.concurrency:
+            report["shared_adapter"].append(
+                host.run(profile, concurrency, args.requests)
+            )
+        use_middleware_per_request(host.app_module)
+        host.run(profile, 1, 20)
+        for concurrency in args.concurrency:
+            report["middleware_per_request"].append(
+                host.run(profile, concurrency, args.requests)
+            )
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
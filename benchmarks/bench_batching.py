@@ -0,0 +1,53 @@
+"""
+Throughput and latency of a synthetic CPU-bound API (`cpu` of the stand-in
+service) sent one record per request, with micro-batching off and on for its
+route (the `BENTOCTL_BATCHING_ROUTES` app setting).
+
+    python benchmarks/bench_batching.py --concurrency 1,8,32,64 --requests 2000
+"""
+import argparse
+import json
+
+from stand_in import make_deployable, print_report, run_benchmark_command
+
+RECORD = [0.1 * i for i in range(64)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--batch-max-size", type=int, default=32)
+    parser.add_argument("--batch-max-latency-ms", type=int, default=10)
+    args = parser.parse_args()
+
+    deployable_path = make_deployable()
+    command = [
+        "--route",
+        "cpu",
+        "--body",
+        json.dumps([RECORD]),
+        "--concurrency",
+        args.concurrency,
+        "--requests",
+        str(args.requests),
+    ]
+    batching_settings = {
+        "BENTOCTL_BATCH_MAX_SIZE": str(args.batch_max_size),
+        "BENTOCTL_BATCH_MAX_LATENCY_MS": str(args.batch_max_latency_ms),
+    }
+    report = {
+        "unbatched": run_benchmark_command(
+            deployable_path, command, env={"BENTOCTL_BATCHING_ROUTES": ""}
+        ),
+        "batched": run_benchmark_command(
+            deployable_path,
+            command,
+            env=dict(batching_settings, BENTOCTL_BATCHING_ROUTES="cpu"),
+        ),
+    }
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Startup time of the operator's commands, each run in a fresh interpreter
+the way bentoctl runs them: importing the operator, reading a bento's
+metadata with `get_metadata` (first call and cached), loading the full
+`bentoml.Bento` as it used to, and `generate`.
+
+    python benchmarks/bench_cli_startup.py --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from stand_in import REPO_ROOT, build_bento, print_report
+
+SPEC = {
+    "resource_group": "bench",
+    "acr_name": "bench",
+    "min_instances": 1,
+    "max_burst": 2,
+    "premium_plan_sku": "P1v2",
+}
+# name -> (setup, timed statement, teardown)
+CASES = {
+    "import": ("", "import bentoctl_azfunctions", ""),
+    "get_metadata": (
+        "",
+        "from bentoctl_azfunctions.utils import get_metadata\n"
+        "get_metadata(BENTO_PATH)",
+        "",
+    ),
+    "get_metadata_cached": (
+        "from bentoctl_azfunctions.utils import get_metadata\n"
+        "get_metadata(BENTO_PATH)",
+        "get_metadata(BENTO_PATH)",
+        "",
+    ),
+    "bento_from_fs": (
+        "",
+        "import fs\nfrom bentoml import Bento\nBento.from_fs(fs.open_fs(BENTO_PATH))",
+        "",
+    ),
+    "generate": (
+        "import shutil, tempfile\ndestination_dir = tempfile.mkdtemp()",
+        "from bentoctl_azfunctions import generate\n"
+        "generate('bench', SPEC, 'terraform', destination_dir)",
+        "shutil.rmtree(destination_dir)",
+    ),
+}
+CHILD = """\
+import json, sys, time
+BENTO_PATH, SPEC = {bento_path!r}, {spec!r}
+{setup}
+started_at = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started_at
+{teardown}
+sys.stderr.write(json.dumps(elapsed) + "\\n")
+"""
+
+
+def time_case(case, bento_path):
+    """Seconds the timed statement took and seconds the whole process took."""
+    setup, statement, teardown = CASES[case]
+    code = CHILD.format(
+        bento_path=bento_path,
+        spec=SPEC,
+        setup=setup,
+        statement=statement,
+        teardown=teardown,
+    )
+    started_at = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    process_seconds = time.perf_counter() - started_at
+    return json.loads(result.stderr.splitlines()[-1]), process_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--bento-path", help="Bento to read, the stand-in bento is built if unset."
+    )
+    args = parser.parse_args()
+
+    bento_path = args.bento_path or build_bento()
+    report = {"bento_path": bento_path, "runs": args.runs, "cases": {}}
+    for case in CASES:
+        timings = [time_case(case, bento_path) for _ in range(args.runs)]
+        report["cases"][case] = {
+            "median_ms": statistics.median(t for t, _ in timings) * 1000,
+            "median_process_ms": statistics.median(p for _, p in timings) * 1000,
+        }
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
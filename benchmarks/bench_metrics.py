@@ -0,0 +1,64 @@
+"""
+Overhead of the request metrics (the `BENTOCTL_ENABLE_METRICS` app setting)
+on the stand-in `echo` API, whose own cost is next to nothing: latency and
+throughput with the metrics off and on, and the relative difference.
+
+    python benchmarks/bench_metrics.py --concurrency 1,8,32 --requests 5000
+"""
+import argparse
+import json
+
+from stand_in import make_deployable, print_report, run_benchmark_command
+
+
+def overhead(without_metrics, with_metrics):
+    """Relative change of p50, p99 and throughput at every concurrency level."""
+    changes = []
+    for run_off, run_on in zip(without_metrics["runs"], with_metrics["runs"]):
+        latency_off, latency_on = run_off["latency_ms"], run_on["latency_ms"]
+        changes.append(
+            {
+                "concurrency": run_off["concurrency"],
+                "p50_change": latency_on["p50"] / latency_off["p50"] - 1,
+                "p99_change": latency_on["p99"] / latency_off["p99"] - 1,
+                "throughput_change": (
+                    run_on["throughput_rps"] / run_off["throughput_rps"] - 1
+                ),
+            }
+        )
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    deployable_path = make_deployable()
+    command = [
+        "--route",
+        "echo",
+        "--body",
+        json.dumps({"features": [5.1, 3.5, 1.4, 0.2]}),
+        "--concurrency",
+        args.concurrency,
+        "--requests",
+        str(args.requests),
+        "--warmup-requests",
+        "100",
+    ]
+    report = {
+        "metrics_off": run_benchmark_command(
+            deployable_path, command, env={"BENTOCTL_ENABLE_METRICS": "false"}
+        ),
+        "metrics_on": run_benchmark_command(
+            deployable_path, command, env={"BENTOCTL_ENABLE_METRICS": "true"}
+        ),
+    }
+    report["overhead"] = overhead(report["metrics_off"], report["metrics_on"])
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Throughput of large tensor payloads sent to a NumpyNdarray API
+(`column_means` of the stand-in service) as `application/x-npy`, decoded in
+place by the app module, against JSON, parsed by BentoML, for 1, 10 and
+100 MB arrays.
+
+`throughput_mb_s` of each run counts the bytes of the request body,
+`array_mb_s` the bytes of the array it holds, which is what both formats
+have in common.
+
+    python benchmarks/bench_numpy_payload.py --sizes-mb 1,10,100
+"""
+import argparse
+import io
+import json
+
+from stand_in import make_deployable, print_report
+
+from bentoctl_azfunctions.benchmark import InProcessHost, LoadProfile, make_profile
+
+COLUMNS = 256
+FORMATS = ["application/x-npy", "application/json"]
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def make_array(size_mb):
+    import numpy as np
+
+    rows = size_mb * (1 << 20) // (4 * COLUMNS)
+    return np.random.default_rng(0).random((rows, COLUMNS), dtype=np.float32)
+
+
+def encode(array, content_type):
+    import numpy as np
+
+    if content_type == "application/json":
+        return json.dumps(array.tolist()).encode("utf-8")
+    fp = io.BytesIO()
+    np.save(fp, array)
+    return fp.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=_int_list, default=[1, 10, 100])
+    parser.add_argument(
+        "--megabytes", type=int, default=200, help="Array data sent per run."
+    )
+    args = parser.parse_args()
+
+    report = {"runs": []}
+    with InProcessHost(make_deployable()) as host:
+        host.measure_cold_start(make_profile("echo", body={"warm": True}))
+        for size_mb in args.sizes_mb:
+            array = make_array(size_mb)
+            num_requests = max(3, args.megabytes // size_mb)
+            for content_type in FORMATS:
+                profile = LoadProfile(
+                    f"column_means-{size_mb}mb-{content_type.split('/')[1]}",
+                    "column_means",
+                    "POST",
+                    encode(array, content_type),
+                    content_type,
+                )
+                host.run(profile, 1, 1)
+                run = host.run(profile, 1, num_requests)
+                run["array_mb_s"] = run["throughput_rps"] * array.nbytes / 1e6
+                report["runs"].append(run)
+    report["peak_memory_bytes"] = host.peak_memory_bytes()
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
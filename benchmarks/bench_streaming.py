@@ -0,0 +1,109 @@
+"""
+Time to first byte and peak memory of a 100 MB response, streamed chunk by
+chunk (`stream_asgi`, what the streaming function of `function_app.py` uses)
+against buffered (`main`, the default function). Each mode runs in its own
+process so their peak RSS don't mix.
+
+    python benchmarks/bench_streaming.py --size-mb 100
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from stand_in import make_deployable, print_report
+
+from bentoctl_azfunctions.benchmark import InProcessHost, make_profile, peak_rss_bytes
+
+MODES = ["buffered", "streamed"]
+
+
+def current_rss_bytes():
+    with open("/proc/self/statm", "r") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * resource.getpagesize()
+
+
+async def fetch_buffered(host, route):
+    """The host only gets the response once the whole body is buffered."""
+    started_at = time.perf_counter()
+    status_code = await host.invoke(make_profile(route, method="GET"))
+    elapsed = time.perf_counter() - started_at
+    return status_code, elapsed, elapsed
+
+
+async def fetch_streamed(host, route):
+    started_at = time.perf_counter()
+    await host.app_module.gate(route)
+    status_code, _, body_iterator = await host.app_module.stream_asgi(
+        "GET", f"/{route}", b"", [], b""
+    )
+    first_byte_seconds = None
+    async for _ in body_iterator:
+        if first_byte_seconds is None:
+            first_byte_seconds = time.perf_counter() - started_at
+    return status_code, first_byte_seconds, time.perf_counter() - started_at
+
+
+def measure(deployable_path, mode, size_mb):
+    fetch = fetch_streamed if mode == "streamed" else fetch_buffered
+    with InProcessHost(deployable_path) as host:
+        host.measure_cold_start(make_profile("echo", body={"warm": True}))
+        rss_before = current_rss_bytes()
+        status_code, first_byte_seconds, total_seconds = host._loop.run_until_complete(
+            fetch(host, f"large/{size_mb}")
+        )
+    return {
+        "mode": mode,
+        "status_code": status_code,
+        "response_mb": size_mb,
+        "ttfb_ms": first_byte_seconds * 1000,
+        "total_ms": total_seconds * 1000,
+        "rss_before_bytes": rss_before,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "peak_rss_increase_bytes": peak_rss_bytes() - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--deployable-path", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        with open(args.output, "w") as f:
+            json.dump(measure(args.deployable_path, args.mode, args.size_mb), f)
+        return
+
+    deployable_path = make_deployable(streaming=True)
+    report = {}
+    for mode in MODES:
+        with tempfile.NamedTemporaryFile(suffix=".json") as report_file:
+            subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--mode",
+                    mode,
+                    "--deployable-path",
+                    deployable_path,
+                    "--size-mb",
+                    str(args.size_mb),
+                    "--output",
+                    report_file.name,
+                ],
+                check=True,
+            )
+            with open(report_file.name, "r") as f:
+                report[mode] = json.load(f)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
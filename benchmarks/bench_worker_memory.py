@@ -0,0 +1,114 @@
+"""
+Memory per worker process with model weights loaded into every process
+against memory-mapped (the `BENTOCTL_MMAP_MODELS` app setting), at 1, 2 and
+4 worker processes.
+
+Every worker imports the app, runs one request reading all the weights and
+stays up until all of them are measured. RSS counts the shared page cache
+pages in every worker, PSS splits them between the workers mapping them, so
+PSS is what each worker actually adds to the instance.
+
+    python benchmarks/bench_worker_memory.py --weights-mb 256 --workers 1,2,4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from stand_in import make_deployable, print_report
+
+from bentoctl_azfunctions.benchmark import InProcessHost, make_profile
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def write_weights(path, size_mb):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    np.save(path, rng.standard_normal(size_mb * (1 << 20) // 8))
+
+
+def memory_of(pid):
+    """Rss and Pss of a process in bytes, from /proc/<pid>/smaps_rollup."""
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss"):
+                memory[name.lower() + "_bytes"] = int(value.split()[0]) * 1024
+    return memory
+
+
+def serve(deployable_path):
+    """Worker: load the app, read the weights once, then wait to be measured."""
+    with InProcessHost(deployable_path) as host:
+        host.measure_cold_start(make_profile("weights", body={}))
+        sys.stdout.write("ready\n")
+        sys.stdout.flush()
+        sys.stdin.read()
+
+
+def measure(deployable_path, num_workers, env):
+    workers = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--serve", deployable_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            text=True,
+        )
+        for _ in range(num_workers)
+    ]
+    try:
+        for worker in workers:
+            # skip whatever the app prints while loading
+            for line in worker.stdout:
+                if line.strip() == "ready":
+                    break
+            else:
+                raise RuntimeError(f"Worker {worker.pid} failed to start")
+        per_worker = [memory_of(worker.pid) for worker in workers]
+    finally:
+        for worker in workers:
+            worker.stdin.close()
+            worker.wait()
+    return {
+        "workers": num_workers,
+        "per_worker": per_worker,
+        "total_pss_bytes": sum(memory["pss_bytes"] for memory in per_worker),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights-mb", type=int, default=256)
+    parser.add_argument("--workers", type=_int_list, default=[1, 2, 4])
+    parser.add_argument("--serve", metavar="DEPLOYABLE_PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    deployable_path = make_deployable()
+    report = {"weights_mb": args.weights_mb, "loaded": [], "memory_mapped": []}
+    with tempfile.TemporaryDirectory() as weights_dir:
+        weights_path = os.path.join(weights_dir, "weights.npy")
+        write_weights(weights_path, args.weights_mb)
+        for mode, mmap_models in [("loaded", "false"), ("memory_mapped", "true")]:
+            env = dict(
+                os.environ,
+                STAND_IN_WEIGHTS_PATH=weights_path,
+                BENTOCTL_MMAP_MODELS=mmap_models,
+            )
+            for num_workers in args.workers:
+                report[mode].append(measure(deployable_path, num_workers, env))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
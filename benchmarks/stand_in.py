@@ -0,0 +1,74 @@
+"""
+Helpers shared by the benchmarks: build the stand-in bento of
+`stand_in_service/`, generate its deployable with `create_deployable` and
+run the operator's benchmark harness (bentoctl_azfunctions.benchmark)
+against it.
+
+The benchmarks need bentoml, azure-functions and numpy installed locally.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+SERVICE_DIR = os.path.join(BENCHMARKS_DIR, "stand_in_service")
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def build_bento():
+    """Build the stand-in bento into the local bento store, return its path."""
+    import bentoml
+
+    bento = bentoml.bentos.build_bentofile("bentofile.yaml", build_ctx=SERVICE_DIR)
+    return bento.path
+
+
+def make_deployable(destination_dir=None, **build_options):
+    """
+    Generate the deployable of the stand-in bento, `build_options` are
+    passed to `create_deployable`. Returns the deployable's path.
+    """
+    from bentoctl_azfunctions.create_deployable import create_deployable
+    from bentoctl_azfunctions.utils import get_metadata
+
+    destination_dir = destination_dir or tempfile.mkdtemp(prefix="bentoctl-bench-")
+    bento_path = build_bento()
+    create_deployable(
+        bento_path, destination_dir, get_metadata(bento_path), **build_options
+    )
+    return os.path.join(destination_dir, "bentoctl_deployable")
+
+
+def run_benchmark_command(deployable_path, args, env=None):
+    """
+    Run `python -m bentoctl_azfunctions benchmark` in a fresh process and
+    return its report. The app module reads its settings once per process,
+    so every configuration gets its own.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".json") as report_file:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "bentoctl_azfunctions",
+                "--output",
+                report_file.name,
+                "benchmark",
+                deployable_path,
+                *args,
+            ],
+            env=dict(os.environ, **(env or {})),
+            cwd=REPO_ROOT,
+            check=True,
+        )
+        with open(report_file.name, "r") as f:
+            return json.load(f)
+
+
+def print_report(report):
+    sys.stdout.write(json.dumps(report, indent=2, default=str) + "\n")
@@ -0,0 +1,74 @@
+"""
+Synthetic service the benchmarks build into a stand-in bento. Except for
+`cpu`, `weights` and `column_means`, its APIs cost next to nothing, so the
+benchmarks measure the generated function app rather than a model.
+"""
+import os
+
+import bentoml
+import numpy as np
+from bentoml.io import JSON, NumpyNdarray
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+svc = bentoml.Service("bentoctl_stand_in")
+
+
+@svc.api(input=JSON(), output=JSON())
+def echo(payload):
+    return payload
+
+
+N_FEATURES = 64
+_rng = np.random.default_rng(0)
+# a small dense network, its cost per call is what batching amortizes
+_LAYERS = [_rng.standard_normal((N_FEATURES, N_FEATURES)) for _ in range(8)]
+
+
+@svc.api(input=JSON(), output=JSON())
+def cpu(records):
+    """Synthetic CPU-bound API taking a list of records of N_FEATURES floats."""
+    activations = np.asarray(records, dtype=np.float64)
+    for layer in _LAYERS:
+        activations = np.tanh(activations @ layer)
+    return activations.sum(axis=1).tolist()
+
+
+LARGE_BODY_CHUNK = b"\0" * (1 << 20)
+
+
+async def large_body(request):
+    """A body of `size_mb` MB, produced one megabyte at a time."""
+    size_mb = request.path_params["size_mb"]
+
+    async def chunks():
+        for _ in range(size_mb):
+            yield LARGE_BODY_CHUNK
+
+    return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+
+svc.mount_asgi_app(
+    Starlette(routes=[Route("/{size_mb:int}", large_body)]), path="/large"
+)
+
+
+# model weights for the memory benchmark, loaded when the service is, the
+# way a runner would load them
+WEIGHTS_PATH = os.environ.get("STAND_IN_WEIGHTS_PATH")
+_weights = np.load(WEIGHTS_PATH) if WEIGHTS_PATH else None
+
+
+@svc.api(input=JSON(), output=JSON())
+def weights(payload):
+    """Reads every weight, as a forward pass over the whole model would."""
+    if _weights is None:
+        return None
+    return float(_weights.sum())
+
+
+@svc.api(input=NumpyNdarray(dtype="float32", enforce_dtype=True), output=JSON())
+def column_means(array):
+    """Takes a 2-d array, in .npy or JSON, and reads all of it once."""
+    return array.mean(axis=0).tolist()
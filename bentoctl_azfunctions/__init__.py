@@ -1,10 +1,46 @@
-from .generate import generate
-from .create_deployable import create_deployable
-from .registry_utils import create_repository, delete_repository
+import importlib
+import sys
+import types
+
+# The operator's entry points are imported on first access (PEP 562) so that
+# a command only pays for the modules it uses, e.g. `bentoctl generate`
+# never imports docker.
+_LAZY_ATTRIBUTES = {
+    "generate": ".generate",
+    "create_deployable": ".create_deployable",
+    "create_repository": ".registry_utils",
+    "delete_repository": ".registry_utils",
+}
 
 __all__ = [
     "generate",
     "create_deployable",
-    "create_repository", 
+    "create_repository",
     "delete_repository"
 ]
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+class _OperatorModule(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing the `generate` or `create_deployable` submodule sets it as
+        # an attribute of the package, which would hide the function of the
+        # same name. Keep resolving the function instead.
+        if name in _LAZY_ATTRIBUTES and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _OperatorModule
@@ -0,0 +1,284 @@
+"""
+Command line tools of the operator that work on a generated deployable.
+
+    python -m bentoctl_azfunctions benchmark ./bentoctl_deployable \
+        --route classify --body '[[5.1, 3.5, 1.4, 0.2]]' --concurrency 1,8
+
+    python -m bentoctl_azfunctions plan-capacity ./bentoctl_deployable \
+        --route classify --body '[[5.1, 3.5, 1.4, 0.2]]' \
+        --target-rps 200 --latency-slo-ms 250 --tfvars bentoctl.tfvars
+
+    python -m bentoctl_azfunctions rollout deployments.yaml \
+        --bento-path ~/bentoml/bentos/iris_classifier/latest \
+        --destination-dir ./rollout --fast-start --prewarm
+"""
+import argparse
+import json
+import sys
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def add_benchmark_arguments(parser):
+    parser.add_argument("deployable_path", help="Path to the generated deployable.")
+    parser.add_argument(
+        "--profiles",
+        help="JSON file with a list of load profiles (route, method, body...).",
+    )
+    parser.add_argument("--route", help="API route to load when --profiles is unset.")
+    parser.add_argument("--method", default="POST")
+    parser.add_argument("--body", help="Request body.")
+    parser.add_argument("--body-file", help="File holding the request body.")
+    parser.add_argument(
+        "--content-type",
+        help="Defaults to application/x-npy for .npy body files, JSON otherwise.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=_int_list,
+        default=[1],
+        help="Comma separated concurrency levels to run every profile at.",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=100, help="Requests per concurrency level."
+    )
+    parser.add_argument("--warmup-requests", type=int, default=5)
+    parser.add_argument(
+        "--docker",
+        action="store_true",
+        help="Build and run the deployable's image instead of importing the app.",
+    )
+
+
+def get_profiles(args):
+    from .benchmark import load_profiles, make_profile
+
+    if args.profiles:
+        return load_profiles(args.profiles)
+    if args.route is None:
+        raise SystemExit("Either --profiles or --route is required.")
+    return [
+        make_profile(
+            args.route,
+            method=args.method,
+            body=args.body,
+            body_file=args.body_file,
+            content_type=args.content_type,
+        )
+    ]
+
+
+def benchmark_command(args):
+    from .benchmark import run_benchmark
+
+    return run_benchmark(
+        args.deployable_path,
+        get_profiles(args),
+        concurrency_levels=args.concurrency,
+        num_requests=args.requests,
+        warmup_requests=args.warmup_requests,
+        use_docker=args.docker,
+    )
+
+
+def add_capacity_arguments(parser):
+    add_benchmark_arguments(parser)
+    parser.set_defaults(concurrency=[1, 2, 4, 8, 16, 32])
+    parser.add_argument(
+        "--target-rps",
+        type=float,
+        required=True,
+        help="Request rate the deployment has to sustain.",
+    )
+    parser.add_argument(
+        "--peak-rps",
+        type=float,
+        help="Request rate to burst up to, twice --target-rps by default.",
+    )
+    parser.add_argument(
+        "--latency-slo-ms",
+        type=float,
+        required=True,
+        help="p95 latency every request rate has to stay within.",
+    )
+    parser.add_argument(
+        "--skus",
+        type=lambda value: [sku.strip() for sku in value.split(",") if sku.strip()],
+        help="Comma separated premium plan SKUs to plan for, all by default.",
+    )
+    parser.add_argument(
+        "--tfvars",
+        help="Write the recommended plan into this generated bentoctl.tfvars.",
+    )
+
+
+def capacity_command(args):
+    from .capacity import plan_capacity, write_plan_to_values
+
+    report = plan_capacity(
+        args.deployable_path,
+        get_profiles(args),
+        target_rps=args.target_rps,
+        latency_slo_ms=args.latency_slo_ms,
+        peak_rps=args.peak_rps,
+        skus=args.skus,
+        concurrency_levels=args.concurrency,
+        num_requests=args.requests,
+        warmup_requests=args.warmup_requests,
+        use_docker=args.docker,
+    )
+    if report["recommended"] is None:
+        sys.stderr.write("No concurrency level met the latency SLO.\n")
+    elif args.tfvars:
+        write_plan_to_values(report["recommended"], args.tfvars)
+        sys.stderr.write(f"Recommended plan written to {args.tfvars}\n")
+    return report
+
+
+def add_rollout_arguments(parser):
+    parser.add_argument(
+        "deployments_file", help="YAML or JSON list of deployment names and specs."
+    )
+    parser.add_argument(
+        "--destination-dir",
+        default=".",
+        help="Directory the deployable and one directory per deployment go to.",
+    )
+    parser.add_argument(
+        "--bento-path",
+        help="Build and push the bento's image once for every deployment. "
+        "Only the template files are generated when unset.",
+    )
+    parser.add_argument(
+        "--no-push",
+        action="store_true",
+        help="Build and tag the image without pushing it.",
+    )
+    parser.add_argument(
+        "--with-template",
+        action="store_true",
+        help="Also generate main.tf for every deployment, not only the values.",
+    )
+    parser.add_argument("--max-workers", type=int, default=8)
+    build_options = parser.add_argument_group(
+        "build options", "How the deployable is created with --bento-path."
+    )
+    build_options.add_argument(
+        "--fast-start",
+        action="store_true",
+        help="Load the bento in a background thread when the worker starts.",
+    )
+    build_options.add_argument(
+        "--use-buildkit",
+        action="store_true",
+        help="Use BuildKit cache mounts for the pip and conda downloads.",
+    )
+    build_options.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Stream response bodies, the specs need enable_streaming.",
+    )
+    build_options.add_argument(
+        "--prewarm",
+        action="store_true",
+        help="Load the runners and byte-compile the code at build time.",
+    )
+    build_options.add_argument(
+        "--slim-base-image",
+        action="store_true",
+        help="Build on the -slim variant of the Functions base image.",
+    )
+    build_options.add_argument(
+        "--per-api-functions",
+        action="store_true",
+        help="Declare a function for each API of the bento.",
+    )
+    build_options.add_argument(
+        "--batch-jobs",
+        action="store_true",
+        help="Add the queue-triggered batch jobs function.",
+    )
+
+
+BUILD_OPTIONS = [
+    "fast_start",
+    "use_buildkit",
+    "streaming",
+    "prewarm",
+    "slim_base_image",
+    "per_api_functions",
+    "batch_jobs",
+]
+
+
+def rollout_command(args):
+    from .rollout import StageTimer, build_all, generate_all, load_deployments
+
+    deployments = load_deployments(args.deployments_file)
+    if args.bento_path:
+        return build_all(
+            args.bento_path,
+            args.destination_dir,
+            deployments,
+            build_options={name: getattr(args, name) for name in BUILD_OPTIONS},
+            push=not args.no_push,
+            values_only=not args.with_template,
+            max_workers=args.max_workers,
+        )
+
+    timer = StageTimer()
+    generated_files = generate_all(
+        deployments,
+        args.destination_dir,
+        values_only=not args.with_template,
+        max_workers=args.max_workers,
+        timer=timer,
+    )
+    return {
+        "deployments": [
+            {"name": name, "files": files} for name, files in generated_files.items()
+        ],
+        "timings": timer.timings,
+        "total_seconds": timer.total(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bentoctl_azfunctions")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    benchmark_parser = subparsers.add_parser(
+        "benchmark", help="Load test a deployable locally."
+    )
+    add_benchmark_arguments(benchmark_parser)
+    benchmark_parser.set_defaults(handler=benchmark_command)
+
+    capacity_parser = subparsers.add_parser(
+        "plan-capacity",
+        help="Size the instances of a deployment from a local load test.",
+    )
+    add_capacity_arguments(capacity_parser)
+    capacity_parser.set_defaults(handler=capacity_command)
+
+    rollout_parser = subparsers.add_parser(
+        "rollout",
+        help="Generate (and build) many deployments of one bento at once.",
+    )
+    add_rollout_arguments(rollout_parser)
+    rollout_parser.set_defaults(handler=rollout_command)
+
+    args = parser.parse_args(argv)
+    report = args.handler(args)
+    report_json = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report_json + "\n")
+    else:
+        sys.stdout.write(report_json + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+A small client for the Azure Resource Manager and Azure Container Registry
+REST endpoints used by registry_utils. It avoids starting the Azure CLI (and
+paying its import cost) for every registry operation.
+
+The client authenticates as a service principal configured through the
+standard environment variables:
+
+    AZURE_TENANT_ID, AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, AZURE_SUBSCRIPTION_ID
+
+`AZURE_AUTHORITY_HOST`, `AZURE_RESOURCE_MANAGER_ENDPOINT` and
+`BENTOCTL_ACR_ENDPOINT` (a template with an `{acr_name}` field) override the
+endpoints, e.g. to point the client at a local stub server.
+"""
+import base64
+import json
+import os
+import threading
+import time
+
+from bentoctl.exceptions import BentoctlException
+
+DEFAULT_AUTHORITY_HOST = "https://login.microsoftonline.com"
+DEFAULT_ARM_ENDPOINT = "https://management.azure.com"
+DEFAULT_ACR_ENDPOINT = "https://{acr_name}.azurecr.io"
+ACR_API_VERSION = "2021-09-01"
+REQUEST_TIMEOUT = 30
+# tokens are refreshed this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 60
+# used when the expiry of an ACR refresh token cannot be read from it
+DEFAULT_ACR_TOKEN_LIFETIME = 600
+
+CREDENTIAL_ENV_VARS = {
+    "tenant_id": "AZURE_TENANT_ID",
+    "client_id": "AZURE_CLIENT_ID",
+    "client_secret": "AZURE_CLIENT_SECRET",
+    "subscription_id": "AZURE_SUBSCRIPTION_ID",
+}
+
+
+def _jwt_expiry(token):
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, ValueError):
+        return time.time() + DEFAULT_ACR_TOKEN_LIFETIME
+
+
+class AzureRestClient:
+    def __init__(
+        self,
+        tenant_id,
+        client_id,
+        client_secret,
+        subscription_id,
+        authority_host=DEFAULT_AUTHORITY_HOST,
+        arm_endpoint=DEFAULT_ARM_ENDPOINT,
+        acr_endpoint=DEFAULT_ACR_ENDPOINT,
+    ):
+        import requests
+
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.subscription_id = subscription_id
+        self.authority_host = authority_host.rstrip("/")
+        self.arm_endpoint = arm_endpoint.rstrip("/")
+        self.acr_endpoint = acr_endpoint.rstrip("/")
+
+        # one pooled session (keep-alive connections) for every request
+        self.session = requests.Session()
+        self._tokens = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Create a client from the environment, returns None when no service
+        principal credentials are configured.
+        """
+        credentials = {
+            name: os.environ.get(env_var)
+            for name, env_var in CREDENTIAL_ENV_VARS.items()
+        }
+        if not all(credentials.values()):
+            return None
+        return cls(
+            **credentials,
+            authority_host=os.environ.get(
+                "AZURE_AUTHORITY_HOST", DEFAULT_AUTHORITY_HOST
+            ),
+            arm_endpoint=os.environ.get(
+                "AZURE_RESOURCE_MANAGER_ENDPOINT", DEFAULT_ARM_ENDPOINT
+            ),
+            acr_endpoint=os.environ.get("BENTOCTL_ACR_ENDPOINT", DEFAULT_ACR_ENDPOINT),
+        )
+
+    def _request(self, method, url, **kwargs):
+        response = self.session.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+        if response.status_code >= 400:
+            raise BentoctlException(
+                f"Azure request {method} {url} failed with "
+                f"{response.status_code}: {response.text}"
+            )
+        return response.json()
+
+    def _cached_token(self, key, fetch_token):
+        """
+        Return the cached token for `key` or fetch a new one with
+        `fetch_token()`, which returns a (token, expires_at) tuple.
+        """
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached is not None and cached[1] - TOKEN_EXPIRY_MARGIN > time.time():
+                return cached[0]
+            token, expires_at = fetch_token()
+            self._tokens[key] = (token, expires_at)
+            return token
+
+    def get_arm_token(self):
+        def fetch_token():
+            body = self._request(
+                "POST",
+                f"{self.authority_host}/{self.tenant_id}/oauth2/v2.0/token",
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "scope": f"{self.arm_endpoint}/.default",
+                },
+            )
+            return body["access_token"], time.time() + float(body["expires_in"])
+
+        return self._cached_token("arm", fetch_token)
+
+    def get_registry(self, acr_name, resource_group):
+        url = (
+            f"{self.arm_endpoint}/subscriptions/{self.subscription_id}"
+            f"/resourceGroups/{resource_group}"
+            f"/providers/Microsoft.ContainerRegistry/registries/{acr_name}"
+        )
+        return self._request(
+            "GET",
+            url,
+            params={"api-version": ACR_API_VERSION},
+            headers={"Authorization": f"Bearer {self.get_arm_token()}"},
+        )
+
+    def is_admin_user_enabled(self, acr_name, resource_group):
+        registry = self.get_registry(acr_name, resource_group)
+        return registry["properties"]["adminUserEnabled"]
+
+    def get_acr_refresh_token(self, acr_name):
+        """
+        Exchange the ARM token for an ACR refresh token, the same token
+        `az acr login --expose-token` returns.
+        """
+
+        def fetch_token():
+            body = self._request(
+                "POST",
+                f"{self.acr_endpoint.format(acr_name=acr_name)}/oauth2/exchange",
+                data={
+                    "grant_type": "access_token",
+                    "service": f"{acr_name}.azurecr.io",
+                    "tenant": self.tenant_id,
+                    "access_token": self.get_arm_token(),
+                },
+            )
+            token = body["refresh_token"]
+            return token, _jwt_expiry(token)
+
+        return self._cached_token(f"acr:{acr_name}", fetch_token)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_rest_client():
+    """
+    Return the shared AzureRestClient, or None if no credentials are
+    configured and the Azure CLI should be used instead.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = AzureRestClient.from_env()
+        return _client
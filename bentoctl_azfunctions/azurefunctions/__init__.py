@@ -1,54 +1,6 @@
-import os
 import re
-import shutil
 
-from ..utils import run_shell_command, get_metadata
-
-
-def generate_azure_function_deployable(
-    bento_path, deployable_path, function_auth_level
-):
-    current_dir_path = os.path.dirname(__file__)
-    bento_metadata = get_metadata(bento_path)
-
-    # copy the host.json
-    shutil.copytree(bento_path, deployable_path)
-    shutil.copy(
-        os.path.join(current_dir_path, "host.json"),
-        os.path.join(deployable_path, "host.json"),
-    )
-
-    # copy local.settings.json
-    shutil.copy(
-        os.path.join(current_dir_path, "local.settings.json"),
-        os.path.join(deployable_path, "local.settings.json"),
-    )
-
-    # Make docker file with dockerfile template
-    template_file = os.path.join(current_dir_path, "Dockerfile")
-    dockerfile = os.path.join(deployable_path, "Dockerfile")
-    with open(template_file, "r", encoding="utf-8") as f:
-        dockerfile_template = f.read()
-    with open(dockerfile, "w") as dockerfile:
-        dockerfile.write(
-            dockerfile_template.format(
-                bentoml_version=bento_metadata["bentoml_version"],
-                python_version=bento_metadata["python_version"],
-            )
-        )
-
-    app_path = os.path.join(deployable_path, "app")
-    os.mkdir(app_path)
-    shutil.copy(
-        os.path.join(current_dir_path, "app_init.py"),
-        os.path.join(app_path, "__init__.py"),
-    )
-
-    # copy the function.json file that specifies config for the function
-    shutil.copy(
-        os.path.join(current_dir_path, "function.json"),
-        os.path.join(app_path, "function.json"),
-    )
+from ..utils import run_shell_command
 
 
 def set_cors_settings(function_name, resource_group_name):
@@ -1,17 +1,763 @@
+import asyncio
+import inspect
+import json
 import logging
 import os
 import sys
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+_import_started_at = time.perf_counter()
 
-from bentoml import load
-from bentoml._internal.configuration.containers import DeploymentContainer
 import azure.functions as func
 
+from . import batch_jobs, model_mmap, numpy_wire
+from .batching import BatchError, MicroBatcher
+from .metrics import RequestMetrics, instrument_asgi_app, request_started_at
+from .response_cache import (
+    CachedResponse,
+    LRUCache,
+    ResponseCache,
+    make_key,
+    make_shared_store,
+    parse_cache_control,
+    response_ttl,
+)
+
+
+SETTINGS_FILE = os.path.join(os.path.dirname(__file__), "bentoctl_settings.json")
+DEFAULT_SETTINGS = {
+    # load the bento in a background thread so the worker comes up right away
+    "fast_start": False,
+    # seconds a request waits for the bento to finish loading in fast start mode
+    "ready_timeout": 120.0,
+    # comma separated API routes whose requests are micro-batched
+    "batching_routes": "",
+    # longest time (in milliseconds) a request waits for its batch to fill up
+    "batch_max_latency_ms": 10,
+    # most records sent to the API in one batch
+    "batch_max_size": 32,
+    # record per route latency histograms and serve them on /metrics
+    "enable_metrics": False,
+    # load model weights from memory-mapped files shared by worker processes
+    "mmap_models": False,
+    # comma separated `route=limit` pairs, the most requests of an API one
+    # worker process runs at once
+    "api_concurrency_limits": "",
+    # routes of the functions generated for each API, keyed by function name
+    "function_routes": {},
+    # off, local (in-process LRU only), redis or blob (with a shared tier)
+    "response_cache": "off",
+    # comma separated API routes whose responses are cached, empty for all
+    "response_cache_routes": "",
+    # most responses kept in the in-process tier of each worker
+    "response_cache_size": 1024,
+    # longest time (in seconds) a response is cached for
+    "response_cache_ttl": 300,
+    # redis URL or blob storage connection string of the shared tier
+    "response_cache_url": "",
+    # records sent to the API in one batch by queue-triggered batch jobs
+    "batch_job_size": 256,
+    # decode application/x-npy request bodies of NumpyNdarray APIs in place
+    "binary_numpy": True,
+}
+
+
+def _coerce_setting(value, default):
+    if isinstance(default, bool):
+        return value.lower() in ["1", "true", "yes", "y"]
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    if isinstance(default, dict):
+        return json.loads(value)
+    return value
+
+
+def load_settings():
+    """
+    Settings are generated next to this module by bentoctl and can be
+    overridden at runtime with `BENTOCTL_<NAME>` app settings.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(SETTINGS_FILE):
+        with open(SETTINGS_FILE, "r") as settings_file:
+            settings.update(json.load(settings_file))
+    for name, default in DEFAULT_SETTINGS.items():
+        env_value = os.environ.get(f"BENTOCTL_{name.upper()}")
+        if env_value is not None and env_value != "":
+            settings[name] = _coerce_setting(env_value, default)
+    return settings
+
+
+def _parse_concurrency_limits(value):
+    """
+    `route=limit` pairs of the api_concurrency_limits setting. Malformed
+    pairs are skipped with a warning, a typo must not fail every request.
+    """
+    limits = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        route, _, limit = item.partition("=")
+        route = route.strip().strip("/")
+        if not route or not limit.strip().isdigit() or int(limit) < 1:
+            logging.warning("Ignoring malformed api_concurrency_limits entry %r", item)
+            continue
+        limits[route] = int(limit)
+    return limits
+
+
+# response body chunks buffered ahead of the client in streaming mode
+STREAM_QUEUE_SIZE = 8
+
+settings = load_settings()
+batching_routes = {
+    route.strip().strip("/")
+    for route in settings["batching_routes"].split(",")
+    if route.strip()
+}
+api_concurrency_limits = _parse_concurrency_limits(settings["api_concurrency_limits"])
+response_cache_routes = {
+    route.strip().strip("/")
+    for route in settings["response_cache_routes"].split(",")
+    if route.strip()
+}
+
+
+def _make_response_cache():
+    mode = settings["response_cache"]
+    if mode == "off":
+        return None
+    shared_store = None
+    if mode != "local":
+        # the function app's own storage account unless another one is given
+        url = settings["response_cache_url"] or os.environ.get("AzureWebJobsStorage")
+        try:
+            shared_store = make_shared_store(mode, url)
+        except Exception:
+            logging.exception("Shared response cache unavailable, caching locally")
+    return ResponseCache(
+        LRUCache(settings["response_cache_size"]),
+        shared_store,
+        ttl=settings["response_cache_ttl"],
+    )
+
+
+response_cache = _make_response_cache()
+
+# time spent (in seconds) in each phase of the worker's cold start
+timings = {}
+bento_service = None
+# the bento's ASGI app, wrapped with the instrumentation when it is enabled
+asgi_app = None
+request_metrics = RequestMetrics()
+_bento_ready = threading.Event()
+# event loop -> asyncio.Event its requests wait on for the bento to load
+_ready_events = weakref.WeakKeyDictionary()
+_ready_lock = threading.Lock()
+_bento_load_error = None
+_lifespan_lock = None
+_lifespan_task = None
+_first_request_done = False
+_batcher = None
+# route -> asyncio.Semaphore enforcing its api_concurrency_limits entry
+_api_semaphores = {}
+# route -> API with a NumpyNdarray input, or None
+_numpy_apis = {}
+
+
+def _record_timing(phase, started_at):
+    timings[phase] = time.perf_counter() - started_at
+    logging.info("bentoctl cold start phase %s took %.3fs", phase, timings[phase])
+
+
+def _load_bento():
+    global bento_service, asgi_app, _bento_load_error
+
+    try:
+        from bentoml import load
+        from bentoml._internal.configuration.containers import DeploymentContainer
+
+        _record_timing("imports", _import_started_at)
+
+        started_at = time.perf_counter()
+        if settings["mmap_models"]:
+            model_mmap.enable()
+        bento_service = load("./")
+        logging.info("Loaded bento_service: %s", bento_service)
+        # Disable /metrics endpoint since promethues is not configured for use,
+        # the app module serves its own metrics when enable_metrics is set.
+        DeploymentContainer.api_server_config.metrics.enabled.set(False)
+
+        asgi_app = bento_service.asgi_app
+        if settings["enable_metrics"]:
+            asgi_app = instrument_asgi_app(asgi_app, request_metrics)
+        _record_timing("bento_load", started_at)
+    except Exception as error:
+        _bento_load_error = error
+        logging.exception("Failed to load bento_service")
+    finally:
+        with _ready_lock:
+            _bento_ready.set()
+            for loop, ready in list(_ready_events.items()):
+                try:
+                    loop.call_soon_threadsafe(ready.set)
+                except RuntimeError:
+                    # the loop is closed, nothing waits on it anymore
+                    pass
+
+
+if settings["fast_start"]:
+    threading.Thread(target=_load_bento, name="bento-loader", daemon=True).start()
+else:
+    _load_bento()
+    if _bento_load_error is not None:
+        raise _bento_load_error
+
+
+def _ready_event():
+    """The asyncio.Event of the running loop, set once the bento is loaded."""
+    loop = asyncio.get_event_loop()
+    with _ready_lock:
+        ready = _ready_events.get(loop)
+        if ready is None:
+            ready = _ready_events[loop] = asyncio.Event()
+            # the loader signals the loops it knows of when it is done
+            if _bento_ready.is_set():
+                ready.set()
+    return ready
+
+
+async def _wait_until_ready(timeout):
+    """
+    Wait for the loader thread without holding a thread of the executor,
+    True once the bento is loaded (or failed to), False after `timeout`.
+    """
+    if _bento_ready.is_set():
+        return True
+    try:
+        await asyncio.wait_for(_ready_event().wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+async def _run_lifespan_startup(asgi_app):
+    """
+    Drive the ASGI lifespan protocol up to `startup.complete`. The lifespan
+    task is kept alive afterwards so the app never sees a shutdown event.
+    """
+    global _lifespan_task
+
+    messages = asyncio.Queue()
+    startup_done = asyncio.Event()
+    startup_error = []
+
+    async def receive():
+        return await messages.get()
+
+    async def send(message):
+        if message["type"] == "lifespan.startup.failed":
+            startup_error.append(message.get("message", ""))
+        if message["type"].startswith("lifespan.startup."):
+            startup_done.set()
+
+    await messages.put({"type": "lifespan.startup"})
+    scope = {"type": "lifespan", "asgi": {"version": "3.0", "spec_version": "2.0"}}
+    lifespan_task = asyncio.ensure_future(asgi_app(scope, receive, send))
+    startup_wait = asyncio.ensure_future(startup_done.wait())
+    done, _ = await asyncio.wait(
+        [lifespan_task, startup_wait], return_when=asyncio.FIRST_COMPLETED
+    )
+    startup_wait.cancel()
+    if lifespan_task in done and not startup_done.is_set():
+        # the app does not implement lifespan, nothing to start up.
+        logging.info("ASGI app does not support lifespan events")
+    elif startup_error:
+        lifespan_task.cancel()
+        # left unset so the next request runs the startup again
+        raise RuntimeError(f"ASGI lifespan startup failed: {startup_error[0]}")
+    _lifespan_task = lifespan_task
+
+
+async def _ensure_started():
+    global _lifespan_lock
+
+    if _lifespan_task is not None:
+        return
+    if _lifespan_lock is None:
+        _lifespan_lock = asyncio.Lock()
+    async with _lifespan_lock:
+        if _lifespan_task is None:
+            started_at = time.perf_counter()
+            await _run_lifespan_startup(asgi_app)
+            _record_timing("runner_init", started_at)
+
+
+def _healthz_response():
+    body = {"ready": _bento_ready.is_set() and _bento_load_error is None}
+    body["timings"] = timings
+    return func.HttpResponse(
+        json.dumps(body), status_code=200, mimetype="application/json"
+    )
+
+
+async def _handle_batch(route, records):
+    """
+    Send the records of a batch to the API as one JSON list. The API has to
+    return a JSON list with one result per record.
+    """
+    response = await call_asgi(
+        "POST",
+        f"/{route}",
+        b"",
+        [("Content-Type", "application/json")],
+        json.dumps(records).encode("utf-8"),
+    )
+    if response.status_code != 200:
+        raise BatchError(f"batch request failed with {response.status_code}")
+    try:
+        results = json.loads(response.get_body())
+    except ValueError:
+        raise BatchError("batch response is not JSON")
+    if not isinstance(results, list):
+        raise BatchError("batch response is not a JSON list")
+    return results
+
+
+def _get_batcher():
+    global _batcher
+
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            _handle_batch,
+            max_latency=settings["batch_max_latency_ms"] / 1000,
+            max_size=settings["batch_max_size"],
+        )
+    return _batcher
+
+
+async def _handle_batched(req, context, route):
+    try:
+        records = json.loads(req.get_body())
+    except ValueError:
+        records = None
+    if not isinstance(records, list) or not records:
+        return await _handle_asgi(req)
+
+    try:
+        results = await _get_batcher().submit(route, records)
+    except Exception:
+        # one bad record fails the whole batch, retry this request on its own
+        logging.warning("Batch for /%s failed, handling request alone", route)
+        return await _handle_asgi(req)
+    return func.HttpResponse(
+        json.dumps(results), status_code=200, mimetype="application/json"
+    )
+
+
+def _get_route(req, context):
+    if "route" in req.route_params:
+        return req.route_params["route"]
+    # functions generated for a single API have a fixed route
+    return settings["function_routes"].get(context.function_name, "")
+
+
+def _takes_array_only(api):
+    # APIs also taking the request context have to go through BentoML
+    if getattr(api, "needs_ctx", False):
+        return False
+    try:
+        return len(inspect.signature(api.func).parameters) == 1
+    except (TypeError, ValueError):
+        return False
+
+
+def _numpy_api(route):
+    if route not in _numpy_apis:
+        _numpy_apis[route] = None
+        for api in bento_service.apis.values():
+            if (api.route or api.name).strip("/") == route:
+                is_numpy = type(api.input).__name__ == "NumpyNdarray"
+                if is_numpy and _takes_array_only(api):
+                    _numpy_apis[route] = api
+                break
+    return _numpy_apis[route]
+
+
+def _verify_array(descriptor, array):
+    """
+    Apply the dtype and shape of the NumpyNdarray descriptor to `array`: a
+    mismatch is refused when enforced, the array is converted otherwise.
+    """
+    verify = getattr(descriptor, "_verify_ndarray", None)
+    if verify is not None:
+        return verify(array)
+
+    dtype = getattr(descriptor, "_dtype", None)
+    if dtype is not None and array.dtype != dtype:
+        if getattr(descriptor, "_enforce_dtype", False):
+            raise ValueError(f"expected dtype {dtype}, got {array.dtype}")
+        array = array.astype(dtype)
+    shape = getattr(descriptor, "_shape", None)
+    if shape is not None and not (
+        len(shape) == len(array.shape)
+        and all(dim in (-1, size) for dim, size in zip(shape, array.shape))
+    ):
+        if getattr(descriptor, "_enforce_shape", False):
+            raise ValueError(f"expected shape {shape}, got {array.shape}")
+        array = array.reshape(shape)
+    return array
+
+
+async def _handle_numpy(req, route, api):
+    """
+    Call the API function with the array decoded in place from the
+    application/x-npy body, skipping the ASGI app and the JSON parsing of
+    the input descriptor (its dtype and shape are still applied). Only APIs
+    whose function takes the array alone are served here. Arrays are
+    answered in the same format when the client accepts it, anything else
+    is serialized by the output descriptor.
+    """
+    called_at = time.perf_counter()
+    if settings["enable_metrics"]:
+        request_metrics.observe(route, "queue", called_at - request_started_at.get())
+    from bentoml.exceptions import BentoMLException
+
+    try:
+        array = _verify_array(api.input, numpy_wire.decode(req.get_body()))
+    except (ValueError, BentoMLException) as error:
+        return func.HttpResponse(
+            f"Invalid {numpy_wire.CONTENT_TYPE} body: {error}", status_code=400
+        )
+
+    if inspect.iscoroutinefunction(api.func):
+        result = await api.func(array)
+    else:
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(None, api.func, array)
+    serialization_started_at = time.perf_counter()
+
+    if type(result).__name__ == "ndarray" and numpy_wire.accepts_npy(
+        req.headers.get("Accept")
+    ):
+        response = func.HttpResponse(
+            numpy_wire.encode(result),
+            status_code=200,
+            mimetype=numpy_wire.CONTENT_TYPE,
+        )
+    else:
+        output_response = await api.output.to_http_response(result)
+        response = _make_http_response(
+            output_response.status_code,
+            [
+                (name.decode("latin-1"), value.decode("latin-1"))
+                for name, value in output_response.raw_headers
+            ],
+            output_response.body,
+        )
+    if settings["enable_metrics"]:
+        request_metrics.observe(route, "model", serialization_started_at - called_at)
+        request_metrics.observe(
+            route, "serialization", time.perf_counter() - serialization_started_at
+        )
+    return response
+
+
+def _make_http_response(status_code, headers, body):
+    content_type = "text/plain"
+    for name, value in headers:
+        if name.lower() == "content-type":
+            content_type = value
+    mimetype, _, params = content_type.partition(";")
+    charset = "utf-8"
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "charset" and value:
+            charset = value.strip('"')
+    return func.HttpResponse(
+        body,
+        status_code=status_code,
+        headers={
+            name: value for name, value in headers if name.lower() != "content-type"
+        },
+        mimetype=mimetype.strip(),
+        charset=charset,
+    )
+
+
+async def call_asgi(method, path, query_string, headers, body):
+    """
+    Run a request through the bento's ASGI app and buffer its response.
+
+    `body` is handed to the app as it is: Starlette joins a single bytes
+    chunk without copying it, so the app parses the very buffer the host
+    passed in. The response chunks are joined once at the end.
+    """
+    status_code, response_headers, body_iterator = await stream_asgi(
+        method, path, query_string, headers, body
+    )
+    chunks = [chunk async for chunk in body_iterator]
+    response_body = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    return _make_http_response(status_code, response_headers, response_body)
+
+
+async def _handle_asgi(req):
+    url = urlsplit(req.url)
+    return await call_asgi(
+        req.method,
+        url.path,
+        url.query.encode("latin-1"),
+        list(req.headers.items()),
+        req.get_body(),
+    )
+
+
+async def _dispatch(req, context, route):
+    if route in batching_routes and req.method == "POST":
+        return await _handle_batched(req, context, route)
+    if settings["binary_numpy"] and numpy_wire.is_npy(req.headers.get("Content-Type")):
+        api = _numpy_api(route)
+        if api is not None:
+            return await _handle_numpy(req, route, api)
+    return await _handle_asgi(req)
+
+
+async def _handle_limited(req, context, route):
+    if route not in api_concurrency_limits:
+        return await _dispatch(req, context, route)
+    if route not in _api_semaphores:
+        _api_semaphores[route] = asyncio.Semaphore(api_concurrency_limits[route])
+    # requests over the limit wait here, other APIs are not held up
+    async with _api_semaphores[route]:
+        return await _dispatch(req, context, route)
+
+
+def _cached_http_response(entry):
+    headers = dict(entry.headers)
+    headers["X-Cache"] = "HIT"
+    return func.HttpResponse(
+        entry.body,
+        status_code=entry.status_code,
+        headers=headers,
+        mimetype=entry.mimetype,
+        charset=entry.charset,
+    )
+
+
+async def _run_cache_io(fn, *args):
+    # the shared tier does network IO, keep it off the event loop
+    if response_cache.shared is None:
+        return fn(*args)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, fn, *args)
+
+
+async def _handle_cached(req, context, route):
+    """
+    Serve the response from the cache when an identical request (same route,
+    method, query string, Accept and Content-Type headers and body) was
+    answered before. The request's `no-cache` skips the lookup and
+    `no-store` also keeps its response out of the cache, the response's
+    Cache-Control can shorten its TTL or keep it out as well.
+    """
+    request_directives = parse_cache_control(req.headers.get("Cache-Control"))
+    key = make_key(
+        route,
+        req.method,
+        req.get_body(),
+        query_string=urlsplit(req.url).query,
+        headers=req.headers,
+    )
+    if not {"no-cache", "no-store"} & set(request_directives):
+        entry, _ = await _run_cache_io(response_cache.get, key)
+        if entry is not None:
+            return _cached_http_response(entry)
+
+    response = await _handle_limited(req, context, route)
+    ttl = response_ttl(
+        parse_cache_control(response.headers.get("Cache-Control")),
+        settings["response_cache_ttl"],
+    )
+    if response.status_code == 200 and ttl > 0 and "no-store" not in request_directives:
+        entry = CachedResponse(
+            response.get_body(),
+            response.status_code,
+            dict(response.headers),
+            response.mimetype,
+            response.charset,
+        )
+        await _run_cache_io(response_cache.set, key, entry, ttl)
+    response.headers["X-Cache"] = "MISS"
+    return response
+
+
+async def _handle(req, context, route):
+    if response_cache is not None and (
+        not response_cache_routes or route in response_cache_routes
+    ):
+        return await _handle_cached(req, context, route)
+    return await _handle_limited(req, context, route)
+
+
+async def gate(route):
+    """
+    Checks shared by every entry point before a request reaches the bento.
+    Returns the response to answer early with, or None.
+    """
+    request_started_at.set(time.perf_counter())
+    if settings["enable_metrics"] and route == "metrics":
+        metrics_text = request_metrics.render_prometheus()
+        if response_cache is not None:
+            metrics_text += response_cache.render_prometheus()
+        return func.HttpResponse(
+            metrics_text,
+            status_code=200,
+            mimetype="text/plain",
+        )
+    if settings["fast_start"]:
+        if route == "healthz":
+            return _healthz_response()
+        if not await _wait_until_ready(settings["ready_timeout"]):
+            return func.HttpResponse(
+                "Bento is still loading, retry later.",
+                status_code=503,
+                headers={"Retry-After": "5"},
+            )
+    if _bento_load_error is not None:
+        raise _bento_load_error
+
+    await _ensure_started()
+    return None
+
+
+async def stream_asgi(method, path, query_string, headers, body):
+    """
+    Run a request through the bento's ASGI app and forward the response body
+    chunks as the app produces them instead of buffering the whole body.
+
+    Returns the status code, the response headers and an async iterator over
+    the body chunks.
+    """
+    loop = asyncio.get_event_loop()
+    response_start = loop.create_future()
+    # bounded, so a slow client holds back the app instead of filling memory
+    chunks = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    response_done = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response_start.set_result(message)
+        elif message["type"] == "http.response.body":
+            await chunks.put(message.get("body", b""))
+            if not message.get("more_body", False):
+                await chunks.put(None)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.1"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "https",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": query_string,
+        "root_path": "",
+        "headers": [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ],
+        "client": None,
+        "server": None,
+    }
+    app_task = asyncio.ensure_future(asgi_app(scope, receive, send))
+    await asyncio.wait([response_start, app_task], return_when=asyncio.FIRST_COMPLETED)
+    if not response_start.done():
+        app_task.result()
+        raise RuntimeError("ASGI app returned without sending a response")
+
+    start = response_start.result()
+    response_headers = [
+        (name.decode("latin-1"), value.decode("latin-1"))
+        for name, value in start.get("headers", [])
+    ]
+
+    async def next_chunk():
+        # wait on the app too: if it fails mid-body no end of body is queued
+        if not app_task.done():
+            get_task = asyncio.ensure_future(chunks.get())
+            await asyncio.wait(
+                [get_task, app_task], return_when=asyncio.FIRST_COMPLETED
+            )
+            if get_task.done():
+                return get_task.result()
+            get_task.cancel()
+        # the app is done, the chunks it sent are already queued
+        if not chunks.empty():
+            return chunks.get_nowait()
+        # re-raises the app's error, an app that just returned ends the body
+        app_task.result()
+        return None
+
+    async def body_iterator():
+        try:
+            while True:
+                chunk = await next_chunk()
+                if chunk is None:
+                    break
+                if chunk:
+                    yield chunk
+            await app_task
+        finally:
+            response_done.set()
+
+    return start["status"], response_headers, body_iterator()
+
+
+async def main(req: func.HttpRequest, context: func.Context) -> func.HttpResponse:
+    global _first_request_done
+
+    route = _get_route(req, context)
+    early_response = await gate(route)
+    if early_response is not None:
+        return early_response
+
+    if _first_request_done:
+        return await _handle(req, context, route)
+
+    started_at = time.perf_counter()
+    response = await _handle(req, context, route)
+    if not _first_request_done:
+        _first_request_done = True
+        _record_timing("first_request", started_at)
+    return response
 
-bento_service = load("./")
-logging.info("Loaded bento_service: %s", bento_service)
-# Disable /metrics endpoint since promethues is not configured for use
-DeploymentContainer.api_server_config.metrics.enabled.set(False)
 
+async def batch_main(msg: func.QueueMessage) -> None:
+    """Entry point of the queue-triggered batch jobs (see batch_jobs.py)."""
+    # no timeout, the loader signals the loop when loading fails too
+    await _wait_until_ready(None)
+    if _bento_load_error is not None:
+        raise _bento_load_error
+    await _ensure_started()
 
-def main(req: func.HttpRequest, context: func.Context) -> str:
-    return func.AsgiMiddleware(bento_service.asgi_app).handle(req, context)
+    job = batch_jobs.parse_job(msg.get_body())
+    logging.info("Running batch job %s on /%s", msg.id, job["route"])
+    summary = await batch_jobs.run_job(
+        job,
+        batch_jobs.make_blob_service_client(os.environ["AzureWebJobsStorage"]),
+        _handle_batch,
+        settings["batch_job_size"],
+    )
+    logging.info("Batch job %s done: %s", msg.id, json.dumps(summary))
@@ -0,0 +1,171 @@
+"""
+Queue-triggered batch inference jobs for the generated function app.
+
+A job is a queue message pointing at a JSON lines blob, one input record per
+line:
+
+    {"route": "classify", "input": "batch-input/records.jsonl",
+     "output": "batch-output/records.jsonl"}
+
+The records are read as the blob downloads, sent to the API in batches of
+`batch_size` (the API takes and returns JSON lists, as with micro-batching)
+and the results are written to the output blob one line per record, in the
+input order, as blocks staged while the job runs. `output` defaults to the
+input blob's name in the `batch-output` container.
+"""
+import asyncio
+import base64
+import json
+import logging
+import time
+
+DEFAULT_OUTPUT_CONTAINER = "batch-output"
+# results are staged in blocks of about this many bytes
+BLOCK_SIZE = 4 * 1024 ** 2
+
+
+def _split_blob_path(path):
+    container, _, blob = path.strip("/").partition("/")
+    if not container or not blob:
+        raise ValueError(f"Expected <container>/<blob>, got {path}")
+    return container, blob
+
+
+def parse_job(message_body):
+    job = json.loads(message_body)
+    if "route" not in job or "input" not in job:
+        raise ValueError("A batch job needs a route and an input blob")
+    _, input_blob = _split_blob_path(job["input"])
+    job["route"] = job["route"].strip("/")
+    job.setdefault("output", f"{DEFAULT_OUTPUT_CONTAINER}/{input_blob}")
+    return job
+
+
+def make_blob_service_client(connection_string):
+    # "UseDevelopmentStorage=true" points the client at a local Azurite
+    from azure.storage.blob import BlobServiceClient
+
+    return BlobServiceClient.from_connection_string(connection_string)
+
+
+class BlockWriter:
+    """Buffers the output and stages it as blocks of the output blob."""
+
+    def __init__(self, blob_client, run_blocking, block_size=BLOCK_SIZE):
+        self.blob_client = blob_client
+        self.run_blocking = run_blocking
+        self.block_size = block_size
+        self.block_ids = []
+        self.bytes_written = 0
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    async def write(self, data):
+        self._buffer.append(data)
+        self._buffered_bytes += len(data)
+        if self._buffered_bytes >= self.block_size:
+            await self._stage_block()
+
+    async def _stage_block(self):
+        if not self._buffer:
+            return
+        block_id = base64.b64encode(f"{len(self.block_ids):08d}".encode()).decode()
+        data = b"".join(self._buffer)
+        await self.run_blocking(self.blob_client.stage_block, block_id, data)
+        self.block_ids.append(block_id)
+        self.bytes_written += len(data)
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    async def close(self):
+        from azure.storage.blob import BlobBlock
+
+        await self._stage_block()
+        await self.run_blocking(
+            self.blob_client.commit_block_list,
+            [BlobBlock(block_id=block_id) for block_id in self.block_ids],
+        )
+
+
+async def _iter_records(blob_client, run_blocking):
+    downloader = await run_blocking(blob_client.download_blob)
+    chunks = downloader.chunks()
+    remainder = b""
+    while True:
+        chunk = await run_blocking(next, chunks, None)
+        if chunk is None:
+            break
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if remainder.strip():
+        yield json.loads(remainder)
+
+
+async def _run_batch(route, records, handle_batch):
+    """
+    Results of one batch. When the batch fails its records are retried one
+    by one, so a bad record only fails its own line.
+    """
+    try:
+        results = await handle_batch(route, records)
+        if len(results) != len(records):
+            raise ValueError(
+                f"{len(results)} results returned for {len(records)} records"
+            )
+        return results
+    except Exception:
+        logging.warning("Batch of %d records failed, retrying them alone", len(records))
+    results = []
+    for record in records:
+        try:
+            results.extend(await handle_batch(route, [record]))
+        except Exception as error:
+            results.append({"error": str(error)})
+    return results
+
+
+async def run_job(
+    job, blob_service_client, handle_batch, batch_size, block_size=BLOCK_SIZE
+):
+    """
+    Run a parsed job with `handle_batch(route, records)`, the app's batch
+    handler. Returns a summary of the job.
+    """
+    loop = asyncio.get_event_loop()
+
+    async def run_blocking(fn, *args):
+        return await loop.run_in_executor(None, fn, *args)
+
+    started_at = time.perf_counter()
+    input_blob = blob_service_client.get_blob_client(*_split_blob_path(job["input"]))
+    output_blob = blob_service_client.get_blob_client(
+        *_split_blob_path(job["output"])
+    )
+    writer = BlockWriter(output_blob, run_blocking, block_size)
+    summary = {"records": 0, "batches": 0, "errors": 0}
+
+    async def write_results(records):
+        results = await _run_batch(job["route"], records, handle_batch)
+        summary["batches"] += 1
+        for result in results:
+            if isinstance(result, dict) and "error" in result:
+                summary["errors"] += 1
+            await writer.write(json.dumps(result).encode("utf-8") + b"\n")
+
+    batch = []
+    async for record in _iter_records(input_blob, run_blocking):
+        batch.append(record)
+        summary["records"] += 1
+        if len(batch) >= batch_size:
+            await write_results(batch)
+            batch = []
+    if batch:
+        await write_results(batch)
+    await writer.close()
+
+    summary["bytes_written"] = writer.bytes_written
+    summary["seconds"] = time.perf_counter() - started_at
+    return summary
@@ -0,0 +1,67 @@
+import asyncio
+
+
+class BatchError(Exception):
+    """
+    Raised by a batch handler when a merged batch can't be processed or its
+    result can't be split back. Requests of that batch are then handled one
+    by one.
+    """
+
+
+class MicroBatcher:
+    """
+    Collects the records of concurrent requests with the same key (the API
+    route) and hands them to `handle_batch(key, records)` as one list, once
+    `max_size` records are queued or the oldest one has waited `max_latency`
+    seconds. `handle_batch` returns one result per record, in order, and each
+    caller gets back the results for its own records.
+    """
+
+    def __init__(self, handle_batch, max_latency, max_size):
+        self.handle_batch = handle_batch
+        self.max_latency = max_latency
+        self.max_size = max_size
+        self._queues = {}
+        self._timers = {}
+
+    async def submit(self, key, records):
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        queue = self._queues.setdefault(key, [])
+        queue.append((records, future))
+
+        if sum(len(queued_records) for queued_records, _ in queue) >= self.max_size:
+            self._flush(key)
+        elif len(queue) == 1:
+            self._timers[key] = loop.call_later(self.max_latency, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._queues.pop(key, [])
+        if batch:
+            asyncio.ensure_future(self._run_batch(key, batch))
+
+    async def _run_batch(self, key, batch):
+        records = [record for queued_records, _ in batch for record in queued_records]
+        try:
+            results = await self.handle_batch(key, records)
+            if len(results) != len(records):
+                raise BatchError(
+                    f"batch of {len(records)} records returned {len(results)} results"
+                )
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        start = 0
+        for queued_records, future in batch:
+            end = start + len(queued_records)
+            if not future.done():
+                future.set_result(results[start:end])
+            start = end
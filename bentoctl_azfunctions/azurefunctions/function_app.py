@@ -0,0 +1,67 @@
+"""
+Entry point of the function app in streaming mode (Python v2 programming
+model). The bento is loaded by the `app` package next to this file.
+
+Response bodies are streamed to the client when the HTTP streaming extension
+(azurefunctions-extensions-http-fastapi) is installed, otherwise they are
+buffered like in the default mode.
+"""
+import logging
+
+import azure.functions as func
+
+import app as bento_app
+
+try:
+    from azurefunctions.extensions.http.fastapi import (
+        Request,
+        Response,
+        StreamingResponse,
+    )
+
+    STREAMING_AVAILABLE = True
+except ImportError:
+    STREAMING_AVAILABLE = False
+    logging.warning(
+        "HTTP streaming is not available in this Functions runtime, "
+        "responses will be buffered"
+    )
+
+
+app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
+
+
+if STREAMING_AVAILABLE:
+
+    @app.route(route="{*route}", methods=["GET", "POST"])
+    async def bento(req: Request) -> StreamingResponse:
+        early_response = await bento_app.gate(req.url.path.strip("/"))
+        if early_response is not None:
+            return Response(
+                content=early_response.get_body(),
+                status_code=early_response.status_code,
+                headers=dict(early_response.headers),
+                media_type=early_response.mimetype,
+            )
+
+        status_code, headers, body_iterator = await bento_app.stream_asgi(
+            req.method,
+            req.url.path,
+            req.url.query.encode("latin-1"),
+            req.headers.items(),
+            await req.body(),
+        )
+        response = StreamingResponse(body_iterator, status_code=status_code)
+        # keep repeated headers (e.g. set-cookie) as they are
+        response.raw_headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ]
+        return response
+
+
+else:
+
+    @app.route(route="{*route}", methods=["GET", "POST"])
+    async def bento(req: func.HttpRequest, context: func.Context) -> func.HttpResponse:
+        return await bento_app.main(req, context)
@@ -0,0 +1,121 @@
+import bisect
+import contextvars
+import time
+
+# upper bounds (in seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+METRIC_NAME = "bentoctl_request_duration_seconds"
+
+# perf_counter() at which the current request entered the function
+request_started_at = contextvars.ContextVar("request_started_at", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # the last count is for values above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """
+    In-process latency histograms per API route and phase of a request:
+
+    - queue: from the function being invoked until the request reaches the
+      bento (waiting for the bento to load, for a batch to fill up...)
+    - model: from the bento receiving the request until it starts the
+      response, this covers decoding the input and running the API
+    - serialization: from the start of the response until its last body
+      chunk is sent
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+
+    def observe(self, route, phase, seconds):
+        histogram = self.histograms.get((route, phase))
+        if histogram is None:
+            histogram = self.histograms[(route, phase)] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def render_prometheus(self):
+        lines = [f"# TYPE {METRIC_NAME} histogram"]
+        for (route, phase), histogram in sorted(self.histograms.items()):
+            labels = f'route="{route}",phase="{phase}"'
+            cumulative_count = 0
+            for upper_bound, count in zip(
+                list(histogram.buckets) + ["+Inf"], histogram.counts
+            ):
+                cumulative_count += count
+                lines.append(
+                    f'{METRIC_NAME}_bucket{{{labels},le="{upper_bound}"}} '
+                    f"{cumulative_count}"
+                )
+            lines.append(f"{METRIC_NAME}_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{METRIC_NAME}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def instrument_asgi_app(asgi_app, metrics):
+    """
+    Wrap an ASGI app so the phases of every HTTP request are recorded in
+    `metrics`. Requests that entered the function without setting
+    `request_started_at` get no queue time.
+    """
+
+    async def instrumented_app(scope, receive, send):
+        if scope["type"] != "http":
+            return await asgi_app(scope, receive, send)
+
+        route = scope["path"].strip("/")
+        called_at = time.perf_counter()
+        started_at = request_started_at.get()
+        if started_at is not None:
+            metrics.observe(route, "queue", called_at - started_at)
+        response_started_at = None
+
+        async def timed_send(message):
+            nonlocal response_started_at
+            if message["type"] == "http.response.start":
+                response_started_at = time.perf_counter()
+                metrics.observe(route, "model", response_started_at - called_at)
+            elif message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                await send(message)
+                if response_started_at is not None:
+                    metrics.observe(
+                        route,
+                        "serialization",
+                        time.perf_counter() - response_started_at,
+                    )
+                return
+            await send(message)
+
+        await asgi_app(scope, receive, timed_send)
+
+    return instrumented_app
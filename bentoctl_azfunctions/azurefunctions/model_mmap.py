@@ -0,0 +1,77 @@
+"""
+Memory-mapped model loading for the generated function app.
+
+The Functions host starts every Python worker process on its own, so model
+weights can't be shared copy-on-write from a parent process. Weights loaded
+from memory-mapped files are backed by the page cache instead, which every
+worker process maps the same physical pages of, so the memory a model takes
+is paid once per instance rather than once per worker.
+
+`enable()` makes the loaders of the common frameworks memory-map by default,
+it has to run before the bento (and its runners) load the models.
+safetensors files are always memory-mapped and need no patching.
+"""
+import functools
+import importlib.util
+import logging
+import os
+
+
+def _default_kwarg(fn, path_arg, name, value, fallback_errors=()):
+    """
+    Wrap `fn` so `name=value` is passed when the caller does not set `name`
+    and loads from a path (the first argument, or the `path_arg` keyword).
+    Open files and buffers can't be mapped, they are loaded as before. If
+    the call fails with one of `fallback_errors` it is retried without it.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        path = args[0] if args else kwargs.get(path_arg)
+        if name in kwargs or not isinstance(path, (str, os.PathLike)):
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **{name: value}, **kwargs)
+        except fallback_errors:
+            return fn(*args, **kwargs)
+
+    wrapper.__bentoctl_mmap__ = True
+    return wrapper
+
+
+def _patch(
+    module_name, attribute, path_arg, kwarg_name, kwarg_value, fallback_errors=()
+):
+    if importlib.util.find_spec(module_name) is None:
+        return False
+    module = importlib.import_module(module_name)
+    loader = getattr(module, attribute)
+    if getattr(loader, "__bentoctl_mmap__", False):
+        return True
+    setattr(
+        module,
+        attribute,
+        _default_kwarg(loader, path_arg, kwarg_name, kwarg_value, fallback_errors),
+    )
+    return True
+
+
+def enable():
+    """
+    Memory-map model files loaded with numpy, joblib (uncompressed dumps, as
+    used for scikit-learn models) and torch (zip format, torch >= 2.1).
+    Returns the names of the patched modules.
+    """
+    patched = []
+    # object arrays (pickled) can't be mapped
+    if _patch("numpy", "load", "file", "mmap_mode", "r", (ValueError,)):
+        patched.append("numpy")
+    if _patch("joblib", "load", "filename", "mmap_mode", "r"):
+        patched.append("joblib")
+    # older torch versions don't know `mmap`, legacy files can't be mapped
+    if _patch(
+        "torch", "load", "f", "mmap", True, (TypeError, RuntimeError, ValueError)
+    ):
+        patched.append("torch")
+    logging.info("Memory-mapped model loading enabled for %s", patched)
+    return patched
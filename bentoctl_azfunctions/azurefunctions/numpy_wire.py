@@ -0,0 +1,74 @@
+"""
+Binary NumPy payloads for APIs taking a `NumpyNdarray` input.
+
+The wire format is the `.npy` file format (what `numpy.save` writes): a short
+header with the dtype, shape and memory order followed by the raw array
+buffer. Requests sent with the `application/x-npy` content type are decoded
+into an array viewing the request body, without copying or parsing the data.
+Object arrays are refused, they would need pickle.
+"""
+import io
+
+CONTENT_TYPE = "application/x-npy"
+
+
+def is_npy(content_type):
+    return (content_type or "").split(";")[0].strip().lower() == CONTENT_TYPE
+
+
+def accepts_npy(accept):
+    return any(is_npy(media_range) for media_range in (accept or "").split(","))
+
+
+def decode(body):
+    """
+    The array held by an `.npy` body. It is a read-only view of `body`, so
+    the body is kept alive as long as the array is.
+    """
+    import numpy as np
+    from numpy.lib import format as npy_format
+
+    # BytesIO shares the buffer of a bytes object, reading the header
+    # doesn't copy the body
+    fp = io.BytesIO(body)
+    version = npy_format.read_magic(fp)
+    if version == (1, 0):
+        shape, fortran_order, dtype = npy_format.read_array_header_1_0(fp)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = npy_format.read_array_header_2_0(fp)
+    else:
+        raise ValueError(f"unsupported .npy format version {version}")
+    if dtype.hasobject:
+        raise ValueError("object arrays are not supported")
+
+    count = 1
+    for dim in shape:
+        count *= dim
+    data_size = count * dtype.itemsize
+    offset = fp.tell()
+    if len(body) - offset != data_size:
+        raise ValueError(
+            f"expected {data_size} bytes of array data, got {len(body) - offset}"
+        )
+    array = np.frombuffer(memoryview(body), dtype=dtype, count=count, offset=offset)
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def encode(array):
+    """
+    The `.npy` bytes of `array`. The data is copied once, straight into the
+    returned bytes.
+    """
+    import numpy as np
+    from numpy.lib import format as npy_format
+
+    if array.dtype.hasobject:
+        raise ValueError("object arrays are not supported")
+    if not (array.flags.c_contiguous or array.flags.f_contiguous):
+        array = np.ascontiguousarray(array)
+    header = npy_format.header_data_from_array_1_0(array)
+    # a Fortran ordered array is the C ordered buffer of its transpose
+    data = array.T if header["fortran_order"] else array
+    fp = io.BytesIO()
+    npy_format.write_array_header_1_0(fp, header)
+    return b"".join([fp.getvalue(), memoryview(data.reshape(-1).view(np.uint8))])
@@ -0,0 +1,253 @@
+"""
+Response cache for idempotent APIs of the generated function app.
+
+Responses are keyed by the API route and a hash of the request's query
+string, Accept and Content-Type headers and body. They are kept in a
+bounded in-process LRU tier and, optionally, in a tier shared by every
+worker and instance (Redis or an Azure Blob container). The shared
+tier is any object with `get(key)` and `set(key, value, ttl)`, so a dict
+backed stand-in works for local runs.
+"""
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+METRIC_NAME = "bentoctl_response_cache_requests_total"
+# request headers that select a different response for the same body
+VARY_HEADERS = ("Accept", "Content-Type")
+BLOB_CONTAINER_NAME = "bentoctl-response-cache"
+
+
+class CachedResponse:
+    def __init__(
+        self,
+        body,
+        status_code,
+        headers,
+        mimetype=None,
+        charset=None,
+        expires_at=None,
+    ):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers
+        self.mimetype = mimetype
+        self.charset = charset
+        # wall clock time the entry expires at, set when it is cached
+        self.expires_at = expires_at
+
+    def to_bytes(self):
+        return json.dumps(
+            {
+                "body": base64.b64encode(self.body).decode("ascii"),
+                "status_code": self.status_code,
+                "headers": self.headers,
+                "mimetype": self.mimetype,
+                "charset": self.charset,
+                "expires_at": self.expires_at,
+            }
+        ).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data):
+        fields = json.loads(data)
+        fields["body"] = base64.b64decode(fields["body"])
+        return cls(**fields)
+
+
+def make_key(route, method, body, query_string="", headers=None):
+    """
+    Key of a request: its route, method, query string, the `VARY_HEADERS`
+    found in `headers` (a case-insensitive mapping) and its body.
+    """
+    digest = hashlib.sha256()
+    for part in [query_string] + [
+        (headers or {}).get(name) or "" for name in VARY_HEADERS
+    ]:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(body)
+    return f"{route.strip('/')}:{method}:{digest.hexdigest()}"
+
+
+def parse_cache_control(value):
+    """`Cache-Control` directives as a dict, `max-age=60` -> {"max-age": "60"}."""
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def response_ttl(directives, default_ttl):
+    """
+    Seconds a response may be cached for, given its Cache-Control directives,
+    or 0 when it must not be cached.
+    """
+    if any(name in directives for name in ("no-store", "no-cache", "private")):
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name) is not None:
+            try:
+                return min(int(directives[name]), default_ttl)
+            except ValueError:
+                return 0
+    return default_ttl
+
+
+class LRUCache:
+    """In-process tier: at most `max_entries` responses, each kept for its TTL."""
+
+    def __init__(self, max_entries, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            value, expires_at = self._entries[key]
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, self.clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisStore:
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(int(ttl), 1))
+
+
+class BlobStore:
+    """
+    Entries are blobs named after their key, their expiry time is kept in
+    the blob's metadata. Expired blobs are overwritten on the next miss, a
+    lifecycle rule on the container can delete them.
+    """
+
+    def __init__(self, connection_string, container_name=BLOB_CONTAINER_NAME):
+        from azure.core.exceptions import ResourceExistsError
+        from azure.storage.blob import ContainerClient
+
+        self._container = ContainerClient.from_connection_string(
+            connection_string, container_name
+        )
+        try:
+            self._container.create_container()
+        except ResourceExistsError:
+            pass
+
+    def get(self, key):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            downloader = self._container.download_blob(key)
+        except ResourceNotFoundError:
+            return None
+        if float(downloader.properties.metadata.get("expires_at", 0)) <= time.time():
+            return None
+        return downloader.readall()
+
+    def set(self, key, value, ttl):
+        self._container.upload_blob(
+            key,
+            value,
+            overwrite=True,
+            metadata={"expires_at": str(time.time() + ttl)},
+        )
+
+
+def make_shared_store(mode, url):
+    if mode == "redis":
+        return RedisStore(url)
+    if mode == "blob":
+        return BlobStore(url)
+    raise ValueError(f"Unknown response cache mode {mode}")
+
+
+class ResponseCache:
+    """
+    Looks responses up in the local tier, then in the shared one, and counts
+    the hits and misses of every tier. Errors of the shared tier are logged
+    and counted as misses, they never fail a request.
+    """
+
+    def __init__(self, local, shared=None, ttl=300):
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+        self.counts = {}
+
+    def _count(self, tier, result):
+        self.counts[(tier, result)] = self.counts.get((tier, result), 0) + 1
+
+    def get(self, key):
+        """The CachedResponse and the tier it was found in, or (None, None)."""
+        entry = self.local.get(key)
+        if entry is not None:
+            self._count("local", "hit")
+            return entry, "local"
+        self._count("local", "miss")
+        if self.shared is None:
+            return None, None
+
+        try:
+            data = self.shared.get(key)
+        except Exception:
+            logging.warning("Response cache lookup failed", exc_info=True)
+            data = None
+        if data is None:
+            self._count("shared", "miss")
+            return None, None
+        entry = CachedResponse.from_bytes(data)
+        # keep it locally for what is left of its TTL, not a fresh one
+        ttl = self.ttl
+        if entry.expires_at is not None:
+            ttl = min(ttl, entry.expires_at - time.time())
+        if ttl <= 0:
+            self._count("shared", "miss")
+            return None, None
+        self._count("shared", "hit")
+        self.local.set(key, entry, ttl)
+        return entry, "shared"
+
+    def set(self, key, entry, ttl):
+        entry.expires_at = time.time() + ttl
+        self.local.set(key, entry, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, entry.to_bytes(), ttl)
+            except Exception:
+                logging.warning("Response cache update failed", exc_info=True)
+
+    def render_prometheus(self):
+        lines = [f"# TYPE {METRIC_NAME} counter"]
+        for (tier, result), count in sorted(self.counts.items()):
+            lines.append(f'{METRIC_NAME}{{tier="{tier}",result="{result}"}} {count}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,49 @@
+"""
+Runs during `docker build` when the deployable is created with `prewarm`.
+
+Loads the service and initializes its runners once so frameworks that compile
+or optimize models on first load write their caches (the cache directories
+are set by the Dockerfile and kept in the image), then byte-compiles the
+bento's code and the installed packages so that new instances do not have to.
+"""
+import compileall
+import logging
+import site
+import sys
+import time
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+
+def warm_up_runners():
+    import bentoml
+
+    bento_service = bentoml.load("./")
+    for runner in bento_service.runners:
+        started_at = time.perf_counter()
+        runner.init_local(quiet=True)
+        logging.info(
+            "Initialized runner %s in %.2fs",
+            runner.name,
+            time.perf_counter() - started_at,
+        )
+
+
+def byte_compile():
+    paths = ["./src", "./app"] + site.getsitepackages()
+    for path in paths:
+        started_at = time.perf_counter()
+        # workers=0 uses every available core
+        compileall.compile_dir(path, quiet=1, workers=0)
+        logging.info(
+            "Byte-compiled %s in %.2fs", path, time.perf_counter() - started_at
+        )
+
+
+def main():
+    warm_up_runners()
+    byte_compile()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,409 @@
+"""
+Local load tests for a deployable generated by `create_deployable`, without
+deploying it to Azure.
+
+Two drivers are available:
+
+- in-process: the generated `app` module is imported in this process (this
+  needs `azure-functions` and the bento's dependencies installed locally) and
+  its `main` is invoked with `azure.functions.HttpRequest` objects, the way
+  the Functions host does, honouring the concurrency limit of `host.json`.
+- docker: the deployable's image, which contains the Functions host, is
+  built and started and the requests are sent to it over HTTP.
+
+Both report throughput, p50/p95/p99 latency, cold start time and peak memory.
+"""
+import asyncio
+import importlib
+import json
+import os
+import resource
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .sku_profiles import SKU_PROFILES
+
+LoadProfile = namedtuple(
+    "LoadProfile", ["name", "route", "method", "body", "content_type"]
+)
+
+NPY_CONTENT_TYPE = "application/x-npy"
+DOCKER_HOST_PORT = 8080
+DOCKER_STARTUP_TIMEOUT = 300
+
+
+def load_profiles(profiles_file):
+    """
+    Read load profiles from a JSON file holding a list of objects with the
+    fields `route`, and optionally `name`, `method`, `content_type` and the
+    request body as `body` (a string or any JSON value) or `body_file`.
+    """
+    with open(profiles_file, "r") as f:
+        profile_specs = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(profiles_file))
+    return [
+        make_profile(**profile_spec, base_dir=base_dir)
+        for profile_spec in profile_specs
+    ]
+
+
+def make_profile(
+    route,
+    name=None,
+    method="POST",
+    body=None,
+    body_file=None,
+    content_type=None,
+    base_dir=".",
+):
+    if content_type is None:
+        # .npy files are sent in the binary NumPy format of the app module
+        is_npy = body_file is not None and body_file.endswith(".npy")
+        content_type = NPY_CONTENT_TYPE if is_npy else "application/json"
+    if body_file is not None:
+        with open(os.path.join(base_dir, body_file), "rb") as f:
+            body = f.read()
+    elif body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+    else:
+        body = json.dumps(body).encode("utf-8")
+    route = route.strip("/")
+    return LoadProfile(name or route, route, method.upper(), body, content_type)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, int(round(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def _to_ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def summarize(profile, concurrency, latencies, errors, wall_time):
+    latencies = sorted(latencies)
+    return {
+        "profile": profile.name,
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "payload_bytes": len(profile.body),
+        "throughput_rps": len(latencies) / wall_time if wall_time > 0 else 0.0,
+        # request payload decoded per second, for large tensor payloads
+        "throughput_mb_s": (
+            len(latencies) * len(profile.body) / wall_time / 1e6
+            if wall_time > 0
+            else 0.0
+        ),
+        "latency_ms": {
+            "mean": _to_ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": _to_ms(percentile(latencies, 50)),
+            "p95": _to_ms(percentile(latencies, 95)),
+            "p99": _to_ms(percentile(latencies, 99)),
+        },
+    }
+
+
+def peak_rss_bytes():
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def _read_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class _Context:
+    """Stand-in for the `azure.functions.Context` the host passes."""
+
+    def __init__(self, function_directory, invocation_id):
+        self.function_directory = function_directory
+        self.function_name = os.path.basename(function_directory)
+        self.invocation_id = invocation_id
+
+
+class InProcessHost:
+    """
+    Imports the generated app module and invokes its `main` coroutine like
+    the Functions HTTP host would.
+    """
+
+    def __init__(self, deployable_path):
+        self.deployable_path = os.path.abspath(deployable_path)
+        self.app_path = os.path.join(self.deployable_path, "app")
+        host_config = _read_json(os.path.join(self.deployable_path, "host.json"))
+        self.http_config = host_config.get("extensions", {}).get("http", {})
+        function_json_path = os.path.join(self.app_path, "function.json")
+        self.function_config = (
+            _read_json(function_json_path)
+            if os.path.exists(function_json_path)
+            else {"bindings": []}
+        )
+        self.app_module = None
+        self.cold_start_seconds = None
+        self._started_at = None
+        self._invocations = 0
+
+    @property
+    def max_concurrent_requests(self):
+        limit = self.http_config.get("maxConcurrentRequests", -1)
+        return None if limit is None or limit < 0 else limit
+
+    @property
+    def allowed_methods(self):
+        for binding in self.function_config["bindings"]:
+            if binding.get("type") == "httpTrigger":
+                return {method.upper() for method in binding.get("methods", [])}
+        return {"GET", "POST"}
+
+    def start(self):
+        """Import the app module from the deployable."""
+        os.chdir(self.deployable_path)
+        if self.deployable_path not in sys.path:
+            sys.path.insert(0, self.deployable_path)
+        self._started_at = time.perf_counter()
+        self.app_module = importlib.import_module("app")
+
+    def measure_cold_start(self, profile):
+        """
+        Cold start: from the import of the app module to the first successful
+        response to `profile`.
+        """
+        status_code = self._loop.run_until_complete(self.invoke(profile))
+        if status_code >= 400:
+            raise RuntimeError(f"First request failed with {status_code}")
+        self.cold_start_seconds = time.perf_counter() - self._started_at
+        return self.cold_start_seconds
+
+    async def invoke(self, profile):
+        import azure.functions as func
+
+        route_prefix = self.http_config.get("routePrefix", "api").strip("/")
+        path = "/".join(part for part in [route_prefix, profile.route] if part)
+        self._invocations += 1
+        req = func.HttpRequest(
+            method=profile.method,
+            url=f"http://localhost/{path}",
+            headers={"Content-Type": profile.content_type},
+            params={},
+            route_params={"route": profile.route},
+            body=profile.body,
+        )
+        context = _Context(self.app_path, f"benchmark-{self._invocations}")
+        response = await self.app_module.main(req, context)
+        return response.status_code
+
+    async def _run_async(self, profile, concurrency, num_requests):
+        limit = self.max_concurrent_requests
+        host_slots = asyncio.Semaphore(limit) if limit else None
+        remaining = num_requests
+        latencies = []
+        errors = 0
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started_at = time.perf_counter()
+                try:
+                    if host_slots is not None:
+                        async with host_slots:
+                            status_code = await self.invoke(profile)
+                    else:
+                        status_code = await self.invoke(profile)
+                except Exception:
+                    status_code = 500
+                if status_code < 400:
+                    latencies.append(time.perf_counter() - started_at)
+                else:
+                    errors += 1
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return summarize(
+            profile, concurrency, latencies, errors, time.perf_counter() - started_at
+        )
+
+    def run(self, profile, concurrency, num_requests):
+        if profile.method not in self.allowed_methods:
+            raise ValueError(
+                f"{profile.method} is not allowed by the function's httpTrigger"
+            )
+        return self._loop.run_until_complete(
+            self._run_async(profile, concurrency, num_requests)
+        )
+
+    def __enter__(self):
+        # the worker keeps one event loop for every invocation, do the same
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.close()
+
+    def peak_memory_bytes(self):
+        return peak_rss_bytes()
+
+
+class DockerHost:
+    """
+    Builds the deployable's image and runs it, the image bundles the
+    Functions host so requests are served exactly like in Azure.
+    """
+
+    def __init__(self, deployable_path, port=DOCKER_HOST_PORT, sku=None):
+        self.deployable_path = os.path.abspath(deployable_path)
+        self.port = port
+        # limit the container to the cores and memory of a premium plan SKU
+        self.sku = sku
+        host_config = _read_json(os.path.join(self.deployable_path, "host.json"))
+        self.route_prefix = (
+            host_config.get("extensions", {}).get("http", {}).get("routePrefix", "api")
+        ).strip("/")
+        self.container = None
+        self.cold_start_seconds = None
+        self._started_at = None
+        self._peak_memory = 0
+
+    def _url(self, route):
+        path = "/".join(part for part in [self.route_prefix, route] if part)
+        return f"http://localhost:{self.port}/{path}"
+
+    def _request(self, profile):
+        request = urllib.request.Request(
+            self._url(profile.route),
+            data=profile.body if profile.method != "GET" else None,
+            method=profile.method,
+            headers={"Content-Type": profile.content_type},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def __enter__(self):
+        import docker
+
+        from .utils import build_docker_image
+
+        image_tag = "bentoctl-azfunctions-benchmark:latest"
+        build_docker_image(self.deployable_path, image_tag)
+        docker_client = docker.from_env()
+        run_kwargs = {}
+        if self.sku is not None:
+            sku_profile = SKU_PROFILES[self.sku]
+            run_kwargs["nano_cpus"] = int(sku_profile["cores"] * 1e9)
+            run_kwargs["mem_limit"] = f"{int(sku_profile['memory_gb'] * 1024)}m"
+            run_kwargs["environment"] = {
+                "FUNCTIONS_WORKER_PROCESS_COUNT": str(sku_profile["cores"])
+            }
+        self._started_at = time.perf_counter()
+        self.container = docker_client.containers.run(
+            image_tag, detach=True, ports={"80/tcp": self.port}, **run_kwargs
+        )
+        return self
+
+    def measure_cold_start(self, profile):
+        """
+        Cold start: from the start of the container to the first successful
+        response to `profile`. The host answers (with 404s) before the Python
+        worker has loaded the bento, so only a successful response counts.
+        """
+        while time.perf_counter() - self._started_at < DOCKER_STARTUP_TIMEOUT:
+            try:
+                if self._request(profile) < 400:
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.2)
+        else:
+            raise TimeoutError("The deployable did not serve a request in time")
+        self.cold_start_seconds = time.perf_counter() - self._started_at
+        return self.cold_start_seconds
+
+    def __exit__(self, *exc_info):
+        self._update_peak_memory()
+        self.container.remove(force=True)
+
+    def _update_peak_memory(self):
+        stats = self.container.stats(stream=False).get("memory_stats", {})
+        self._peak_memory = max(
+            self._peak_memory, stats.get("max_usage", stats.get("usage", 0))
+        )
+
+    def run(self, profile, concurrency, num_requests):
+        latencies = []
+        errors = 0
+
+        def timed_request(_):
+            started_at = time.perf_counter()
+            try:
+                status_code = self._request(profile)
+            except (urllib.error.URLError, ConnectionError):
+                status_code = 500
+            return status_code, time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for status_code, latency in pool.map(timed_request, range(num_requests)):
+                if status_code < 400:
+                    latencies.append(latency)
+                else:
+                    errors += 1
+        wall_time = time.perf_counter() - started_at
+        self._update_peak_memory()
+        return summarize(profile, concurrency, latencies, errors, wall_time)
+
+    def peak_memory_bytes(self):
+        return self._peak_memory
+
+
+def run_benchmark(
+    deployable_path,
+    profiles,
+    concurrency_levels=(1,),
+    num_requests=100,
+    warmup_requests=5,
+    use_docker=False,
+    sku=None,
+):
+    """
+    Run every load profile at every concurrency level against the deployable
+    and return the report as a dict. With `use_docker` the container can be
+    limited to the resources of a premium plan `sku`.
+    """
+    if use_docker:
+        host = DockerHost(deployable_path, sku=sku)
+    else:
+        host = InProcessHost(deployable_path)
+    runs = []
+    with host:
+        if profiles:
+            host.measure_cold_start(profiles[0])
+        for profile in profiles:
+            if warmup_requests:
+                host.run(profile, 1, warmup_requests)
+            for concurrency in concurrency_levels:
+                runs.append(host.run(profile, concurrency, num_requests))
+        return {
+            "deployable": os.path.abspath(deployable_path),
+            "driver": "docker" if use_docker else "in-process",
+            "sku": sku if use_docker else None,
+            "cold_start_seconds": host.cold_start_seconds,
+            "peak_memory_bytes": host.peak_memory_bytes(),
+            "runs": runs,
+        }
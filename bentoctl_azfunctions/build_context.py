@@ -0,0 +1,227 @@
+"""
+Docker build context of a deployable as a gzipped tarball, built from cached
+chunks.
+
+Every file of the context is stored as its own gzip member (tar header, data
+and padding) in a cache directory, keyed by its path, size, mtime and mode.
+Gzip members can be concatenated into one valid gzip stream, so a build only
+compresses the files that changed since the previous one and streams the
+cached members of the others to the daemon as they are.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import stat
+import tarfile
+import time
+
+DOCKERIGNORE_FILE_NAME = ".dockerignore"
+DOCKERIGNORE_HEADER = """\
+# Generated by bentoctl: only the entries the Dockerfile uses are sent to
+# the daemon.
+*
+"""
+CACHE_DIR_NAME = ".bentoctl_context_cache"
+# speed over ratio, model weights hardly compress anyway
+COMPRESS_LEVEL = 1
+COPY_BUFFER_SIZE = 1024 * 1024
+TAR_BLOCK_SIZE = tarfile.BLOCKSIZE
+
+
+def write_dockerignore(context_path, entries):
+    """
+    Write a .dockerignore excluding everything but the top level `entries`.
+    """
+    dockerignore_path = os.path.join(context_path, DOCKERIGNORE_FILE_NAME)
+    with open(dockerignore_path, "w") as f:
+        f.write(DOCKERIGNORE_HEADER)
+        f.writelines(f"!{entry}\n" for entry in sorted(entries))
+    return dockerignore_path
+
+
+def read_dockerignore_entries(context_path):
+    """The entries kept by a .dockerignore written by `write_dockerignore`."""
+    dockerignore_path = os.path.join(context_path, DOCKERIGNORE_FILE_NAME)
+    with open(dockerignore_path, "r") as f:
+        lines = [line.strip() for line in f]
+    return [line[1:] for line in lines if line.startswith("!")]
+
+
+def _iter_context_files(context_path, entries):
+    """Paths (relative to the context) of the entries, directories first."""
+    for entry in sorted(entries):
+        entry_path = os.path.join(context_path, entry)
+        if not os.path.lexists(entry_path):
+            continue
+        yield entry
+        if os.path.isdir(entry_path) and not os.path.islink(entry_path):
+            for dirpath, dirnames, filenames in os.walk(entry_path):
+                dirnames.sort()
+                rel_dir = os.path.relpath(dirpath, context_path)
+                for name in dirnames + sorted(filenames):
+                    yield os.path.join(rel_dir, name)
+
+
+
+def context_size(context_path, entries):
+    """
+    Bytes of the files of `entries`, what docker sends of a context whose
+    .dockerignore keeps only them (and what `BuildContext` counts).
+    """
+    size = 0
+    for rel_path in _iter_context_files(context_path, entries):
+        st = os.lstat(os.path.join(context_path, rel_path))
+        if stat.S_ISREG(st.st_mode):
+            size += st.st_size
+    return size
+
+def _tar_info(path, rel_path, st):
+    info = tarfile.TarInfo(rel_path.replace(os.sep, "/"))
+    info.mode = stat.S_IMODE(st.st_mode)
+    info.mtime = int(st.st_mtime)
+    if stat.S_ISLNK(st.st_mode):
+        info.type = tarfile.SYMTYPE
+        info.linkname = os.readlink(path)
+    elif stat.S_ISDIR(st.st_mode):
+        info.type = tarfile.DIRTYPE
+    else:
+        info.size = st.st_size
+    return info
+
+
+def _write_member(out_path, path, info):
+    with open(out_path, "wb") as out, gzip.GzipFile(
+        fileobj=out, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0
+    ) as member:
+        member.write(info.tobuf(format=tarfile.GNU_FORMAT))
+        if info.isreg():
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, member, COPY_BUFFER_SIZE)
+            remainder = info.size % TAR_BLOCK_SIZE
+            if remainder:
+                member.write(b"\0" * (TAR_BLOCK_SIZE - remainder))
+
+
+class ContextReader:
+    """
+    File-like object reading the chunks one after the other, it records how
+    long the daemon took to read the whole context.
+    """
+
+    def __init__(self, chunk_paths):
+        self._chunk_paths = list(chunk_paths)
+        self._current = None
+        self.bytes_read = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def _next_chunk(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        if self._chunk_paths:
+            self._current = open(self._chunk_paths.pop(0), "rb")
+        return self._current
+
+    def read(self, size=-1):
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        data = []
+        remaining = size
+        while remaining != 0:
+            if self._current is None and self._next_chunk() is None:
+                break
+            block = self._current.read(remaining if remaining > 0 else -1)
+            if not block:
+                self._next_chunk()
+                continue
+            data.append(block)
+            if remaining > 0:
+                remaining -= len(block)
+        block = b"".join(data)
+        self.bytes_read += len(block)
+        if not block and self.finished_at is None:
+            self.finished_at = time.perf_counter()
+        return block
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+    @property
+    def upload_seconds(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class BuildContext:
+    """
+    The cached, gzipped context of `entries` of `context_path`. Call
+    `prepare()` to (re)compress the changed files, then `open()` to get the
+    stream for `docker_client.images.build(fileobj=..., custom_context=True,
+    encoding="gzip")`.
+    """
+
+    def __init__(self, context_path, entries, cache_dir=None):
+        self.context_path = os.path.abspath(context_path)
+        self.entries = list(entries)
+        self.cache_dir = cache_dir or os.path.join(
+            os.path.dirname(self.context_path), CACHE_DIR_NAME
+        )
+        self.chunk_paths = []
+        self.files = 0
+        self.files_reused = 0
+        self.context_bytes = 0
+        self.compressed_bytes = 0
+        self.prepare_seconds = None
+
+    def prepare(self):
+        started_at = time.perf_counter()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.chunk_paths = []
+        self.files = self.files_reused = 0
+        self.context_bytes = self.compressed_bytes = 0
+
+        for rel_path in _iter_context_files(self.context_path, self.entries):
+            path = os.path.join(self.context_path, rel_path)
+            st = os.lstat(path)
+            info = _tar_info(path, rel_path, st)
+            key = ":".join(
+                str(part)
+                for part in (info.name, info.type, info.size, st.st_mtime_ns, info.mode)
+            )
+            chunk_name = hashlib.sha256(key.encode("utf-8")).hexdigest() + ".gz"
+            chunk_path = os.path.join(self.cache_dir, chunk_name)
+            if os.path.exists(chunk_path):
+                self.files_reused += 1
+            else:
+                _write_member(chunk_path + ".tmp", path, info)
+                os.replace(chunk_path + ".tmp", chunk_path)
+            self.files += 1
+            self.context_bytes += info.size
+            self.compressed_bytes += os.path.getsize(chunk_path)
+            self.chunk_paths.append(chunk_path)
+
+        # the end of the archive: two empty blocks
+        end_path = os.path.join(self.cache_dir, "end-of-archive.gz")
+        if not os.path.exists(end_path):
+            with gzip.open(end_path, "wb", compresslevel=COMPRESS_LEVEL) as end:
+                end.write(b"\0" * (2 * TAR_BLOCK_SIZE))
+        self.chunk_paths.append(end_path)
+        self.compressed_bytes += os.path.getsize(end_path)
+
+        # chunks of files that changed or are gone won't be used again
+        used_chunks = set(self.chunk_paths)
+        for name in os.listdir(self.cache_dir):
+            chunk_path = os.path.join(self.cache_dir, name)
+            if chunk_path not in used_chunks:
+                os.remove(chunk_path)
+
+        self.prepare_seconds = time.perf_counter() - started_at
+        return self
+
+    def open(self):
+        return ContextReader(self.chunk_paths)
@@ -0,0 +1,164 @@
+"""
+Capacity planning from local load tests of a deployable.
+
+The deployable is load tested at increasing concurrency, the highest
+throughput whose p95 latency stays within the SLO is the sustainable
+capacity of one instance. The instance counts and HTTP concurrency limits
+for a target request rate are derived from it for every premium plan SKU.
+
+With the docker driver the container is limited to the cores and memory of
+each SKU. The in-process driver runs a single worker process, so its
+capacity is measured once and scaled by the number of cores (one worker
+process per core) for every SKU.
+"""
+import math
+
+from .benchmark import run_benchmark
+from .sku_profiles import OUTSTANDING_REQUESTS_FACTOR, SKU_PROFILES
+
+# share of the measured capacity an instance is planned to run at, leaving
+# headroom for bursts until new instances are ready
+TARGET_UTILIZATION = 0.7
+
+
+def sustainable_capacity(runs, latency_slo_ms):
+    """
+    The run with the highest throughput that had no errors and a p95 latency
+    within the SLO, or None when no run met the SLO.
+    """
+    best_run = None
+    for run in runs:
+        p95 = run["latency_ms"]["p95"]
+        if run["errors"] or p95 is None or p95 > latency_slo_ms:
+            continue
+        if best_run is None or run["throughput_rps"] > best_run["throughput_rps"]:
+            best_run = run
+    return best_run
+
+
+def plan_instances(capacity_rps, target_rps, peak_rps, utilization=TARGET_UTILIZATION):
+    """Instances needed for the target rate and the burst up to the peak rate."""
+    planned_rps = capacity_rps * utilization
+    min_instances = max(1, math.ceil(target_rps / planned_rps))
+    max_burst = max(min_instances, math.ceil(peak_rps / planned_rps))
+    return min_instances, max_burst
+
+
+def _instance_capacity(runs, profiles, latency_slo_ms):
+    """
+    Capacity of an instance for the slowest of the profiles, with the
+    concurrency it was reached at.
+    """
+    capacity = None
+    for profile in profiles:
+        best_run = sustainable_capacity(
+            [run for run in runs if run["profile"] == profile.name], latency_slo_ms
+        )
+        if best_run is None:
+            return None
+        if capacity is None or best_run["throughput_rps"] < capacity["throughput_rps"]:
+            capacity = best_run
+    return capacity
+
+
+def _sku_plan(sku, capacity_rps, concurrency, target_rps, peak_rps):
+    min_instances, max_burst = plan_instances(capacity_rps, target_rps, peak_rps)
+    cores = SKU_PROFILES[sku]["cores"]
+    return {
+        "sku": sku,
+        "capacity_rps": capacity_rps,
+        "min_instances": min_instances,
+        "max_burst": max_burst,
+        "worker_process_count": cores,
+        "max_concurrent_requests": concurrency,
+        "max_outstanding_requests": OUTSTANDING_REQUESTS_FACTOR * concurrency,
+        # cost proxy, the SKU prices scale with their cores
+        "core_count": cores * min_instances,
+    }
+
+
+def plan_capacity(
+    deployable_path,
+    profiles,
+    target_rps,
+    latency_slo_ms,
+    peak_rps=None,
+    skus=None,
+    concurrency_levels=(1, 2, 4, 8, 16, 32),
+    num_requests=200,
+    warmup_requests=5,
+    use_docker=False,
+):
+    """
+    Measure the capacity of an instance for every SKU and plan the instances
+    needed for `target_rps` (and bursts up to `peak_rps`, twice the target by
+    default) within `latency_slo_ms` at p95. Returns the report as a dict,
+    `recommended` is the plan needing the fewest cores at the target rate.
+    """
+    skus = list(skus or SKU_PROFILES)
+    peak_rps = peak_rps if peak_rps is not None else 2 * target_rps
+    benchmarks = {}
+    plans = []
+
+    def benchmark(sku=None):
+        return run_benchmark(
+            deployable_path,
+            profiles,
+            concurrency_levels=concurrency_levels,
+            num_requests=num_requests,
+            warmup_requests=warmup_requests,
+            use_docker=use_docker,
+            sku=sku,
+        )
+
+    if not use_docker:
+        report = benchmark()
+        benchmarks["single_worker"] = report
+        capacity = _instance_capacity(report["runs"], profiles, latency_slo_ms)
+    for sku in skus:
+        if use_docker:
+            report = benchmark(sku)
+            benchmarks[sku] = report
+            capacity = _instance_capacity(report["runs"], profiles, latency_slo_ms)
+        if capacity is None:
+            continue
+        if use_docker:
+            capacity_rps = capacity["throughput_rps"]
+            concurrency = capacity["concurrency"]
+        else:
+            cores = SKU_PROFILES[sku]["cores"]
+            capacity_rps = capacity["throughput_rps"] * cores
+            concurrency = capacity["concurrency"] * cores
+        plans.append(_sku_plan(sku, capacity_rps, concurrency, target_rps, peak_rps))
+
+    recommended = min(
+        plans, key=lambda plan: (plan["core_count"], plan["max_burst"]), default=None
+    )
+    return {
+        "target_rps": target_rps,
+        "peak_rps": peak_rps,
+        "latency_slo_ms": latency_slo_ms,
+        "driver": "docker" if use_docker else "in-process",
+        "plans": plans,
+        "recommended": recommended,
+        "benchmarks": benchmarks,
+    }
+
+
+def write_plan_to_values(plan, values_file):
+    """Update a generated bentoctl.tfvars with a plan from `plan_capacity`."""
+    from .values import DeploymentValues
+
+    values = DeploymentValues.from_file(values_file)
+    values.update(
+        {
+            "premium_plan_sku": plan["sku"],
+            "min_instances": plan["min_instances"],
+            "max_burst": plan["max_burst"],
+            "worker_process_count": plan["worker_process_count"],
+            "max_concurrent_requests": plan["max_concurrent_requests"],
+            "max_outstanding_requests": plan["max_outstanding_requests"],
+        }
+    )
+    values.to_file(values_file)
+    return values
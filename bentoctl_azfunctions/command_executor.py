@@ -0,0 +1,118 @@
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+# seconds the result of a read-only command (`az acr show`, `cors show`...)
+# is reused for.
+DEFAULT_CACHE_TTL = 10
+
+CommandTiming = namedtuple("CommandTiming", ["command", "seconds", "cached"])
+
+
+def _decode_output(stdout, stderr):
+    default_encoding = sys.getfilesystemencoding()
+    result = stdout.decode(default_encoding)
+    if result.endswith("\x1b[0m"):
+        # remove console color code: \x1b[0m
+        # https://github.com/Azure/azure-cli/issues/9903
+        result = result.replace("\x1b[0m", "")
+    try:
+        return json.loads(result), stderr.decode(default_encoding)
+    except json.JSONDecodeError:
+        return result, stderr.decode(default_encoding)
+
+
+class CommandExecutor:
+    """
+    Runs shell commands (mostly `az ...`) for the operator.
+
+    - `run` executes a command and returns its (parsed) stdout and stderr.
+      Read-only commands can pass `cache_ttl` to reuse a recent result, any
+      command run without it clears the cache since it may change state.
+    - `submit` runs a callable on a bounded thread pool so independent
+      commands do not have to wait for each other.
+    - every call is timed and recorded in `timings`.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self.timings = []
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="bentoctl-az"
+                )
+            return self._pool
+
+    def _record(self, command, seconds, cached):
+        timing = CommandTiming(" ".join(command), seconds, cached)
+        with self._lock:
+            self.timings.append(timing)
+        logger.debug(
+            "%s took %.3fs%s", timing.command, seconds, " (cached)" if cached else ""
+        )
+
+    def run(self, command, cwd=None, env=None, shell_mode=False, cache_ttl=None):
+        started_at = time.perf_counter()
+        cache_key = tuple(command)
+        if cache_ttl is not None:
+            with self._lock:
+                cached = self._cache.get(cache_key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._record(command, time.perf_counter() - started_at, True)
+                return cached[1]
+        else:
+            self.clear_cache()
+
+        proc = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=shell_mode,
+            cwd=cwd,
+            env=env,
+        )
+        stdout, stderr = proc.communicate()
+        self._record(command, time.perf_counter() - started_at, False)
+        if proc.returncode != 0:
+            raise Exception(
+                f'Failed to run command {" ".join(command)}: '
+                f"{stderr.decode(sys.getfilesystemencoding())}"
+            )
+
+        result = _decode_output(stdout, stderr)
+        if cache_ttl is not None:
+            with self._lock:
+                self._cache[cache_key] = (time.monotonic() + cache_ttl, result)
+        return result
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` on the executor's thread pool and return a
+        `concurrent.futures.Future` for its result.
+        """
+        return self._get_pool().submit(fn, *args, **kwargs)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def total_time(self):
+        return sum(timing.seconds for timing in self.timings)
+
+
+# shared by every module of the operator
+executor = CommandExecutor()
@@ -1,40 +1,437 @@
+import json
 import os
 import shutil
 
+from . import profiling
+from .build_context import write_dockerignore
+from .deployable_sync import MANIFEST_FILE_NAME, format_bytes, sync_tree
+from .sku_profiles import DEFAULT_SKU, get_worker_settings
+from .slimming import (
+    directory_sizes,
+    estimate_image_size,
+    make_exclude_filter,
+    read_ignore_file,
+)
+from .utils import get_bento_apis
+
 root_dir = os.path.join(os.path.dirname(__file__), "azurefunctions")
 HOST_JSON_FILE = os.path.join(root_dir, "host.json")
 LOCAL_SETTINGS_FILE = os.path.join(root_dir, "local.settings.json")
 DOCKERFILE_TEMPLATE = os.path.join(root_dir, "Dockerfile")
 APP_INIT_FILE = os.path.join(root_dir, "app_init.py")
+BATCHING_FILE = os.path.join(root_dir, "batching.py")
+METRICS_FILE = os.path.join(root_dir, "metrics.py")
+MODEL_MMAP_FILE = os.path.join(root_dir, "model_mmap.py")
+RESPONSE_CACHE_FILE = os.path.join(root_dir, "response_cache.py")
+BATCH_JOBS_FILE = os.path.join(root_dir, "batch_jobs.py")
+NUMPY_WIRE_FILE = os.path.join(root_dir, "numpy_wire.py")
+BATCH_FUNCTION_JSON_FILE = os.path.join(root_dir, "batch_function.json")
+BATCH_FUNCTION_NAME = "bentoctl_batch"
 FUNCTION_JSON_FILE = os.path.join(root_dir, "function.json")
+FUNCTION_APP_FILE = os.path.join(root_dir, "function_app.py")
+WARMUP_FILE = os.path.join(root_dir, "warmup.py")
+WARMUP_FILE_NAME = "bentoctl_warmup.py"
+# folders of the functions generated for every API start with this prefix
+API_FUNCTION_PREFIX = "api_"
+API_FUNCTION_METHODS = ["post"]
+AUTH_LEVELS = {"anonymous": "Anonymous", "function": "Function", "admin": "Admin"}
+APP_SETTINGS_FILE_NAME = "bentoctl_settings.json"
+
+# Top level entries of the deployable that get their own COPY layers, ordered
+# from the least to the most frequently changed so that a code change does not
+# invalidate the layers holding the models. Entries not listed here are copied
+# right before `src`.
+DOCKER_COPY_LAYERS = [
+    ["models"],
+    [
+        "host.json",
+        "local.settings.json",
+        "function_app.py",
+        "app",
+        BATCH_FUNCTION_NAME,
+    ],
+    ["apis", "README.md"],
+    None,
+    ["src"],
+    ["bento.yaml"],
+]
+# `env` is copied by the dependencies stage of the Dockerfile.
+DOCKER_COPY_EXCLUDES = [
+    "env",
+    "Dockerfile",
+    ".dockerignore",
+    MANIFEST_FILE_NAME,
+    WARMUP_FILE_NAME,
+    ".bentoctlignore",
+]
+
+BUILDKIT_SYNTAX_DIRECTIVE = "# syntax=docker/dockerfile:1\n"
+PIP_CACHE_MOUNT = "--mount=type=cache,target=/root/.cache/pip "
+CONDA_CACHE_MOUNT = "--mount=type=cache,target=/opt/conda/pkgs "
+
+BASE_IMAGE = "mcr.microsoft.com/azure-functions/python:3.0-python3.8"
+# HTTP streaming needs the v4 runtime and the Python v2 programming model
+STREAMING_BASE_IMAGE = "mcr.microsoft.com/azure-functions/python:4-python3.8"
+STREAMING_RUNTIME_ENV = "ENV PYTHON_ENABLE_INIT_INDEXING=1\n"
+STREAMING_REQUIREMENTS = ["azurefunctions-extensions-http-fastapi"]
+# the v4 runtime refuses extension bundles older than 2.6.1
+STREAMING_EXTENSION_BUNDLE_VERSION = "[4.*, 5.0.0)"
+BATCH_JOBS_REQUIREMENTS = ["azure-storage-blob"]
+
+# framework caches written while warming up are kept in the image
+PREWARM_STAGE = f"""
+# load the runners and byte-compile the code at build time so new instances
+# start from warm caches
+FROM runtime AS prewarmed
+ENV BENTOCTL_CACHE_DIR=/opt/bentoctl-cache
+ENV TORCHINDUCTOR_CACHE_DIR=$BENTOCTL_CACHE_DIR/torchinductor \\
+    NUMBA_CACHE_DIR=$BENTOCTL_CACHE_DIR/numba \\
+    HF_HOME=$BENTOCTL_CACHE_DIR/huggingface \\
+    TFHUB_CACHE_DIR=$BENTOCTL_CACHE_DIR/tfhub
+COPY {WARMUP_FILE_NAME} ./
+RUN python ./{WARMUP_FILE_NAME}
+"""
+
+
+def get_base_image(streaming=False, slim_base_image=False):
+    base_image = STREAMING_BASE_IMAGE if streaming else BASE_IMAGE
+    return f"{base_image}-slim" if slim_base_image else base_image
+
+
+def get_docker_copy_layers(deployable_path):
+    """
+    Group the top level entries of the deployable into the COPY layers of the
+    runtime stage, following the order in DOCKER_COPY_LAYERS. Only entries
+    that exist in the deployable are returned.
+    """
+    entries = sorted(
+        entry
+        for entry in os.listdir(deployable_path)
+        if entry not in DOCKER_COPY_EXCLUDES
+    )
+    known_entries = {
+        entry for layer in DOCKER_COPY_LAYERS if layer is not None for entry in layer
+    }
+
+    layers = []
+    for layer in DOCKER_COPY_LAYERS:
+        if layer is None:
+            layer = [entry for entry in entries if entry not in known_entries]
+        layer_entries = [entry for entry in layer if entry in entries]
+        if layer_entries:
+            layers.append(layer_entries)
+    return layers
+
+
+def get_docker_context_entries(deployable_path, prewarm=False):
+    """
+    Top level entries of the deployable the Dockerfile uses, everything else
+    is left out of the build context.
+    """
+    entries = ["Dockerfile", "env"]
+    for layer_entries in get_docker_copy_layers(deployable_path):
+        entries.extend(layer_entries)
+    if prewarm:
+        entries.append(WARMUP_FILE_NAME)
+    return entries
+
+
+def _copy_instructions(layer_entries, deployable_path):
+    files = []
+    instructions = []
+    for entry in layer_entries:
+        if os.path.isdir(os.path.join(deployable_path, entry)):
+            instructions.append(f"COPY ./{entry} ./{entry}")
+        else:
+            files.append(entry)
+    if files:
+        instructions.insert(0, f"COPY {' '.join(files)} ./")
+    return instructions
 
 
-def generate_dockerfile_in(deployable_path, bento_metadata):
+def generate_dockerfile_in(
+    deployable_path,
+    bento_metadata,
+    use_buildkit=False,
+    streaming=False,
+    prewarm=False,
+    slim_base_image=False,
+    batch_jobs=False,
+):
+    """
+    Render the Dockerfile template into the deployable. Has to be called after
+    all the other files of the deployable are in place since the COPY layers
+    are derived from its contents.
+
+    With `use_buildkit` the pip and conda downloads are kept in BuildKit cache
+    mounts across builds. The image then has to be built with BuildKit
+    enabled (`DOCKER_BUILDKIT=1`).
+
+    With `streaming` the image is based on the v4 Functions runtime with the
+    HTTP streaming extension installed.
+
+    With `prewarm` a last stage loads the bento's runners and byte-compiles
+    its code and packages during the build (see warmup.py).
+
+    With `slim_base_image` the `-slim` variant of the Functions base image,
+    without the .NET SDK and build tools, is used.
+
+    With `batch_jobs` the blob storage client used by the batch jobs is
+    installed.
+
+    A .dockerignore keeping only the files the Dockerfile uses is written
+    next to it.
+    """
+    copy_instructions = []
+    for layer_entries in get_docker_copy_layers(deployable_path):
+        copy_instructions.extend(_copy_instructions(layer_entries, deployable_path))
+
     dockerfile_path = os.path.join(deployable_path, "Dockerfile")
     with open(DOCKERFILE_TEMPLATE, "r") as template_file, open(
         dockerfile_path, "w"
     ) as dockerfile:
         template = template_file.read()
+        extra_requirements = STREAMING_REQUIREMENTS if streaming else []
+        if batch_jobs:
+            extra_requirements = extra_requirements + BATCH_JOBS_REQUIREMENTS
         dockerfile.write(
             template.format(
                 bentoml_version=bento_metadata["bentoml_version"],
                 python_version=bento_metadata["python_version"],
+                base_image=get_base_image(streaming, slim_base_image),
+                runtime_env=STREAMING_RUNTIME_ENV if streaming else "",
+                extra_requirements="".join(
+                    f" {requirement}" for requirement in extra_requirements
+                ),
+                syntax_directive=BUILDKIT_SYNTAX_DIRECTIVE if use_buildkit else "",
+                pip_cache_mount=PIP_CACHE_MOUNT if use_buildkit else "",
+                conda_cache_mount=CONDA_CACHE_MOUNT if use_buildkit else "",
+                copy_layers="\n".join(copy_instructions),
+                prewarm_stage=PREWARM_STAGE if prewarm else "",
             )
         )
+    write_dockerignore(
+        deployable_path, get_docker_context_entries(deployable_path, prewarm)
+    )
 
     return dockerfile_path
 
 
-def generate_function_app_module_in(deployable_path):
+def generate_host_json_in(
+    deployable_path, premium_plan_sku=DEFAULT_SKU, streaming=False, **overrides
+):
+    """
+    Render host.json with HTTP concurrency limits sized for the SKU. Any of
+    `max_concurrent_requests`, `max_outstanding_requests` and
+    `dynamic_throttles_enabled` can be overridden. The deployed function app
+    also sets them through app settings so the deployment spec takes
+    precedence at runtime.
+
+    With `streaming` the extension bundle is one the v4 runtime accepts.
+    """
+    worker_settings = get_worker_settings(premium_plan_sku)
+    worker_settings.update(
+        {name: value for name, value in overrides.items() if value is not None}
+    )
+
+    with open(HOST_JSON_FILE, "r") as f:
+        host_config = json.load(f)
+    http_config = host_config.setdefault("extensions", {}).setdefault("http", {})
+    http_config["maxConcurrentRequests"] = worker_settings["max_concurrent_requests"]
+    http_config["maxOutstandingRequests"] = worker_settings[
+        "max_outstanding_requests"
+    ]
+    http_config["dynamicThrottlesEnabled"] = worker_settings[
+        "dynamic_throttles_enabled"
+    ]
+    if streaming:
+        host_config["extensionBundle"]["version"] = STREAMING_EXTENSION_BUNDLE_VERSION
+
+    host_json_path = os.path.join(deployable_path, "host.json")
+    with open(host_json_path, "w") as f:
+        json.dump(host_config, f, indent=2)
+
+    return host_json_path
+
+
+def get_api_functions(bento_path, auth_levels=None):
+    """
+    One function per API of the bento, named after the API. `auth_levels`
+    maps API names to their auth level (anonymous, function or admin),
+    APIs not listed are anonymous.
+    """
+    apis = get_bento_apis(bento_path)
+    auth_levels = auth_levels or {}
+    unknown_apis = set(auth_levels) - {api["name"] for api in apis}
+    if unknown_apis:
+        raise Exception(f"Auth levels given for unknown APIs: {sorted(unknown_apis)}")
+
+    api_functions = []
+    for api in apis:
+        auth_level = auth_levels.get(api["name"], "anonymous").lower()
+        if auth_level not in AUTH_LEVELS:
+            raise Exception(
+                f"Invalid auth level {auth_level} for API {api['name']}. "
+                f"Allowed values: {', '.join(AUTH_LEVELS)}"
+            )
+        api_functions.append(
+            {
+                "name": f"{API_FUNCTION_PREFIX}{api['name']}",
+                "route": api["route"],
+                "methods": API_FUNCTION_METHODS,
+                "auth_level": AUTH_LEVELS[auth_level],
+            }
+        )
+    return api_functions
+
+
+def _is_api_function_dir(path):
+    function_json_path = os.path.join(path, "function.json")
+    if not os.path.exists(function_json_path):
+        return False
+    with open(function_json_path, "r") as f:
+        return json.load(f).get("scriptFile") == "../app/__init__.py"
+
+
+def generate_api_functions_in(deployable_path, api_functions):
+    """
+    Write a function folder (`function.json` only) for every API function.
+    They all run the app module, the host routes each API to its own
+    function so the APIs no longer share the catch-all function. Returns the
+    function routes, keyed by function name, for the app settings.
+    """
+    with open(FUNCTION_JSON_FILE, "r") as f:
+        function_config = json.load(f)
+
+    # remove the functions of APIs that are gone from the bento
+    function_names = {api_function["name"] for api_function in api_functions}
+    for entry in os.listdir(deployable_path):
+        entry_path = os.path.join(deployable_path, entry)
+        if (
+            entry.startswith(API_FUNCTION_PREFIX)
+            and entry not in function_names
+            and _is_api_function_dir(entry_path)
+        ):
+            shutil.rmtree(entry_path)
+
+    function_routes = {}
+    for api_function in api_functions:
+        function_path = os.path.join(deployable_path, api_function["name"])
+        os.makedirs(function_path, exist_ok=True)
+        trigger = dict(function_config["bindings"][0])
+        trigger.update(
+            {
+                "authLevel": api_function["auth_level"],
+                "methods": api_function["methods"],
+                "route": api_function["route"],
+            }
+        )
+        config = {
+            "scriptFile": "../app/__init__.py",
+            "entryPoint": "main",
+            "bindings": [trigger] + function_config["bindings"][1:],
+        }
+        with open(os.path.join(function_path, "function.json"), "w") as f:
+            json.dump(config, f, indent=2)
+        function_routes[api_function["name"]] = api_function["route"]
+    return function_routes
+
+
+def generate_function_app_module_in(
+    deployable_path,
+    app_settings=None,
+    streaming=False,
+    api_functions=None,
+    batch_jobs=False,
+):
     """
     Make an app module that stores the azure function app which will
     load our service and when a request arrives, uses bentoml's ASGI Middleware
     to serve the response.
+
+    `app_settings` are written to `bentoctl_settings.json` inside the module
+    and read by the app at startup (see `DEFAULT_SETTINGS` in app_init.py).
+
+    With `streaming` the function is declared in a `function_app.py` (Python
+    v2 programming model) that streams response bodies, instead of the
+    module's `function.json`.
+
+    `api_functions` (see `get_api_functions`) adds a function for each API
+    next to the catch-all one, which keeps serving the other routes.
+
+    With `batch_jobs` a queue-triggered function runs batch inference jobs
+    (see batch_jobs.py) next to the HTTP ones.
     """
+    if (api_functions or batch_jobs) and streaming:
+        raise Exception(
+            "Per API functions and batch jobs need function.json files, they "
+            "can't be combined with streaming."
+        )
     app_module_path = os.path.join(deployable_path, "app")
-    os.mkdir(app_module_path)
+    os.makedirs(app_module_path, exist_ok=True)
     shutil.copy(APP_INIT_FILE, os.path.join(app_module_path, "__init__.py"))
-    shutil.copy(FUNCTION_JSON_FILE, app_module_path)
+    shutil.copy(BATCHING_FILE, app_module_path)
+    shutil.copy(METRICS_FILE, app_module_path)
+    shutil.copy(MODEL_MMAP_FILE, app_module_path)
+    shutil.copy(RESPONSE_CACHE_FILE, app_module_path)
+    shutil.copy(BATCH_JOBS_FILE, app_module_path)
+    shutil.copy(NUMPY_WIRE_FILE, app_module_path)
+
+    function_json_path = os.path.join(app_module_path, "function.json")
+    function_app_path = os.path.join(deployable_path, "function_app.py")
+    # the two programming models can't be mixed in one function app
+    if streaming:
+        if os.path.exists(function_json_path):
+            os.remove(function_json_path)
+        shutil.copy(FUNCTION_APP_FILE, function_app_path)
+    else:
+        if os.path.exists(function_app_path):
+            os.remove(function_app_path)
+        shutil.copy(FUNCTION_JSON_FILE, function_json_path)
+
+    batch_function_path = os.path.join(deployable_path, BATCH_FUNCTION_NAME)
+    if batch_jobs:
+        os.makedirs(batch_function_path, exist_ok=True)
+        shutil.copy(
+            BATCH_FUNCTION_JSON_FILE,
+            os.path.join(batch_function_path, "function.json"),
+        )
+    elif os.path.exists(batch_function_path):
+        shutil.rmtree(batch_function_path)
+
+    app_settings = dict(app_settings or {})
+    app_settings["function_routes"] = generate_api_functions_in(
+        deployable_path, api_functions or []
+    )
+
+    with open(os.path.join(app_module_path, APP_SETTINGS_FILE_NAME), "w") as f:
+        json.dump(app_settings, f, indent=2)
+
+    return app_module_path
+
+
+def print_deployable_size_report(deployable_path, base_image):
+    sizes = directory_sizes(deployable_path, depth=2)
+    # only what ends up in the image
+    top_level_entries = [
+        entry
+        for entry in sizes
+        if "/" not in entry and (entry == "env" or entry not in DOCKER_COPY_EXCLUDES)
+    ]
+    print("Deployable size by directory:")
+    for entry in sorted(top_level_entries, key=sizes.get, reverse=True):
+        print(f"  {format_bytes(sizes[entry]):>10}  {entry}")
+        if entry == "models":
+            model_entries = [e for e in sizes if e.startswith("models/")]
+            for model_entry in sorted(model_entries, key=sizes.get, reverse=True):
+                print(f"  {format_bytes(sizes[model_entry]):>10}    {model_entry}")
+    deployable_size = sum(sizes[entry] for entry in top_level_entries)
+    print(
+        f"Estimated image size: "
+        f"{format_bytes(estimate_image_size(base_image, deployable_size))} "
+        f"(base image {base_image} and bento files, "
+        "without the packages installed from env/)"
+    )
 
 
 def create_deployable(
@@ -42,6 +439,17 @@ def create_deployable(
     destination_dir: str,
     bento_metadata: dict,
     overwrite_deployable=None,
+    fast_start: bool = False,
+    ready_timeout: float = 120.0,
+    use_buildkit: bool = False,
+    premium_plan_sku: str = DEFAULT_SKU,
+    host_settings: dict = None,
+    streaming: bool = False,
+    prewarm: bool = False,
+    slim_base_image: bool = False,
+    per_api_functions: bool = False,
+    api_auth_levels: dict = None,
+    batch_jobs: bool = False,
 ):
     """
     The deployable is the bento along with all the modifications (if any)
@@ -55,6 +463,47 @@ def create_deployable(
         directory to create the deployable into.
     bento_metadata: dict
         metadata about the bento.
+    fast_start: bool
+        Load the bento in a background thread when the worker starts instead
+        of at import time. Requests wait for it to be ready and `/healthz`
+        answers right away.
+    ready_timeout: float
+        Seconds a request waits for the bento to load in fast start mode
+        before it is answered with a 503.
+    use_buildkit: bool
+        Use BuildKit cache mounts for the pip and conda downloads in the
+        generated Dockerfile. Requires building with BuildKit enabled.
+    premium_plan_sku: str
+        SKU the HTTP concurrency limits in host.json are sized for.
+        `bentoctl build` doesn't pass the deployment spec, its deployables
+        are sized for DEFAULT_SKU. Deployed apps get the limits of their
+        spec's SKU from the app settings set by the terraform template,
+        which override host.json.
+    host_settings: dict
+        Overrides for `max_concurrent_requests`, `max_outstanding_requests`
+        and `dynamic_throttles_enabled` in host.json.
+    streaming: bool
+        Stream response bodies to the client as the bento produces them.
+        Requires the v4 Functions runtime, falls back to buffered responses
+        when HTTP streaming is not available.
+    prewarm: bool
+        Add a Dockerfile stage that loads the runners and byte-compiles the
+        code during `docker build`, so framework caches and `.pyc` files are
+        part of the image instead of being rebuilt by every new instance.
+    slim_base_image: bool
+        Build on the `-slim` variant of the Functions base image.
+    per_api_functions: bool
+        Declare a function for each API of the bento, with its own route and
+        auth level, instead of serving every API from the catch-all function.
+        Concurrency limits per API are set with `api_concurrency_limits` in
+        the deployment spec.
+    api_auth_levels: dict
+        Auth level (anonymous, function or admin) of the API functions, keyed
+        by API name. APIs not listed are anonymous.
+    batch_jobs: bool
+        Add a queue-triggered function that runs batch inference jobs over
+        JSON lines blobs. The queue and containers are created by the
+        terraform template when `enable_batch_jobs` is set in the spec.
 
     Returns
     -------
@@ -69,15 +518,60 @@ def create_deployable(
     deployable_path = os.path.join(destination_dir, "bentoctl_deployable")
     docker_context_path = deployable_path
 
-    # copy over the bento bundle
-    shutil.copytree(bento_path, deployable_path)
-    # Dockerfile
-    dockerfile_path = generate_dockerfile_in(deployable_path, bento_metadata)
-    # host.json file
-    shutil.copy(HOST_JSON_FILE, deployable_path)
-    # local.settings.json file
-    shutil.copy(LOCAL_SETTINGS_FILE, deployable_path)
-    generate_function_app_module_in(deployable_path)
+    with profiling.stage("create_deployable"):
+        # copy over the bento bundle, reusing files from the previous build and
+        # leaving out caches and the patterns in the bento's .bentoctlignore
+        with profiling.stage("sync_bento") as sync_stage:
+            exclude = make_exclude_filter(read_ignore_file(bento_path))
+            sync_report = sync_tree(bento_path, deployable_path, exclude=exclude)
+            sync_stage.args.update(sync_report._asdict())
+        print(
+            f"Deployable synced: {sync_report.files_copied} files copied "
+            f"({format_bytes(sync_report.bytes_copied)}), "
+            f"{sync_report.files_reused} files reused "
+            f"({format_bytes(sync_report.bytes_reused)}), "
+            f"{sync_report.files_removed} stale files removed."
+        )
+        with profiling.stage("generate_function_app"):
+            # host.json file
+            generate_host_json_in(
+                deployable_path,
+                premium_plan_sku,
+                streaming=streaming,
+                **(host_settings or {}),
+            )
+            # local.settings.json file
+            shutil.copy(LOCAL_SETTINGS_FILE, deployable_path)
+            api_functions = None
+            if per_api_functions:
+                api_functions = get_api_functions(bento_path, api_auth_levels)
+            generate_function_app_module_in(
+                deployable_path,
+                app_settings={"fast_start": fast_start, "ready_timeout": ready_timeout},
+                streaming=streaming,
+                api_functions=api_functions,
+                batch_jobs=batch_jobs,
+            )
+            warmup_path = os.path.join(deployable_path, WARMUP_FILE_NAME)
+            if prewarm:
+                shutil.copy(WARMUP_FILE, warmup_path)
+            elif os.path.exists(warmup_path):
+                os.remove(warmup_path)
+        # Dockerfile, generated last since its layers follow the deployable's content
+        with profiling.stage("generate_dockerfile"):
+            dockerfile_path = generate_dockerfile_in(
+                deployable_path,
+                bento_metadata,
+                use_buildkit=use_buildkit,
+                streaming=streaming,
+                prewarm=prewarm,
+                slim_base_image=slim_base_image,
+                batch_jobs=batch_jobs,
+            )
+        with profiling.stage("size_report"):
+            print_deployable_size_report(
+                deployable_path, get_base_image(streaming, slim_base_image)
+            )
 
     additional_build_args = None
     return dockerfile_path, docker_context_path, additional_build_args
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+from collections import namedtuple
+
+MANIFEST_FILE_NAME = ".bentoctl_manifest.json"
+# directories whose files are hardlinked (when possible) instead of copied.
+LINKABLE_DIRS = ("models",)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SyncReport = namedtuple(
+    "SyncReport",
+    [
+        "files_copied",
+        "files_reused",
+        "files_removed",
+        "bytes_copied",
+        "bytes_reused",
+    ],
+)
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def format_bytes(num_bytes):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}TB"
+
+
+def load_manifest(deployable_path):
+    manifest_path = os.path.join(deployable_path, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _walk_files(root):
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            yield os.path.relpath(path, root)
+
+
+def _is_linkable(rel_path):
+    return rel_path.split(os.sep, 1)[0] in LINKABLE_DIRS
+
+
+def _place_file(src_file, dst_file, rel_path):
+    """
+    Put a fresh copy of src_file at dst_file. Returns True if the file was
+    hardlinked, False if its bytes were copied.
+    """
+    if os.path.lexists(dst_file):
+        # never write through an existing hardlink into the bento store
+        os.remove(dst_file)
+    os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+    if _is_linkable(rel_path):
+        try:
+            os.link(src_file, dst_file)
+            return True
+        except OSError:
+            pass
+    shutil.copy2(src_file, dst_file)
+    return False
+
+
+def _is_unchanged(src_stat, dst_file, entry):
+    """
+    Cheap check using only stat information: the source has the same size
+    and mtime as recorded in the manifest (or, without a manifest entry,
+    as the destination file left by a previous full copy).
+    """
+    try:
+        dst_stat = os.stat(dst_file)
+    except FileNotFoundError:
+        return False
+    if dst_stat.st_size != src_stat.st_size:
+        return False
+    if entry is not None:
+        return (
+            entry["size"] == src_stat.st_size
+            and entry["mtime_ns"] == src_stat.st_mtime_ns
+        )
+    return dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+
+
+def _remove_empty_parents(root, rel_path):
+    parent = os.path.dirname(rel_path)
+    while parent:
+        parent_path = os.path.join(root, parent)
+        if not os.path.isdir(parent_path) or os.listdir(parent_path):
+            return
+        os.rmdir(parent_path)
+        parent = os.path.dirname(parent)
+
+
+def sync_tree(src_path, deployable_path, exclude=None):
+    """
+    Incrementally mirror `src_path` into `deployable_path`. Files for which
+    `exclude(rel_path)` is true are left out.
+
+    A manifest with the size, mtime and sha256 of every synced file is kept in
+    the deployable. Files whose size and mtime did not change are reused
+    without being read, files whose content hash did not change are reused
+    after hashing, and only the remaining files are copied (files under
+    `models/` are hardlinked when the filesystem allows it). Files that were
+    synced before but no longer exist in `src_path` are removed.
+
+    Returns
+    -------
+    SyncReport
+        counts of the files and bytes that were copied, reused and removed.
+    """
+    os.makedirs(deployable_path, exist_ok=True)
+    old_manifest = load_manifest(deployable_path)
+    new_manifest = {}
+    files_copied = files_reused = files_removed = 0
+    bytes_copied = bytes_reused = 0
+
+    for rel_path in _walk_files(src_path):
+        if exclude is not None and exclude(rel_path):
+            continue
+        src_file = os.path.join(src_path, rel_path)
+        dst_file = os.path.join(deployable_path, rel_path)
+        src_stat = os.stat(src_file)
+        entry = old_manifest.get(rel_path)
+
+        if _is_unchanged(src_stat, dst_file, entry):
+            sha256 = entry["sha256"] if entry is not None else None
+            reused = True
+        else:
+            sha256 = file_sha256(src_file)
+            reused = (
+                entry is not None
+                and entry["sha256"] == sha256
+                and os.path.exists(dst_file)
+            )
+
+        if reused:
+            files_reused += 1
+            bytes_reused += src_stat.st_size
+        elif _place_file(src_file, dst_file, rel_path):
+            files_reused += 1
+            bytes_reused += src_stat.st_size
+        else:
+            files_copied += 1
+            bytes_copied += src_stat.st_size
+
+        new_manifest[rel_path] = {
+            "size": src_stat.st_size,
+            "mtime_ns": src_stat.st_mtime_ns,
+            "sha256": sha256 if sha256 is not None else file_sha256(src_file),
+        }
+
+    for rel_path in old_manifest.keys() - new_manifest.keys():
+        stale_file = os.path.join(deployable_path, rel_path)
+        if os.path.lexists(stale_file):
+            os.remove(stale_file)
+            files_removed += 1
+            _remove_empty_parents(deployable_path, rel_path)
+
+    with open(os.path.join(deployable_path, MANIFEST_FILE_NAME), "w") as f:
+        json.dump(new_manifest, f)
+
+    return SyncReport(
+        files_copied=files_copied,
+        files_reused=files_reused,
+        files_removed=files_removed,
+        bytes_copied=bytes_copied,
+        bytes_reused=bytes_reused,
+    )
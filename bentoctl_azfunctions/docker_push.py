@@ -0,0 +1,181 @@
+import time
+
+DEFAULT_MAX_ATTEMPTS = 4
+# seconds to wait before the first retry, doubled for every following one
+DEFAULT_BACKOFF = 2.0
+# registry errors retrying won't fix
+PERMANENT_ERROR_MARKERS = (
+    "unauthorized",
+    "denied",
+    "authentication required",
+    "no basic auth credentials",
+    "manifest invalid",
+    "name invalid",
+    "name unknown",
+)
+# push errors worth retrying: dropped connections, timeouts and 5xx answers
+TRANSIENT_ERROR_MARKERS = (
+    "connection reset",
+    "connection refused",
+    "broken pipe",
+    "unexpected eof",
+    "timeout",
+    "timed out",
+    "500 internal server error",
+    "502 bad gateway",
+    "503 service unavailable",
+    "504 gateway timeout",
+    "unavailable",
+)
+
+
+class PushError(Exception):
+    pass
+
+
+class LayerProgress:
+    def __init__(self, layer_id):
+        self.layer_id = layer_id
+        self.status = None
+        self.bytes_pushed = 0
+        self.total_bytes = None
+        self.started_at = None
+        self.finished_at = None
+        self.skipped = False
+        self.attempts = 0
+
+    @property
+    def seconds(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def throughput(self):
+        """Bytes per second while the layer was uploading."""
+        if not self.seconds:
+            return None
+        return self.bytes_pushed / self.seconds
+
+
+class PushProgress:
+    """
+    Follows the progress messages of `docker push` (as returned by the
+    docker API with `decode=True`) for every layer of the image.
+    """
+
+    def __init__(self):
+        self.layers = {}
+        self.digest = None
+
+    def _layer(self, layer_id):
+        if layer_id not in self.layers:
+            self.layers[layer_id] = LayerProgress(layer_id)
+        return self.layers[layer_id]
+
+    def update(self, message, now=None):
+        now = time.perf_counter() if now is None else now
+        if "error" in message:
+            raise PushError(message["error"])
+        status = message.get("status", "")
+        if "digest:" in status:
+            # e.g. "v1: digest: sha256:... size: 1234"
+            self.digest = status.split("digest:")[1].split()[0]
+            return
+        if "id" not in message:
+            return
+
+        layer = self._layer(message["id"])
+        layer.status = status
+        if status == "Layer already exists":
+            # a layer pushed by an earlier attempt is reported as existing
+            # when the push is retried, it still counts as pushed
+            if layer.finished_at is None:
+                layer.skipped = True
+        elif status == "Pushing":
+            if layer.started_at is None:
+                layer.started_at = now
+                layer.attempts += 1
+            progress = message.get("progressDetail") or {}
+            layer.bytes_pushed = progress.get("current", layer.bytes_pushed)
+            layer.total_bytes = progress.get("total", layer.total_bytes)
+        elif status == "Pushed":
+            layer.finished_at = now
+            if layer.total_bytes:
+                layer.bytes_pushed = layer.total_bytes
+
+    def restart(self):
+        """Forget the progress of layers that were not finished by a failed push."""
+        for layer in self.layers.values():
+            if layer.finished_at is None and not layer.skipped:
+                layer.started_at = None
+                layer.bytes_pushed = 0
+
+    @property
+    def skipped_layers(self):
+        return [layer for layer in self.layers.values() if layer.skipped]
+
+    @property
+    def pushed_layers(self):
+        return [layer for layer in self.layers.values() if layer.finished_at]
+
+
+def is_transient(error):
+    """
+    Whether a failed push is worth retrying: the connection was reset or
+    timed out, or the daemon or registry answered with a 5xx. Credential and
+    manifest errors are not.
+    """
+    message = str(error).lower()
+    if any(marker in message for marker in PERMANENT_ERROR_MARKERS):
+        return False
+    # docker.errors.APIError carries the HTTP status of the daemon's answer
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code >= 500
+    if isinstance(error, PushError):
+        return any(marker in message for marker in TRANSIENT_ERROR_MARKERS)
+    # the connection errors of the client itself
+    return True
+
+
+def push_image(
+    docker_api_client,
+    repository,
+    tag=None,
+    auth_config=None,
+    max_attempts=DEFAULT_MAX_ATTEMPTS,
+    backoff=DEFAULT_BACKOFF,
+    on_message=None,
+    retry_errors=(PushError,),
+    sleep=time.sleep,
+):
+    """
+    Push an image while streaming its progress. A failed push is retried
+    with exponential backoff; the registry reports the layers that made it on
+    an earlier attempt as already existing, so only the failed layers are
+    uploaded again. `retry_errors` are the exceptions a push is retried on,
+    when `is_transient` tells they are, the others are raised at once.
+
+    Returns the PushProgress of the push.
+    """
+    progress = PushProgress()
+    for attempt in range(1, max_attempts + 1):
+        try:
+            for message in docker_api_client.push(
+                repository,
+                tag=tag,
+                auth_config=auth_config,
+                stream=True,
+                decode=True,
+            ):
+                progress.update(message)
+                if on_message is not None:
+                    on_message(message, progress)
+            return progress
+        except retry_errors as error:
+            if attempt == max_attempts or not is_transient(error):
+                raise
+            progress.restart()
+            sleep(backoff * 2 ** (attempt - 1))
+    return progress
@@ -0,0 +1,113 @@
+"""
+Opt-in profiling of the build and deploy stages.
+
+Set `BENTOCTL_PROFILE` to a file path and every stage wrapped in `stage()`
+records its wall time, the CPU time and the bytes read and written by this
+process. The stages are written to that path as a Chrome trace (open it in
+chrome://tracing or https://ui.perfetto.dev), nested stages show up inside
+their parent. Work done by the Docker daemon (the build, the push) only
+shows in the wall time, the stages record the bytes they send to it.
+"""
+import json
+import os
+import threading
+import time
+
+PROFILE_ENV_VAR = "BENTOCTL_PROFILE"
+PROC_IO_PATH = "/proc/self/io"
+
+
+def _io_counters():
+    """Bytes read and written by this process so far (Linux only)."""
+    try:
+        with open(PROC_IO_PATH, "r") as f:
+            counters = dict(line.split(":") for line in f if ":" in line)
+    except OSError:
+        return None
+    # rchar/wchar count every read and write, cached or not
+    return int(counters["rchar"]), int(counters["wchar"])
+
+
+class _Stage:
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = dict(args)
+
+    def __enter__(self):
+        self._io_started = _io_counters()
+        self._cpu_started = time.process_time()
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        wall_seconds = time.perf_counter() - self._started_at
+        self.args["cpu_seconds"] = time.process_time() - self._cpu_started
+        io_finished = _io_counters()
+        if self._io_started is not None and io_finished is not None:
+            self.args["bytes_read"] = io_finished[0] - self._io_started[0]
+            self.args["bytes_written"] = io_finished[1] - self._io_started[1]
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.profiler.add_event(self.name, self._started_at, wall_seconds, self.args)
+
+
+class _NoopStage:
+    def __init__(self):
+        self.args = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class Profiler:
+    """Collects the stages and writes them as Chrome trace events."""
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @property
+    def enabled(self):
+        return self.trace_path is not None
+
+    def stage(self, name, **args):
+        """
+        Context manager timing the stage `name`. Extra `args` (and anything
+        set on the `args` dict of the returned stage) are kept in the trace.
+        """
+        if not self.enabled:
+            return _NoopStage()
+        return _Stage(self, name, args)
+
+    def add_event(self, name, started_at, wall_seconds, args):
+        event = {
+            "name": name,
+            "cat": "bentoctl",
+            "ph": "X",
+            "ts": (started_at - self._origin) * 1e6,
+            "dur": wall_seconds * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+            # rewritten after every stage so a failed build still leaves a trace
+            self.write_trace()
+
+    def write_trace(self):
+        with open(self.trace_path, "w") as f:
+            json.dump({"traceEvents": self.events}, f, indent=1)
+
+
+profiler = Profiler(os.environ.get(PROFILE_ENV_VAR) or None)
+
+
+def stage(name, **args):
+    return profiler.stage(name, **args)
@@ -1,34 +1,33 @@
-import json
-import subprocess
-
 from bentoctl.exceptions import BentoctlException
 
+from . import profiling
+from .azure_rest import get_rest_client
+from .command_executor import DEFAULT_CACHE_TTL, executor
+
 DOCKER_USERNAME = "00000000-0000-0000-0000-000000000000"
 ACR_DOMAIN = "{acr_name}.azurecr.io/{repository_name}"
 
 
-def run_shell_command(command, cwd=None, env=None, shell_mode=False):
-    proc = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=shell_mode,
-        cwd=cwd,
-        env=env,
+def run_shell_command(command, cwd=None, env=None, shell_mode=False, cache_ttl=None):
+    return executor.run(
+        command, cwd=cwd, env=env, shell_mode=shell_mode, cache_ttl=cache_ttl
     )
-    stdout, stderr = proc.communicate()
-    if proc.returncode == 0:
-        try:
-            return json.loads(stdout.decode("utf-8")), stderr.decode("utf-8")
-        except json.JSONDecodeError:
-            return stdout.decode("utf-8"), stderr.decode("utf-8")
+
+
+def check_admin_user_ennabled(acr_name: str, resource_group: str):
+    rest_client = get_rest_client()
+    if rest_client is not None:
+        out = rest_client.is_admin_user_enabled(acr_name, resource_group)
     else:
-        raise Exception(
-            f'Failed to run command {" ".join(command)}: {stderr.decode("utf-8")}'
+        out = _check_admin_user_ennabled_with_cli(acr_name, resource_group)
+
+    if out is False:
+        raise BentoctlException(
+            f"Azure Container Registry {acr_name} doesnot have Admin Account ennabled. Run `az acr update -n {acr_name} --admin-enabled true` to ennable it. For more information check: https://docs.microsoft.com/en-us/azure/container-registry/container-registry-authentication?tabs=azure-cli#admin-account"
         )
 
 
-def check_admin_user_ennabled(acr_name: str, resource_group: str):
+def _check_admin_user_ennabled_with_cli(acr_name: str, resource_group: str):
     out, _ = run_shell_command(
         [
             "az",
@@ -40,16 +39,17 @@ def check_admin_user_ennabled(acr_name: str, resource_group: str):
             resource_group,
             "--query",
             "adminUserEnabled",
-        ]
+        ],
+        cache_ttl=DEFAULT_CACHE_TTL,
     )
-
-    if out is False:
-        raise BentoctlException(
-            f"Azure Container Registry {acr_name} doesnot have Admin Account ennabled. Run `az acr update -n {acr_name} --admin-enabled true` to ennable it. For more information check: https://docs.microsoft.com/en-us/azure/container-registry/container-registry-authentication?tabs=azure-cli#admin-account"
-        )
+    return out
 
 
 def get_access_token(acr_name: str):
+    rest_client = get_rest_client()
+    if rest_client is not None:
+        return rest_client.get_acr_refresh_token(acr_name)
+
     access_token, _ = run_shell_command(
         [
             "az",
@@ -71,15 +71,20 @@ def create_repository(deployment_name, operator_spec):
     """
     Create a repository in Azure Container Registry and return the information
     """
-    check_admin_user_ennabled(
-        acr_name=operator_spec["acr_name"],
-        resource_group=operator_spec["resource_group"],
-    )
+    with profiling.stage("create_repository", repository=deployment_name):
+        # the admin check and the token request are independent, run them together
+        admin_check = executor.submit(
+            check_admin_user_ennabled,
+            acr_name=operator_spec["acr_name"],
+            resource_group=operator_spec["resource_group"],
+        )
+        access_token = executor.submit(get_access_token, operator_spec["acr_name"])
 
-    repository_url = ACR_DOMAIN.format(
-        acr_name=operator_spec["acr_name"], repository_name=deployment_name
-    )
-    password = get_access_token(operator_spec["acr_name"])
+        repository_url = ACR_DOMAIN.format(
+            acr_name=operator_spec["acr_name"], repository_name=deployment_name
+        )
+        admin_check.result()
+        password = access_token.result()
     return repository_url, DOCKER_USERNAME, password
 
 
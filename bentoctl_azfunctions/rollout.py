@@ -0,0 +1,248 @@
+"""
+Roll one bento out to many deployments (regions, environments...) at once.
+
+The deployable and the image only depend on the bento and the build options,
+not on the deployment specs, so they are created and built once and shared
+by every deployment. Per deployment only the repository, the push and the
+terraform values differ, and those run concurrently.
+
+A deployments file is a YAML or JSON list of deployment configs, with the
+`name` and `spec` of each deployment like in `deployment_config.yaml`:
+
+    - name: iris-westeurope
+      spec:
+        resource_group: iris-westeurope
+        acr_name: irisweu
+    - name: iris-eastus
+      spec:
+        resource_group: iris-eastus
+        acr_name: iriseus
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 8
+LOCAL_IMAGE_REPOSITORY = "bentoctl-azfunctions-rollout"
+
+
+class StageTimer:
+    """Wall-clock time of every stage of a rollout, in seconds."""
+
+    def __init__(self):
+        self.timings = {}
+        self._started_at = time.perf_counter()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def total(self):
+        return time.perf_counter() - self._started_at
+
+
+class _Stage:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.timings[self.name] = time.perf_counter() - self._started_at
+
+
+def normalize_spec(name, spec):
+    """
+    Validate a deployment spec against OPERATOR_SCHEMA and fill in the
+    defaults, like bentoctl does with the spec of `deployment_config.yaml`.
+    """
+    from cerberus import Validator
+
+    from .schema import OPERATOR_SCHEMA
+
+    # `help_message` is for bentoctl's prompts, not a cerberus rule
+    schema = {
+        field: {
+            rule: value for rule, value in rules.items() if rule != "help_message"
+        }
+        for field, rules in OPERATOR_SCHEMA.items()
+    }
+    validator = Validator(schema)
+    if not validator.validate(spec or {}):
+        raise ValueError(f"Invalid spec for deployment {name}: {validator.errors}")
+    return validator.document
+
+
+def load_deployments(deployments_file):
+    import yaml
+
+    with open(deployments_file, "r") as f:
+        deployments = yaml.safe_load(f)
+    if isinstance(deployments, dict):
+        deployments = deployments.get("deployments", [])
+    names = [deployment["name"] for deployment in deployments]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Deployment names must be unique: {sorted(duplicates)}")
+    for deployment in deployments:
+        deployment["spec"] = normalize_spec(deployment["name"], deployment.get("spec"))
+    return deployments
+
+
+def _map_concurrently(fn, items, max_workers):
+    """Run `fn` on every item on a thread pool, results in the items' order."""
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="bentoctl-rollout"
+    ) as pool:
+        return list(pool.map(fn, items))
+
+
+def generate_all(
+    deployments,
+    destination_dir,
+    template_type="terraform",
+    values_only=True,
+    max_workers=DEFAULT_MAX_WORKERS,
+    timer=None,
+):
+    """
+    Generate the template files of every deployment into
+    `<destination_dir>/<name>`, concurrently. Returns the generated files by
+    deployment name.
+    """
+    from .generate import generate
+
+    timer = timer or StageTimer()
+
+    def generate_one(deployment):
+        deployment_dir = os.path.join(destination_dir, deployment["name"])
+        os.makedirs(deployment_dir, exist_ok=True)
+        with timer.stage(f"generate:{deployment['name']}"):
+            return generate(
+                deployment["name"],
+                dict(deployment["spec"]),
+                template_type,
+                deployment_dir,
+                values_only=values_only,
+            )
+
+    with timer.stage("generate"):
+        generated_files = _map_concurrently(generate_one, deployments, max_workers)
+    return {
+        deployment["name"]: files
+        for deployment, files in zip(deployments, generated_files)
+    }
+
+
+def check_runtime_versions(deployments, streaming):
+    """
+    A deployable created with `streaming` only runs on the v4 Functions
+    runtime, which the template selects with `enable_streaming`, and the
+    other deployables only on v3.
+    """
+    for deployment in deployments:
+        enable_streaming = deployment["spec"].get("enable_streaming", False)
+        if enable_streaming != streaming:
+            raise ValueError(
+                f"Deployment {deployment['name']} has enable_streaming="
+                f"{enable_streaming}, but the deployable is created with "
+                f"streaming={streaming}"
+            )
+
+
+def build_all(
+    bento_path,
+    destination_dir,
+    deployments,
+    build_options=None,
+    push=True,
+    template_type="terraform",
+    values_only=True,
+    max_workers=DEFAULT_MAX_WORKERS,
+):
+    """
+    Create one deployable from the bento, build its image once, push it to
+    the repository of every deployment and generate their template files.
+    `build_options` are passed to `create_deployable`. Returns a report with
+    the image of every deployment and the time spent in each stage.
+    """
+    from .create_deployable import create_deployable
+    from .registry_utils import create_repository
+    from .utils import (
+        build_docker_image,
+        get_metadata,
+        push_docker_image_to_repository,
+        tag_docker_image,
+    )
+
+    build_options = dict(build_options or {})
+    check_runtime_versions(deployments, build_options.get("streaming", False))
+    # host.json is sized for the SKU the deployments share, the app settings
+    # of every deployment override it with the limits of its own SKU
+    skus = {deployment["spec"].get("premium_plan_sku") for deployment in deployments}
+    if len(skus) == 1 and None not in skus:
+        build_options.setdefault("premium_plan_sku", skus.pop())
+
+    timer = StageTimer()
+    with timer.stage("metadata"):
+        bento_metadata = get_metadata(bento_path)
+    image_version = bento_metadata["tag"].version
+    local_image_tag = f"{LOCAL_IMAGE_REPOSITORY}:{image_version}"
+
+    with timer.stage("deployable"):
+        dockerfile_path, docker_context_path, build_args = create_deployable(
+            bento_path, destination_dir, bento_metadata, **build_options
+        )
+    with timer.stage("build"):
+        build_docker_image(
+            docker_context_path,
+            local_image_tag,
+            dockerfile=os.path.relpath(dockerfile_path, docker_context_path),
+            additional_build_args=build_args,
+            use_context_cache=True,
+        )
+
+    def push_one(deployment):
+        name = deployment["name"]
+        with timer.stage(f"push:{name}"):
+            repository, username, password = create_repository(
+                name, deployment["spec"]
+            )
+            tag_docker_image(local_image_tag, repository, image_version)
+            if push:
+                push_docker_image_to_repository(
+                    repository,
+                    image_tag=image_version,
+                    username=username,
+                    password=password,
+                )
+        return f"{repository}:{image_version}"
+
+    with timer.stage("push"):
+        image_tags = _map_concurrently(push_one, deployments, max_workers)
+    for deployment, image_tag in zip(deployments, image_tags):
+        deployment["spec"]["image_tag"] = image_tag
+
+    generated_files = generate_all(
+        deployments,
+        destination_dir,
+        template_type=template_type,
+        values_only=values_only,
+        max_workers=max_workers,
+        timer=timer,
+    )
+    return {
+        "bento": str(bento_metadata["tag"]),
+        "deployments": [
+            {
+                "name": deployment["name"],
+                "image_tag": deployment["spec"]["image_tag"],
+                "files": generated_files[deployment["name"]],
+            }
+            for deployment in deployments
+        ],
+        "timings": timer.timings,
+        "total_seconds": timer.total(),
+    }
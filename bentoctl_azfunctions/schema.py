@@ -29,4 +29,114 @@ OPERATOR_SCHEMA = {
         "help_message": "The SKU of the app service plan. Allowed values: P1v2, P2v2, P3v2",
         "allowed": ["P1v2", "P2v2", "P3v2"],
     },
+    "batching_routes": {
+        "type": "string",
+        "default": "",
+        "help_message": "Comma separated API routes whose concurrent requests are micro-batched. The APIs have to take and return JSON lists.",
+    },
+    "batch_max_latency_ms": {
+        "type": "integer",
+        "default": 10,
+        "coerce": int,
+        "help_message": "The longest time (in milliseconds) a request waits for its batch to fill up.",
+    },
+    "batch_max_size": {
+        "type": "integer",
+        "default": 32,
+        "coerce": int,
+        "help_message": "The maximum number of records sent to the API in one batch.",
+    },
+    "worker_process_count": {
+        "type": "integer",
+        "nullable": True,
+        "default": None,
+        "coerce": int,
+        "help_message": "The number of Python worker processes per instance (FUNCTIONS_WORKER_PROCESS_COUNT). Defaults to the number of cores of the premium_plan_sku.",
+    },
+    "threadpool_thread_count": {
+        "type": "integer",
+        "nullable": True,
+        "default": None,
+        "coerce": int,
+        "help_message": "The number of threads of each Python worker (PYTHON_THREADPOOL_THREAD_COUNT).",
+    },
+    "max_concurrent_requests": {
+        "type": "integer",
+        "nullable": True,
+        "default": None,
+        "coerce": int,
+        "help_message": "The maximum number of HTTP requests an instance runs in parallel. Defaults to 50 per core of the premium_plan_sku.",
+    },
+    "max_outstanding_requests": {
+        "type": "integer",
+        "nullable": True,
+        "default": None,
+        "coerce": int,
+        "help_message": "The maximum number of HTTP requests an instance holds (running and queued). Defaults to 4 times max_concurrent_requests.",
+    },
+    "dynamic_throttles_enabled": {
+        "type": "boolean",
+        "default": True,
+        "help_message": "Reject new HTTP requests with 429 when the instance's CPU, memory or threads are exhausted.",
+    },
+    "enable_metrics": {
+        "type": "boolean",
+        "default": False,
+        "help_message": "Record per API latency histograms (queue, model and serialization time) and serve them in the Prometheus format on /metrics.",
+    },
+    "mmap_models": {
+        "type": "boolean",
+        "default": False,
+        "help_message": "Load numpy, joblib and torch model files memory-mapped so worker processes share one copy of the weights. Loaded arrays are read-only.",
+    },
+    "api_concurrency_limits": {
+        "type": "string",
+        "default": "",
+        "regex": r"^([\w./-]+=[1-9]\d*(,[\w./-]+=[1-9]\d*)*)?$",
+        "help_message": "Comma separated route=limit pairs, the most requests of an API a worker process runs at once, e.g. classify=2. Requests over the limit wait without holding up other APIs.",
+    },
+    "response_cache": {
+        "type": "string",
+        "default": "off",
+        "allowed": ["off", "local", "redis", "blob"],
+        "help_message": "Cache the responses of identical requests: off, local (in-process LRU of each worker), redis or blob (in-process LRU backed by a tier shared by every instance).",
+    },
+    "response_cache_routes": {
+        "type": "string",
+        "default": "",
+        "help_message": "Comma separated API routes whose responses are cached. Empty for every route.",
+    },
+    "response_cache_size": {
+        "type": "integer",
+        "default": 1024,
+        "coerce": int,
+        "help_message": "The maximum number of responses kept in the in-process cache of each worker.",
+    },
+    "response_cache_ttl": {
+        "type": "integer",
+        "default": 300,
+        "coerce": int,
+        "help_message": "The longest time (in seconds) a response is cached for.",
+    },
+    "response_cache_url": {
+        "type": "string",
+        "default": "",
+        "help_message": "Redis URL, or Azure Storage connection string, of the shared cache tier. The blob tier defaults to the function app's storage account.",
+    },
+    "enable_batch_jobs": {
+        "type": "boolean",
+        "default": False,
+        "help_message": "Create the storage queue and containers used by the queue-triggered batch jobs.",
+    },
+    "batch_job_size": {
+        "type": "integer",
+        "default": 256,
+        "coerce": int,
+        "help_message": "The number of records sent to the API in one batch by batch jobs.",
+    },
+    "enable_streaming": {
+        "type": "boolean",
+        "default": False,
+        "help_message": "Run the function app on the v4 Functions runtime, which deployables created with streaming need.",
+    },
 }
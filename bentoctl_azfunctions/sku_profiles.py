@@ -0,0 +1,31 @@
+# Resources of the premium plan SKUs allowed in OPERATOR_SCHEMA
+# https://azure.microsoft.com/en-us/pricing/details/app-service/linux/
+SKU_PROFILES = {
+    "P1v2": {"cores": 1, "memory_gb": 3.5},
+    "P2v2": {"cores": 2, "memory_gb": 7},
+    "P3v2": {"cores": 4, "memory_gb": 14},
+}
+DEFAULT_SKU = "P1v2"
+
+# concurrent HTTP requests allowed per core before the host queues them
+CONCURRENT_REQUESTS_PER_CORE = 50
+# requests the host keeps queued per allowed concurrent request
+OUTSTANDING_REQUESTS_FACTOR = 4
+THREADPOOL_THREAD_COUNT = 4
+
+
+def get_worker_settings(premium_plan_sku=DEFAULT_SKU):
+    """
+    Worker and host concurrency settings sized for the cores of the given
+    SKU. One Python worker process is run per core.
+    """
+    cores = SKU_PROFILES[premium_plan_sku]["cores"]
+    max_concurrent_requests = CONCURRENT_REQUESTS_PER_CORE * cores
+    return {
+        "worker_process_count": cores,
+        "threadpool_thread_count": THREADPOOL_THREAD_COUNT,
+        "max_concurrent_requests": max_concurrent_requests,
+        "max_outstanding_requests": OUTSTANDING_REQUESTS_FACTOR
+        * max_concurrent_requests,
+        "dynamic_throttles_enabled": True,
+    }
@@ -0,0 +1,96 @@
+import fnmatch
+import os
+
+IGNORE_FILE_NAME = ".bentoctlignore"
+# never needed at runtime, stripped from every deployable
+DEFAULT_EXCLUDES = [
+    "__pycache__/",
+    "*.pyc",
+    "*.pyo",
+    ".pytest_cache/",
+    ".mypy_cache/",
+    ".ipynb_checkpoints/",
+    ".git/",
+    ".DS_Store",
+]
+
+# approximate uncompressed sizes of the base images, used for the estimate
+BASE_IMAGE_SIZES = {
+    "mcr.microsoft.com/azure-functions/python:3.0-python3.8": 1000 * 1024 ** 2,
+    "mcr.microsoft.com/azure-functions/python:3.0-python3.8-slim": 600 * 1024 ** 2,
+    "mcr.microsoft.com/azure-functions/python:4-python3.8": 1300 * 1024 ** 2,
+    "mcr.microsoft.com/azure-functions/python:4-python3.8-slim": 700 * 1024 ** 2,
+}
+
+
+def read_ignore_file(bento_path):
+    """
+    Patterns from the bento's .bentoctlignore, one per line. Blank lines and
+    lines starting with `#` are skipped.
+    """
+    ignore_file = os.path.join(bento_path, IGNORE_FILE_NAME)
+    if not os.path.exists(ignore_file):
+        return []
+    with open(ignore_file, "r") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def make_exclude_filter(patterns):
+    """
+    Return a function telling whether a path relative to the bento root is
+    excluded. A pattern starting with or containing a `/` is matched against
+    the whole path (from the root), other patterns against every path
+    component. A trailing `/` restricts a pattern to directories.
+    """
+    patterns = list(DEFAULT_EXCLUDES) + list(patterns)
+
+    def is_excluded(rel_path):
+        parts = rel_path.replace(os.sep, "/").split("/")
+        for pattern in patterns:
+            dir_only = pattern.endswith("/")
+            anchored = "/" in pattern.rstrip("/")
+            pattern = pattern.strip("/")
+            if anchored:
+                # anchored: the path or one of its parent directories matches
+                candidates = ["/".join(parts[: i + 1]) for i in range(len(parts))]
+                if dir_only:
+                    candidates = candidates[:-1]
+                if any(fnmatch.fnmatch(c, pattern) for c in candidates):
+                    return True
+            else:
+                components = parts[:-1] if dir_only else parts
+                if any(fnmatch.fnmatch(c, pattern) for c in components):
+                    return True
+        return False
+
+    return is_excluded
+
+
+def directory_sizes(deployable_path, depth=1):
+    """
+    Total size in bytes of every entry of the deployable, down to `depth`
+    levels (`models/<name>` with depth=2).
+    """
+    sizes = {}
+    for dirpath, _, filenames in os.walk(deployable_path):
+        rel_dir = os.path.relpath(dirpath, deployable_path)
+        rel_parts = [] if rel_dir == "." else rel_dir.split(os.sep)
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if os.path.islink(path):
+                continue
+            size = os.path.getsize(path)
+            parts = rel_parts + [filename]
+            for level in range(1, min(depth, len(parts)) + 1):
+                key = "/".join(parts[:level])
+                sizes[key] = sizes.get(key, 0) + size
+    return sizes
+
+
+def estimate_image_size(base_image, deployable_size):
+    """
+    Rough image size: the base image plus the files copied from the
+    deployable. Packages installed from the bento's env are not included.
+    """
+    return BASE_IMAGE_SIZES.get(base_image, 0) + deployable_size
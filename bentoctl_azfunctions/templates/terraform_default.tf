@@ -54,6 +54,97 @@ variable "premium_plan_sku" {
     type = string
 }
 
+variable "worker_process_count" {
+    type = number
+}
+
+variable "threadpool_thread_count" {
+    type = number
+}
+
+variable "max_concurrent_requests" {
+    type = number
+}
+
+variable "max_outstanding_requests" {
+    type = number
+}
+
+variable "dynamic_throttles_enabled" {
+    type = bool
+}
+
+variable "enable_metrics" {
+    type = bool
+    default = false
+}
+
+variable "mmap_models" {
+    type = bool
+    default = false
+}
+
+variable "api_concurrency_limits" {
+    type = string
+    default = ""
+}
+
+variable "response_cache" {
+    type = string
+    default = "off"
+}
+
+variable "response_cache_routes" {
+    type = string
+    default = ""
+}
+
+variable "response_cache_size" {
+    type = number
+    default = 1024
+}
+
+variable "response_cache_ttl" {
+    type = number
+    default = 300
+}
+
+variable "enable_batch_jobs" {
+    type = bool
+    default = false
+}
+
+variable "batch_job_size" {
+    type = number
+    default = 256
+}
+
+variable "enable_streaming" {
+    type = bool
+    default = false
+}
+
+variable "response_cache_url" {
+    type = string
+    default = ""
+    sensitive = true
+}
+
+variable "batching_routes" {
+    type = string
+    default = ""
+}
+
+variable "batch_max_latency_ms" {
+    type = number
+    default = 10
+}
+
+variable "batch_max_size" {
+    type = number
+    default = 32
+}
+
 
 ################################################################################
 # Resource definitions
@@ -80,6 +171,27 @@ resource "azurerm_storage_account" "storage" {
   account_replication_type = "LRS"
 }
 
+# queue and containers of the batch jobs, see batch_jobs.py
+resource "azurerm_storage_queue" "batch_jobs" {
+  count                = var.enable_batch_jobs ? 1 : 0
+  name                 = "bentoctl-batch-jobs"
+  storage_account_name = azurerm_storage_account.storage.name
+}
+
+resource "azurerm_storage_container" "batch_input" {
+  count                 = var.enable_batch_jobs ? 1 : 0
+  name                  = "batch-input"
+  storage_account_name  = azurerm_storage_account.storage.name
+  container_access_type = "private"
+}
+
+resource "azurerm_storage_container" "batch_output" {
+  count                 = var.enable_batch_jobs ? 1 : 0
+  name                  = "batch-output"
+  storage_account_name  = azurerm_storage_account.storage.name
+  container_access_type = "private"
+}
+
 resource "azurerm_application_insights" "application_insights" {
   name                = "${var.deployment_name}-application-insights"
   location            = data.azurerm_resource_group.rg.location
@@ -103,6 +215,12 @@ resource "azurerm_app_service_plan" "plan" {
 
 
 
+# deployables created with streaming are built on the v4 runtime image and
+# declare their function with the Python v2 programming model
+locals {
+  functions_extension_version = var.enable_streaming ? "~4" : "~3"
+}
+
 resource "azurerm_function_app" "funcApp" {
   name                       = "${var.deployment_name}-${lower(random_id.storage_account.hex)}"
   location                   = data.azurerm_resource_group.rg.location
@@ -110,18 +228,37 @@ resource "azurerm_function_app" "funcApp" {
   app_service_plan_id        = azurerm_app_service_plan.plan.id
   storage_account_name       = azurerm_storage_account.storage.name
   storage_account_access_key = azurerm_storage_account.storage.primary_access_key
-  version                    = "~3"
+  version                    = local.functions_extension_version
   os_type = "linux"
 
   app_settings = {
     FUNCTION_APP_EDIT_MODE              = "readOnly"
     https_only                          = true
-    FUNCTIONS_EXTENSION_VERSION         = "~3"
+    FUNCTIONS_EXTENSION_VERSION         = local.functions_extension_version
     DOCKER_REGISTRY_SERVER_URL          = "${data.azurerm_container_registry.registry.login_server}"
     DOCKER_REGISTRY_SERVER_USERNAME     = "${data.azurerm_container_registry.registry.admin_username}"
     DOCKER_REGISTRY_SERVER_PASSWORD     = "${data.azurerm_container_registry.registry.admin_password}"
     WEBSITES_ENABLE_APP_SERVICE_STORAGE = false
     APPINSIGHTS_INSTRUMENTATIONKEY      = azurerm_application_insights.application_insights.instrumentation_key
+    FUNCTIONS_WORKER_PROCESS_COUNT      = var.worker_process_count
+    PYTHON_THREADPOOL_THREAD_COUNT      = var.threadpool_thread_count
+    # override the http settings of host.json
+    AzureFunctionsJobHost__extensions__http__maxConcurrentRequests  = var.max_concurrent_requests
+    AzureFunctionsJobHost__extensions__http__maxOutstandingRequests = var.max_outstanding_requests
+    AzureFunctionsJobHost__extensions__http__dynamicThrottlesEnabled = var.dynamic_throttles_enabled
+    BENTOCTL_BATCHING_ROUTES            = var.batching_routes
+    BENTOCTL_BATCH_MAX_LATENCY_MS       = var.batch_max_latency_ms
+    BENTOCTL_BATCH_MAX_SIZE             = var.batch_max_size
+    BENTOCTL_ENABLE_METRICS             = var.enable_metrics
+    BENTOCTL_MMAP_MODELS                = var.mmap_models
+    BENTOCTL_API_CONCURRENCY_LIMITS     = var.api_concurrency_limits
+    BENTOCTL_RESPONSE_CACHE             = var.response_cache
+    BENTOCTL_RESPONSE_CACHE_ROUTES      = var.response_cache_routes
+    BENTOCTL_RESPONSE_CACHE_SIZE        = var.response_cache_size
+    BENTOCTL_RESPONSE_CACHE_TTL         = var.response_cache_ttl
+    BENTOCTL_RESPONSE_CACHE_URL         = var.response_cache_url
+    BENTOCTL_BATCH_JOB_QUEUE            = "bentoctl-batch-jobs"
+    BENTOCTL_BATCH_JOB_SIZE             = var.batch_job_size
   }
 
   site_config {
@@ -145,3 +282,8 @@ output image {
     description = "The image deployed."
     value = var.image_tag
 }
+
+output batch_jobs_storage_account {
+    description = "Storage account holding the batch job queue and containers."
+    value = var.enable_batch_jobs ? azurerm_storage_account.storage.name : null
+}
@@ -1,42 +1,40 @@
-import sys
-import subprocess
 import json
-import docker
 import os
 import shutil
+from collections import namedtuple
 
-import fs
-from bentoml.bentos import Bento
-from rich.console import Console
+from .. import profiling
+from ..build_context import BuildContext, context_size, read_dockerignore_entries
+from ..command_executor import DEFAULT_CACHE_TTL, executor
+from ..deployable_sync import format_bytes
+from ..docker_push import PushError, push_image
 
+# docker, rich and bentoml are slow to import and most commands (e.g.
+# `bentoctl generate`) don't need them, they are imported where used.
+_console = None
 
-# init rich console
-console = Console(highlight=False)
 
+def get_console():
+    global _console
 
-def run_shell_command(command, cwd=None, env=None, shell_mode=False):
-    proc = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=shell_mode,
+    if _console is None:
+        from rich.console import Console
+
+        _console = Console(highlight=False)
+    return _console
+
+
+def __getattr__(name):
+    # `utils.console` is still available, created on first access
+    if name == "console":
+        return get_console()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def run_shell_command(command, cwd=None, env=None, shell_mode=False, cache_ttl=None):
+    return executor.run(
+        command, cwd=cwd, env=env, shell_mode=shell_mode, cache_ttl=cache_ttl
     )
-    stdout, stderr = proc.communicate()
-    default_encoding = sys.getfilesystemencoding()
-    if proc.returncode == 0:
-        result = stdout.decode(default_encoding)
-        if result.endswith("\x1b[0m"):
-            # remove console color code: \x1b[0m
-            # https://github.com/Azure/azure-cli/issues/9903
-            result = result.replace("\x1b[0m", "")
-        try:
-            return json.loads(result), stderr.decode(default_encoding)
-        except json.JSONDecodeError:
-            return result, stderr.decode(default_encoding)
-    else:
-        raise Exception(
-            f'Failed to run command {" ".join(command)}: {stderr.decode(default_encoding)}'
-        )
 
 
 def set_cors_settings(function_name, resource_group_name):
@@ -52,10 +50,15 @@ def set_cors_settings(function_name, resource_group_name):
             "--resource-group",
             resource_group_name,
         ],
+        cache_ttl=DEFAULT_CACHE_TTL,
     )
 
     if cors_list_result != "":
-        for origin_url in cors_list_result["allowedOrigins"]:
+        origin_urls = cors_list_result["allowedOrigins"]
+        if origin_urls == ["*"]:
+            return
+        if origin_urls:
+            # `--allowed-origins` takes a list, remove them all in one call
             run_shell_command(
                 command=[
                     "az",
@@ -67,7 +70,7 @@ def set_cors_settings(function_name, resource_group_name):
                     "--resource-group",
                     resource_group_name,
                     "--allowed-origins",
-                    origin_url,
+                    *origin_urls,
                 ],
             )
 
@@ -94,31 +97,138 @@ def get_configuration_value(config_file):
 
 
 def build_docker_image(
-    context_path, image_tag, dockerfile="Dockerfile", additional_build_args=None
+    context_path,
+    image_tag,
+    dockerfile="Dockerfile",
+    additional_build_args=None,
+    use_context_cache=False,
 ):
+    """
+    Build the image of a deployable. With `use_context_cache` the context is
+    streamed from the compressed chunks cached by the previous build instead
+    of being tarred again (see build_context.py).
+    """
+    import docker
+
     docker_client = docker.from_env()
-    try:
-        docker_client.images.build(
-            path=context_path,
-            tag=image_tag,
-            dockerfile=dockerfile,
-            buildargs=additional_build_args,
+    build_kwargs = {"path": context_path}
+    context = None
+    with profiling.stage("docker_build", image_tag=image_tag) as build_stage:
+        if use_context_cache:
+            with profiling.stage("docker_context"):
+                context = BuildContext(
+                    context_path, read_dockerignore_entries(context_path)
+                ).prepare()
+            build_kwargs = {
+                "fileobj": context.open(),
+                "custom_context": True,
+                "encoding": "gzip",
+            }
+            build_stage.args["context_bytes"] = context.context_bytes
+            build_stage.args["context_compressed_bytes"] = context.compressed_bytes
+        elif profiling.profiler.enabled:
+            # size of the context docker-py tars and uploads to the daemon,
+            # which honours the .dockerignore
+            build_stage.args["context_bytes"] = context_size(
+                context_path, read_dockerignore_entries(context_path)
+            )
+        try:
+            docker_client.images.build(
+                tag=image_tag,
+                dockerfile=dockerfile,
+                buildargs=additional_build_args,
+                **build_kwargs,
+            )
+        except (docker.errors.APIError, docker.errors.BuildError) as error:
+            raise Exception(f"Failed to build docker image {image_tag}: {error}")
+        finally:
+            if context is not None:
+                build_kwargs["fileobj"].close()
+        if context is not None:
+            reader = build_kwargs["fileobj"]
+            build_stage.args["context_upload_seconds"] = reader.upload_seconds
+            print_context_report(context, reader)
+
+
+def print_context_report(context, reader):
+    upload_seconds = reader.upload_seconds
+    print(
+        f"Build context: {context.files} files, "
+        f"{format_bytes(context.context_bytes)} "
+        f"({format_bytes(context.compressed_bytes)} compressed), "
+        f"{context.files_reused} reused from the cache, "
+        f"prepared in {context.prepare_seconds:.1f}s"
+        + (
+            f", uploaded in {upload_seconds:.1f}s"
+            if upload_seconds is not None
+            else ""
         )
-    except (docker.errors.APIError, docker.errors.BuildError) as error:
-        raise Exception(f"Failed to build docker image {image_tag}: {error}")
+    )
+
+
+def tag_docker_image(image_tag, repository, tag=None):
+    import docker
+
+    docker_client = docker.from_env()
+    try:
+        docker_client.images.get(image_tag).tag(repository, tag=tag)
+    except docker.errors.APIError as error:
+        raise Exception(f"Failed to tag docker image {image_tag}: {error}")
 
 
 def push_docker_image_to_repository(
     repository, image_tag=None, username=None, password=None
 ):
+    import docker
+    import requests
+
     docker_client = docker.from_env()
-    docker_push_kwags = {"repository": repository, "tag": image_tag}
+    auth_config = None
     if username is not None and password is not None:
-        docker_push_kwags["auth_config"] = {"username": username, "password": password}
-    try:
-        docker_client.images.push(**docker_push_kwags)
-    except docker.errors.APIError as error:
-        raise Exception(f"Failed to push docker image {image_tag}: {error}")
+        auth_config = {"username": username, "password": password}
+    retry_errors = (
+        PushError,
+        docker.errors.APIError,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+    )
+    with profiling.stage("docker_push", repository=repository) as push_stage:
+        try:
+            progress = push_image(
+                docker_client.api,
+                repository,
+                tag=image_tag,
+                auth_config=auth_config,
+                retry_errors=retry_errors,
+            )
+        except retry_errors as error:
+            raise Exception(f"Failed to push docker image {image_tag}: {error}")
+        push_stage.args["bytes_pushed"] = sum(
+            layer.bytes_pushed for layer in progress.pushed_layers
+        )
+        push_stage.args["layers_pushed"] = len(progress.pushed_layers)
+        push_stage.args["layers_skipped"] = len(progress.skipped_layers)
+    print_push_report(progress)
+    return progress
+
+
+def print_push_report(progress):
+    for layer in progress.pushed_layers:
+        throughput = layer.throughput
+        get_console().print(
+            f"  pushed {layer.layer_id}: {format_bytes(layer.bytes_pushed)} "
+            f"in {layer.seconds:.1f}s"
+            + (f" ({format_bytes(throughput)}/s)" if throughput else "")
+            + (f", {layer.attempts} attempts" if layer.attempts > 1 else "")
+        )
+    skipped_layers = progress.skipped_layers
+    if skipped_layers:
+        get_console().print(
+            f"  skipped {len(skipped_layers)} layers already in the registry: "
+            + ", ".join(layer.layer_id for layer in skipped_layers)
+        )
+    if progress.digest is not None:
+        get_console().print(f"  digest: {progress.digest}")
 
 
 def is_present(project_path):
@@ -130,7 +240,7 @@ def is_present(project_path):
     if no existing deployment is found, return false
     """
     if os.path.exists(project_path):
-        response = console.input(
+        response = get_console().input(
             f"Existing deployable found [[b]{os.path.relpath(project_path)}[/b]]!"
             " Override? (y/n): "
         )
@@ -144,21 +254,79 @@ def is_present(project_path):
     return False
 
 
+class BentoTag(namedtuple("BentoTag", ["name", "version"])):
+    """The tag of a bento, read from its bento.yaml."""
+
+    def __str__(self):
+        return f"{self.name}:{self.version}"
+
+
+BENTO_YAML_PATH = "bento.yaml"
+PYTHON_VERSION_TXT_PATH = os.path.join("env", "python", "version.txt")
+
+# (bento path, mtimes of the files read) -> metadata
+_metadata_cache = {}
+
+
+def _read_bento_yaml(path):
+    import yaml
+
+    with open(os.path.join(path, BENTO_YAML_PATH), "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def _load_metadata_from_bento(path):
+    # only for bentos whose bento.yaml lacks the fields read below
+    import fs
+    from bentoml.bentos import Bento
+
+    bento = Bento.from_fs(fs.open_fs(path))
+    return bento.tag, bento.info.bentoml_version
+
+
 def get_metadata(path: str):
     """
     Load the tag, bentoml_version and python version from a given bento
-    path
+    path. Only bento.yaml and the python version file are read, results are
+    cached until one of them changes.
     """
+    path = os.path.abspath(path)
+    bento_yaml_path = os.path.join(path, BENTO_YAML_PATH)
+    python_version_txt_path = os.path.join(path, PYTHON_VERSION_TXT_PATH)
+    cache_key = (
+        path,
+        os.path.getmtime(bento_yaml_path),
+        os.path.getmtime(python_version_txt_path),
+    )
+    if cache_key in _metadata_cache:
+        return dict(_metadata_cache[cache_key])
+
     metadata = {}
 
-    bento = Bento.from_fs(fs.open_fs(path))
-    metadata["tag"] = bento.tag
-    metadata["bentoml_version"] = ".".join(bento.info.bentoml_version.split(".")[:3])
+    bento_info = _read_bento_yaml(path)
+    if all(bento_info.get(key) for key in ("name", "version", "bentoml_version")):
+        tag = BentoTag(bento_info["name"], str(bento_info["version"]))
+        bentoml_version = str(bento_info["bentoml_version"])
+    else:
+        tag, bentoml_version = _load_metadata_from_bento(path)
+    metadata["tag"] = tag
+    metadata["bentoml_version"] = ".".join(bentoml_version.split(".")[:3])
 
-    python_version_txt_path = "env/python/version.txt"
-    python_version_txt_path = os.path.join(path, python_version_txt_path)
     with open(python_version_txt_path, "r") as f:
         python_version = f.read()
     metadata["python_version"] = ".".join(python_version.split(".")[:2])
 
-    return metadata
+    _metadata_cache[cache_key] = metadata
+    return dict(metadata)
+
+
+def get_bento_apis(path: str):
+    """
+    The APIs of the bento's service as listed in its bento.yaml, each with
+    its `name` and `route` (the name unless the API sets its own route).
+    """
+    apis = []
+    for api in _read_bento_yaml(os.path.abspath(path)).get("apis") or []:
+        route = (api.get("route") or api["name"]).strip("/")
+        apis.append({"name": api["name"], "route": route})
+    return apis
@@ -1,5 +1,7 @@
 from collections import UserDict
 
+from bentoctl_azfunctions.sku_profiles import DEFAULT_SKU, get_worker_settings
+
 DEPLOYMENT_VALUES_WARNING = """# This file is maintained automatically by 
 # "bentoctl generate" and "bentoctl build" commands. 
 # Manual edits may be lost the next time these commands are run.
@@ -21,6 +23,14 @@ class DeploymentValues(UserDict):
             spec["image_repository"] = image_repository
             spec["image_version"] = image_version
 
+        # fill in the worker settings not given in the spec from the SKU
+        worker_settings = get_worker_settings(
+            spec.get("premium_plan_sku", DEFAULT_SKU)
+        )
+        for setting_name, setting_value in worker_settings.items():
+            if spec.get(setting_name) is None:
+                spec[setting_name] = setting_value
+
         super().__init__({"deployment_name": name, **spec})
         self.template_type = template_type
 
@@ -30,11 +40,24 @@ class DeploymentValues(UserDict):
 
     @classmethod
     def from_file(cls, file_path):
-        pass
+        """Read back a tfvars file written by `to_file`."""
+        values = {}
+        with open(file_path, "r") as values_file:
+            for line in values_file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                param_name, _, param_value = line.partition("=")
+                values[param_name.strip()] = param_value.strip().strip('"')
+        name = values.pop("deployment_name")
+        return cls(name, values, "terraform")
 
     def generate_terraform_tfvars_file(self, file_path):
         values = []
         for param_name, param_value in self.items():
+            if isinstance(param_value, bool):
+                # terraform only reads lower case booleans
+                param_value = str(param_value).lower()
             values.append(f'{param_name} = "{param_value}"')
 
         with open(file_path, "w") as values_file:
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+BENTO_FILES = {
+    "bento.yaml": "name: iris_classifier\nversion: 1\nbentoml_version: 1.0.0\n"
+    "apis:\n- name: classify\n",
+    "README.md": "# iris classifier\n",
+    "apis/openapi.yaml": "openapi: 3.0.2\n",
+    "env/docker/init.sh": "#!/bin/sh\n",
+    "env/python/version.txt": "3.8.13\n",
+    "env/python/requirements.txt": "scikit-learn\n",
+    "src/service.py": "import bentoml\n" * 8,
+}
+MODEL_BYTES = 64 * 1024
+
+
+@pytest.fixture
+def bento_path(tmp_path):
+    """A minimal built bento: a service, its env and one model."""
+    path = tmp_path / "bento"
+    for name, content in BENTO_FILES.items():
+        file_path = path / name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+    model_dir = path / "models" / "iris_clf" / "v1"
+    model_dir.mkdir(parents=True)
+    (model_dir / "saved_model.pkl").write_bytes(os.urandom(MODEL_BYTES))
+    return str(path)
+
+
+@pytest.fixture
+def bento_metadata():
+    return {"bentoml_version": "1.0.0", "python_version": "3.8"}
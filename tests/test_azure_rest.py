@@ -0,0 +1,146 @@
+import base64
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bentoctl")
+
+from bentoctl.exceptions import BentoctlException  # noqa: E402
+
+from bentoctl_azfunctions.azure_rest import AzureRestClient  # noqa: E402
+
+
+def make_jwt(expires_at):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": expires_at}).encode())
+    return f"header.{payload.decode().rstrip('=')}.signature"
+
+
+class StubAzure(BaseHTTPRequestHandler):
+    """Answers the token, registry and ACR exchange endpoints of the client."""
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode()))
+        self.server.calls.append(("POST", self.path, form))
+        if self.path.endswith("/oauth2/v2.0/token"):
+            self._reply(200, {"access_token": "arm-token", "expires_in": 3600})
+        elif self.path == "/oauth2/exchange":
+            self._reply(200, {"refresh_token": make_jwt(time.time() + 3600)})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_GET(self):
+        self.server.calls.append(("GET", self.path, dict(self.headers)))
+        if "/registries/disabledacr" in self.path:
+            self._reply(200, {"properties": {"adminUserEnabled": False}})
+        elif "/registries/" in self.path:
+            self._reply(200, {"properties": {"adminUserEnabled": True}})
+        else:
+            self._reply(404, {"error": "not found"})
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAzure)
+    server.calls = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub_server):
+    endpoint = f"http://127.0.0.1:{stub_server.server_address[1]}"
+    return AzureRestClient(
+        "tenant",
+        "client",
+        "secret",
+        "subscription",
+        authority_host=endpoint,
+        arm_endpoint=endpoint,
+        acr_endpoint=endpoint,
+    )
+
+
+def test_admin_user_enabled(client, stub_server):
+    assert client.is_admin_user_enabled("irisacr", "iris") is True
+    assert client.is_admin_user_enabled("disabledacr", "iris") is False
+
+    token_calls = [call for call in stub_server.calls if call[1].endswith("/token")]
+    # the ARM token is fetched once and reused
+    assert len(token_calls) == 1
+    _, path, form = token_calls[0]
+    assert path == "/tenant/oauth2/v2.0/token"
+    # the scope follows the configured resource manager endpoint
+    assert form["scope"] == f"{client.arm_endpoint}/.default"
+
+    _, path, headers = stub_server.calls[1]
+    assert path.startswith(
+        "/subscriptions/subscription/resourceGroups/iris"
+        "/providers/Microsoft.ContainerRegistry/registries/irisacr"
+    )
+    assert headers["Authorization"] == "Bearer arm-token"
+
+
+def test_acr_refresh_token_is_cached(client, stub_server):
+    token = client.get_acr_refresh_token("irisacr")
+    assert client.get_acr_refresh_token("irisacr") == token
+
+    exchanges = [call for call in stub_server.calls if call[1] == "/oauth2/exchange"]
+    assert len(exchanges) == 1
+    form = exchanges[0][2]
+    assert form["service"] == "irisacr.azurecr.io"
+    assert form["access_token"] == "arm-token"
+
+
+def test_expired_tokens_are_refreshed(client, stub_server):
+    client.get_arm_token()
+    # pretend the cached token is about to expire
+    client._tokens["arm"] = ("arm-token", time.time() + 1)
+    client.get_arm_token()
+
+    token_calls = [call for call in stub_server.calls if call[1].endswith("/token")]
+    assert len(token_calls) == 2
+
+
+def test_errors_raise(client):
+    with pytest.raises(BentoctlException, match="404"):
+        client._request("GET", f"{client.arm_endpoint}/unknown")
+
+
+def test_from_env(monkeypatch):
+    for name in [
+        "AZURE_TENANT_ID",
+        "AZURE_CLIENT_ID",
+        "AZURE_CLIENT_SECRET",
+        "AZURE_SUBSCRIPTION_ID",
+    ]:
+        monkeypatch.delenv(name, raising=False)
+    # without credentials the CLI is used
+    assert AzureRestClient.from_env() is None
+
+    for name in ["AZURE_TENANT_ID", "AZURE_CLIENT_ID", "AZURE_CLIENT_SECRET"]:
+        monkeypatch.setenv(name, "value")
+    monkeypatch.setenv("AZURE_SUBSCRIPTION_ID", "subscription")
+    monkeypatch.setenv("AZURE_RESOURCE_MANAGER_ENDPOINT", "https://management.example/")
+    client = AzureRestClient.from_env()
+    assert client.subscription_id == "subscription"
+    assert client.arm_endpoint == "https://management.example"
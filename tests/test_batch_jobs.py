@@ -0,0 +1,141 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from bentoctl_azfunctions.azurefunctions import batch_jobs
+
+
+class FakeDownloader:
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+
+    def chunks(self):
+        for start in range(0, len(self.data), self.chunk_size):
+            yield self.data[start : start + self.chunk_size]
+
+
+class FakeBlobClient:
+    """Block blob stand-in, committed blocks make up its content."""
+
+    def __init__(self, data=b"", chunk_size=7):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.staged = {}
+        self.committed = None
+
+    def download_blob(self):
+        return FakeDownloader(self.data, self.chunk_size)
+
+    def stage_block(self, block_id, data):
+        self.staged[block_id] = data
+
+    def commit_block_list(self, block_list):
+        self.committed = [block.id for block in block_list]
+        self.data = b"".join(self.staged[block_id] for block_id in self.committed)
+
+
+class FakeBlobServiceClient:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def get_blob_client(self, container, blob):
+        return self.blobs.setdefault(f"{container}/{blob}", FakeBlobClient())
+
+
+def jsonl(records):
+    return b"".join(json.dumps(record).encode() + b"\n" for record in records)
+
+
+def run_job(job, blobs, handle_batch, batch_size, **kwargs):
+    pytest.importorskip("azure.storage.blob")
+    return asyncio.run(
+        batch_jobs.run_job(
+            batch_jobs.parse_job(json.dumps(job)),
+            FakeBlobServiceClient(blobs),
+            handle_batch,
+            batch_size,
+            **kwargs,
+        )
+    )
+
+
+def test_parse_job():
+    job = batch_jobs.parse_job('{"route": "/classify/", "input": "in/records.jsonl"}')
+    assert job == {
+        "route": "classify",
+        "input": "in/records.jsonl",
+        "output": "batch-output/records.jsonl",
+    }
+    with pytest.raises(ValueError):
+        batch_jobs.parse_job('{"route": "classify"}')
+    with pytest.raises(ValueError):
+        batch_jobs.parse_job('{"route": "classify", "input": "records.jsonl"}')
+
+
+def test_results_are_written_in_order():
+    records = [[i, i + 1] for i in range(10)]
+    # no trailing newline, and a chunk size splitting the lines
+    blobs = {"in/records.jsonl": FakeBlobClient(jsonl(records).rstrip(b"\n"))}
+    batches = []
+
+    async def handle_batch(route, batch):
+        batches.append((route, len(batch)))
+        return [sum(record) for record in batch]
+
+    summary = run_job(
+        {"route": "classify", "input": "in/records.jsonl"}, blobs, handle_batch, 4
+    )
+
+    assert batches == [("classify", 4), ("classify", 4), ("classify", 2)]
+    output = blobs["batch-output/records.jsonl"].data
+    assert output == jsonl([sum(record) for record in records])
+    assert summary["records"] == 10
+    assert summary["batches"] == 3
+    assert summary["errors"] == 0
+    assert summary["bytes_written"] == len(output)
+
+
+def test_failed_batches_are_retried_record_by_record():
+    blobs = {"in/records.jsonl": FakeBlobClient(jsonl([1, "bad", 3]))}
+
+    async def handle_batch(route, batch):
+        if "bad" in batch:
+            raise ValueError("bad record")
+        return [record * 10 for record in batch]
+
+    summary = run_job(
+        {"route": "classify", "input": "in/records.jsonl", "output": "out/r.jsonl"},
+        blobs,
+        handle_batch,
+        8,
+    )
+
+    lines = [json.loads(line) for line in blobs["out/r.jsonl"].data.splitlines()]
+    assert lines == [10, {"error": "bad record"}, 30]
+    assert summary["errors"] == 1
+
+
+def test_output_is_staged_in_blocks():
+    records = list(range(20))
+    blobs = {"in/records.jsonl": FakeBlobClient(jsonl(records))}
+
+    async def handle_batch(route, batch):
+        return [{"value": record} for record in batch]
+
+    run_job(
+        {"route": "echo", "input": "in/records.jsonl"},
+        blobs,
+        handle_batch,
+        5,
+        block_size=16,
+    )
+
+    output_blob = blobs["batch-output/records.jsonl"]
+    assert len(output_blob.committed) > 1
+    assert [base64.b64decode(block_id) for block_id in output_blob.committed] == [
+        f"{index:08d}".encode() for index in range(len(output_blob.committed))
+    ]
+    assert output_blob.data == jsonl([{"value": record} for record in records])
@@ -0,0 +1,40 @@
+import os
+
+from bentoctl_azfunctions.build_context import (
+    BuildContext,
+    context_size,
+    read_dockerignore_entries,
+    write_dockerignore,
+)
+from bentoctl_azfunctions.slimming import directory_sizes
+
+from conftest import BENTO_FILES, MODEL_BYTES
+
+
+def test_context_size_follows_the_dockerignore(bento_path, tmp_path):
+    write_dockerignore(bento_path, ["models", "src"])
+    entries = read_dockerignore_entries(bento_path)
+
+    size = context_size(bento_path, entries)
+    assert size == MODEL_BYTES + len(BENTO_FILES["src/service.py"])
+    # the whole directory is what docker would send without the .dockerignore
+    assert size < sum(directory_sizes(bento_path, depth=1).values())
+
+    context = BuildContext(
+        bento_path, entries, cache_dir=str(tmp_path / "cache")
+    ).prepare()
+    assert context.context_bytes == size
+
+
+def test_cached_context_only_compresses_changed_files(bento_path, tmp_path):
+    write_dockerignore(bento_path, ["models", "src"])
+    entries = read_dockerignore_entries(bento_path)
+    cache_dir = str(tmp_path / "cache")
+    BuildContext(bento_path, entries, cache_dir=cache_dir).prepare()
+
+    with open(os.path.join(bento_path, "src", "service.py"), "a") as f:
+        f.write("# changed\n")
+    context = BuildContext(bento_path, entries, cache_dir=cache_dir).prepare()
+
+    # the changed file is compressed again, the rest is reused
+    assert context.files_reused == context.files - 1
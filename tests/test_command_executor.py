@@ -0,0 +1,133 @@
+import json
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+from bentoctl_azfunctions.command_executor import CommandExecutor, executor
+from bentoctl_azfunctions.utils import set_cors_settings
+
+FAKE_AZ = """\
+#!{python}
+# Stand-in for the Azure CLI: logs its arguments and answers `cors show`
+# with the origins in $FAKE_AZ_ORIGINS.
+import json
+import os
+import sys
+
+with open(os.environ["FAKE_AZ_LOG"], "a") as log:
+    log.write(json.dumps(sys.argv[1:]) + "\\n")
+if sys.argv[1:2] == ["fail"]:
+    sys.stderr.write("ERROR: failed\\n")
+    sys.exit(1)
+if sys.argv[1:4] == ["functionapp", "cors", "show"]:
+    origins = json.loads(os.environ.get("FAKE_AZ_ORIGINS", "[]"))
+    print(json.dumps({{"allowedOrigins": origins}}))
+else:
+    print(json.dumps({{"args": sys.argv[1:]}}))
+"""
+
+
+@pytest.fixture
+def fake_az(tmp_path, monkeypatch):
+    """Puts a fake `az` first on PATH, returns a function reading its calls."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    az_path = bin_dir / "az"
+    az_path.write_text(FAKE_AZ.format(python=sys.executable))
+    az_path.chmod(az_path.stat().st_mode | stat.S_IEXEC)
+    log_path = tmp_path / "az.log"
+    log_path.write_text("")
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_AZ_LOG", str(log_path))
+    executor.clear_cache()
+
+    def calls():
+        return [json.loads(line) for line in log_path.read_text().splitlines()]
+
+    return calls
+
+
+def test_run_parses_json(fake_az):
+    result, stderr = CommandExecutor().run(["az", "acr", "show"])
+
+    assert result == {"args": ["acr", "show"]}
+    assert stderr == ""
+    assert fake_az() == [["acr", "show"]]
+
+
+def test_read_only_results_are_cached(fake_az):
+    command_executor = CommandExecutor()
+    first = command_executor.run(["az", "acr", "show"], cache_ttl=10)
+    second = command_executor.run(["az", "acr", "show"], cache_ttl=10)
+
+    assert first == second
+    assert fake_az() == [["acr", "show"]]
+    assert [timing.cached for timing in command_executor.timings] == [False, True]
+
+
+def test_cache_expires(fake_az):
+    command_executor = CommandExecutor()
+    command_executor.run(["az", "acr", "show"], cache_ttl=0.01)
+    time.sleep(0.02)
+    command_executor.run(["az", "acr", "show"], cache_ttl=0.01)
+
+    assert len(fake_az()) == 2
+
+
+def test_commands_changing_state_clear_the_cache(fake_az):
+    command_executor = CommandExecutor()
+    command_executor.run(["az", "acr", "show"], cache_ttl=10)
+    command_executor.run(["az", "acr", "update"])
+    command_executor.run(["az", "acr", "show"], cache_ttl=10)
+
+    assert fake_az() == [["acr", "show"], ["acr", "update"], ["acr", "show"]]
+
+
+def test_clear_cache(fake_az):
+    command_executor = CommandExecutor()
+    command_executor.run(["az", "acr", "show"], cache_ttl=10)
+    command_executor.clear_cache()
+    command_executor.run(["az", "acr", "show"], cache_ttl=10)
+
+    assert len(fake_az()) == 2
+
+
+def test_failed_command_raises(fake_az):
+    command_executor = CommandExecutor()
+    with pytest.raises(Exception, match="ERROR: failed"):
+        command_executor.run(["az", "fail"])
+    assert len(command_executor.timings) == 1
+
+
+def test_submit_runs_concurrently(fake_az):
+    command_executor = CommandExecutor(max_workers=4)
+    started_at = time.perf_counter()
+    futures = [command_executor.submit(time.sleep, 0.2) for _ in range(4)]
+    for future in futures:
+        future.result()
+
+    assert time.perf_counter() - started_at < 0.6
+
+
+def test_cors_removals_are_batched(fake_az, monkeypatch):
+    monkeypatch.setenv("FAKE_AZ_ORIGINS", json.dumps(["https://a", "https://b"]))
+    set_cors_settings("iris-fn", "iris")
+
+    calls = fake_az()
+    assert [call[:3] for call in calls] == [
+        ["functionapp", "cors", "show"],
+        ["functionapp", "cors", "remove"],
+        ["functionapp", "cors", "add"],
+    ]
+    remove = calls[1]
+    assert remove[remove.index("--allowed-origins") + 1 :] == ["https://a", "https://b"]
+
+
+def test_cors_already_open(fake_az, monkeypatch):
+    monkeypatch.setenv("FAKE_AZ_ORIGINS", json.dumps(["*"]))
+    set_cors_settings("iris-fn", "iris")
+
+    assert [call[:3] for call in fake_az()] == [["functionapp", "cors", "show"]]
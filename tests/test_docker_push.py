@@ -0,0 +1,167 @@
+import pytest
+
+from bentoctl_azfunctions.docker_push import PushError, PushProgress, push_image
+
+
+def pushing(layer_id, current, total):
+    return {
+        "status": "Pushing",
+        "id": layer_id,
+        "progressDetail": {"current": current, "total": total},
+    }
+
+
+DIGEST = {"status": "v1: digest: sha256:abc size: 1234"}
+
+
+class FakeDockerApi:
+    """Replays one list of push messages per attempt, an exception fails it."""
+
+    def __init__(self, attempts):
+        self.attempts = list(attempts)
+        self.calls = []
+
+    def push(self, repository, tag=None, auth_config=None, stream=False, decode=False):
+        self.calls.append((repository, tag, auth_config))
+        for message in self.attempts.pop(0):
+            if isinstance(message, Exception):
+                raise message
+            yield message
+
+
+def test_progress_of_every_layer():
+    progress = PushProgress()
+    for now, message in enumerate(
+        [
+            {"status": "Layer already exists", "id": "base"},
+            pushing("models", 0, 1000),
+            pushing("models", 500, 1000),
+            {"status": "Pushed", "id": "models"},
+            DIGEST,
+        ]
+    ):
+        progress.update(message, now=float(now))
+
+    assert [layer.layer_id for layer in progress.skipped_layers] == ["base"]
+    [models] = progress.pushed_layers
+    assert models.bytes_pushed == 1000
+    assert models.seconds == 2.0
+    assert models.throughput == 500.0
+    assert progress.digest == "sha256:abc"
+
+
+def test_error_message_raises():
+    with pytest.raises(PushError, match="denied"):
+        PushProgress().update({"error": "denied: requested access is denied"})
+
+
+def test_failed_push_is_retried_with_backoff():
+    docker_api = FakeDockerApi(
+        [
+            [
+                pushing("a", 0, 10),
+                {"status": "Pushed", "id": "a"},
+                pushing("b", 0, 100),
+                {"error": "write tcp 10.0.0.2:443: connection reset by peer"},
+            ],
+            [
+                {"status": "Layer already exists", "id": "a"},
+                pushing("b", 0, 100),
+                {"status": "Pushed", "id": "b"},
+                DIGEST,
+            ],
+        ]
+    )
+    sleeps = []
+    progress = push_image(
+        docker_api,
+        "irisacr.azurecr.io/iris",
+        tag="v1",
+        backoff=1.0,
+        sleep=sleeps.append,
+    )
+
+    assert len(docker_api.calls) == 2
+    assert sleeps == [1.0]
+    # `a` made it on the first attempt: pushed, not skipped
+    assert [layer.layer_id for layer in progress.pushed_layers] == ["a", "b"]
+    assert progress.skipped_layers == []
+    assert progress.layers["b"].attempts == 2
+    assert progress.digest == "sha256:abc"
+
+
+class ConnectionFailed(Exception):
+    pass
+
+
+def test_retry_errors():
+    docker_api = FakeDockerApi([[ConnectionFailed()], [DIGEST]])
+    progress = push_image(
+        docker_api,
+        "iris",
+        retry_errors=(PushError, ConnectionFailed),
+        sleep=lambda seconds: None,
+    )
+    assert progress.digest == "sha256:abc"
+
+    # other errors are not retried
+    docker_api = FakeDockerApi([[ConnectionFailed()], [DIGEST]])
+    with pytest.raises(ConnectionFailed):
+        push_image(docker_api, "iris", sleep=lambda seconds: None)
+    assert len(docker_api.calls) == 1
+
+
+def test_gives_up_after_max_attempts():
+    docker_api = FakeDockerApi([[{"error": "unavailable"}]] * 3)
+    sleeps = []
+    with pytest.raises(PushError):
+        push_image(docker_api, "iris", max_attempts=3, backoff=2.0, sleep=sleeps.append)
+
+    assert sleeps == [2.0, 4.0]
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        "unauthorized: authentication required",
+        "denied: requested access to the resource is denied",
+        "manifest invalid: manifest invalid",
+    ],
+)
+def test_permanent_errors_are_not_retried(error):
+    docker_api = FakeDockerApi([[{"error": error}], [DIGEST]])
+    sleeps = []
+    with pytest.raises(PushError):
+        push_image(docker_api, "iris", sleep=sleeps.append)
+
+    assert len(docker_api.calls) == 1
+    assert sleeps == []
+
+
+class ApiError(Exception):
+    """Like docker.errors.APIError, with the status code of the daemon."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def test_only_server_errors_of_the_daemon_are_retried():
+    docker_api = FakeDockerApi([[ApiError("Bad Gateway", 502)], [DIGEST]])
+    progress = push_image(
+        docker_api, "iris", retry_errors=(ApiError,), sleep=lambda seconds: None
+    )
+    assert progress.digest == "sha256:abc"
+
+    for error in [
+        ApiError("Not Found: no such image", 404),
+        ApiError(
+            'Internal Server Error ("unauthorized: authentication required")', 500
+        ),
+    ]:
+        docker_api = FakeDockerApi([[error], [DIGEST]])
+        with pytest.raises(ApiError):
+            push_image(
+                docker_api, "iris", retry_errors=(ApiError,), sleep=lambda seconds: None
+            )
+        assert len(docker_api.calls) == 1
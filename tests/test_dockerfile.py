@@ -0,0 +1,100 @@
+import os
+
+from bentoctl_azfunctions.create_deployable import create_deployable
+from bentoctl_azfunctions.slimming import directory_sizes
+
+from conftest import BENTO_FILES, MODEL_BYTES
+
+
+def runtime_copy_layers(dockerfile_path):
+    """(sources, destination) of every COPY of the runtime stage, in order."""
+    with open(dockerfile_path, "r") as f:
+        lines = f.read().splitlines()
+    runtime_start = lines.index("FROM dependencies AS runtime")
+    layers = []
+    for line in lines[runtime_start + 1 :]:
+        if line.startswith("FROM "):
+            break
+        if line.startswith("COPY "):
+            *sources, destination = line.split()[1:]
+            layers.append(([source.strip("./") for source in sources], destination))
+    return layers
+
+
+def layer_bytes(deployable_path, sources):
+    sizes = directory_sizes(deployable_path, depth=1)
+    return sum(sizes.get(source, 0) for source in sources)
+
+
+def build(bento_path, bento_metadata, tmp_path):
+    dockerfile_path, context_path, _ = create_deployable(
+        bento_path, str(tmp_path / "out"), bento_metadata
+    )
+    return dockerfile_path, context_path
+
+
+def test_runtime_layers_are_ordered_least_changed_first(
+    bento_path, bento_metadata, tmp_path
+):
+    dockerfile_path, _ = build(bento_path, bento_metadata, tmp_path)
+    sources = [
+        source for layer, _ in runtime_copy_layers(dockerfile_path) for source in layer
+    ]
+
+    order = [sources.index(entry) for entry in ["models", "app", "src", "bento.yaml"]]
+    assert order == sorted(order)
+    assert sources[-1] == "bento.yaml"
+    # env is installed by the dependencies stage, never copied again
+    assert "env" not in sources
+    assert len(sources) == len(set(sources))
+
+
+def test_copy_layer_sizes(bento_path, bento_metadata, tmp_path):
+    dockerfile_path, context_path = build(bento_path, bento_metadata, tmp_path)
+    sizes = {
+        tuple(layer): layer_bytes(context_path, layer)
+        for layer, _ in runtime_copy_layers(dockerfile_path)
+    }
+
+    assert sizes[("models",)] == MODEL_BYTES
+    assert sizes[("src",)] == len(BENTO_FILES["src/service.py"])
+    assert sizes[("bento.yaml",)] == len(BENTO_FILES["bento.yaml"])
+    # everything the runtime stage copies adds up to the deployable minus env
+    deployable_sizes = directory_sizes(context_path, depth=1)
+    copied_entries = {entry for layer in sizes for entry in layer}
+    assert sum(sizes.values()) == sum(
+        deployable_sizes[entry] for entry in copied_entries
+    )
+    # the models layer dwarfs the code layers that change on every build
+    code_bytes = sizes[("src",)] + sizes[("bento.yaml",)]
+    assert sizes[("models",)] > 100 * code_bytes
+
+
+def test_code_change_keeps_the_models_layer(bento_path, bento_metadata, tmp_path):
+    dockerfile_path, _ = build(bento_path, bento_metadata, tmp_path)
+    layers_before = runtime_copy_layers(dockerfile_path)
+
+    with open(os.path.join(bento_path, "src", "service.py"), "a") as f:
+        f.write("# changed\n")
+    dockerfile_path, _ = build(bento_path, bento_metadata, tmp_path)
+
+    # the instructions (hence the cache keys up to src) are unchanged
+    assert runtime_copy_layers(dockerfile_path) == layers_before
+
+
+def test_buildkit_cache_mounts(bento_path, bento_metadata, tmp_path):
+    dockerfile_path, _, _ = create_deployable(
+        bento_path, str(tmp_path / "out"), bento_metadata, use_buildkit=True
+    )
+    with open(dockerfile_path, "r") as f:
+        dockerfile = f.read()
+
+    assert dockerfile.startswith("# syntax=docker/dockerfile:1\n")
+    assert (
+        "RUN --mount=type=cache,target=/root/.cache/pip "
+        "./env/docker/init.sh install_pip_packages"
+    ) in dockerfile
+    assert (
+        "RUN --mount=type=cache,target=/opt/conda/pkgs "
+        "./env/docker/init.sh restore_conda_env"
+    ) in dockerfile
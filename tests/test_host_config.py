@@ -0,0 +1,151 @@
+import json
+
+import pytest
+
+from bentoctl_azfunctions.create_deployable import generate_host_json_in
+from bentoctl_azfunctions.rollout import check_runtime_versions, normalize_spec
+from bentoctl_azfunctions.sku_profiles import SKU_PROFILES, get_worker_settings
+from bentoctl_azfunctions.values import DeploymentValues
+
+WORKER_FIELDS = [
+    "worker_process_count",
+    "threadpool_thread_count",
+    "max_concurrent_requests",
+    "max_outstanding_requests",
+]
+SPEC = {"resource_group": "iris", "acr_name": "irisacr"}
+
+
+def read_http_config(host_json_path):
+    with open(host_json_path, "r") as f:
+        return json.load(f)["extensions"]["http"]
+
+
+@pytest.mark.parametrize("sku", sorted(SKU_PROFILES))
+def test_host_json_is_sized_for_the_sku(tmp_path, sku):
+    http_config = read_http_config(generate_host_json_in(str(tmp_path), sku))
+
+    cores = SKU_PROFILES[sku]["cores"]
+    assert http_config["maxConcurrentRequests"] == 50 * cores
+    assert http_config["maxOutstandingRequests"] == 200 * cores
+    assert http_config["dynamicThrottlesEnabled"] is True
+    # the settings of the template are kept
+    assert http_config["routePrefix"] == ""
+
+
+def test_host_json_overrides(tmp_path):
+    http_config = read_http_config(
+        generate_host_json_in(
+            str(tmp_path),
+            "P3v2",
+            max_concurrent_requests=10,
+            max_outstanding_requests=None,
+            dynamic_throttles_enabled=False,
+        )
+    )
+
+    assert http_config["maxConcurrentRequests"] == 10
+    # not overridden, sized for the SKU
+    assert http_config["maxOutstandingRequests"] == 800
+    assert http_config["dynamicThrottlesEnabled"] is False
+
+
+@pytest.mark.parametrize(
+    "streaming, bundle_version", [(False, "[1.*, 2.0.0)"), (True, "[4.*, 5.0.0)")]
+)
+def test_extension_bundle_matches_the_runtime(tmp_path, streaming, bundle_version):
+    with open(generate_host_json_in(str(tmp_path), streaming=streaming), "r") as f:
+        host_config = json.load(f)
+
+    assert host_config["extensionBundle"]["version"] == bundle_version
+
+
+@pytest.mark.parametrize("sku", sorted(SKU_PROFILES))
+def test_deployment_values_fill_in_the_sku_defaults(sku):
+    values = DeploymentValues("iris", dict(SPEC, premium_plan_sku=sku), "terraform")
+
+    assert values["worker_process_count"] == SKU_PROFILES[sku]["cores"]
+    for field, value in get_worker_settings(sku).items():
+        assert values[field] == value
+
+
+def test_deployment_values_keep_the_spec_settings():
+    spec = dict(SPEC, premium_plan_sku="P3v2", worker_process_count=2)
+    values = DeploymentValues("iris", spec, "terraform")
+
+    assert values["worker_process_count"] == 2
+    assert values["max_concurrent_requests"] == 200
+
+
+def test_tfvars_file(tmp_path):
+    values_path = str(tmp_path / "bentoctl.tfvars")
+    spec = dict(SPEC, premium_plan_sku="P2v2", image_tag="irisacr.azurecr.io/iris:v1")
+    DeploymentValues("iris", spec, "terraform").to_file(values_path)
+
+    with open(values_path, "r") as f:
+        lines = f.read().splitlines()
+    assert 'worker_process_count = "2"' in lines
+    assert 'max_concurrent_requests = "100"' in lines
+    # terraform only reads lower case booleans
+    assert 'dynamic_throttles_enabled = "true"' in lines
+    assert 'image_repository = "iris"' in lines
+
+    values = DeploymentValues.from_file(values_path)
+    assert values["deployment_name"] == "iris"
+    assert values["worker_process_count"] == "2"
+
+
+@pytest.mark.parametrize("field", WORKER_FIELDS)
+def test_worker_fields_are_coerced_to_int(field):
+    pytest.importorskip("cerberus")
+
+    assert normalize_spec("iris", dict(SPEC, **{field: "8"}))[field] == 8
+    # left unset, the SKU decides
+    assert normalize_spec("iris", dict(SPEC))[field] is None
+
+
+@pytest.mark.parametrize("enable_streaming", [False, True])
+def test_runtime_version_must_match_the_deployable(enable_streaming):
+    pytest.importorskip("cerberus")
+
+    deployments = [
+        {"name": "iris", "spec": normalize_spec("iris", dict(SPEC))},
+        {
+            "name": "iris-streaming",
+            "spec": normalize_spec(
+                "iris-streaming", dict(SPEC, enable_streaming=enable_streaming)
+            ),
+        },
+    ]
+    check_runtime_versions(deployments[:1], streaming=False)
+    if enable_streaming:
+        with pytest.raises(ValueError, match="iris-streaming"):
+            check_runtime_versions(deployments, streaming=False)
+        check_runtime_versions(deployments[1:], streaming=True)
+    else:
+        check_runtime_versions(deployments, streaming=False)
+        with pytest.raises(ValueError, match="enable_streaming=False"):
+            check_runtime_versions(deployments, streaming=True)
+
+
+@pytest.mark.parametrize(
+    "limits, valid",
+    [
+        ("", True),
+        ("classify=2", True),
+        ("classify=2,v1/embed=16", True),
+        ("classify=ten", False),
+        ("classify", False),
+        ("classify=0", False),
+        ("classify=2,", False),
+    ],
+)
+def test_api_concurrency_limits_are_validated(limits, valid):
+    pytest.importorskip("cerberus")
+
+    spec = dict(SPEC, api_concurrency_limits=limits)
+    if valid:
+        assert normalize_spec("iris", spec)["api_concurrency_limits"] == limits
+    else:
+        with pytest.raises(ValueError, match="api_concurrency_limits"):
+            normalize_spec("iris", spec)
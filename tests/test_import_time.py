@@ -0,0 +1,104 @@
+import importlib
+import importlib.util
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+import bentoctl_azfunctions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules none of the entry points may import when they are resolved
+HEAVY_MODULES = ["docker", "rich", "bentoml", "fs", "requests", "yaml"]
+# entry point -> (statement resolving it, cumulative import budget in ms)
+ENTRY_POINTS = {
+    "package": ("import bentoctl_azfunctions", 50),
+    "generate": ("from bentoctl_azfunctions import generate", 400),
+    "create_deployable": ("from bentoctl_azfunctions import create_deployable", 150),
+    "create_repository": ("from bentoctl_azfunctions import create_repository", 400),
+    "delete_repository": ("from bentoctl_azfunctions import delete_repository", 400),
+}
+# entry points importing bentoctl itself, what bentoctl imports is not
+# counted against them
+NEEDS_BENTOCTL = {"generate", "create_repository", "delete_repository"}
+BENTOCTL_IMPORT = "import bentoctl.exceptions"
+
+
+def import_times(statement):
+    """
+    The cumulative import time (in ms) of the modules `statement` imports
+    first hand in a fresh interpreter, from `python -X importtime`, and the
+    names of all the modules it imports.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    times = {}
+    names = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        names.append(name.strip())
+        # nested imports are indented, their time is in their parent's
+        if not name.startswith("  "):
+            times[name.strip()] = int(cumulative) / 1000
+    return times, names
+
+
+@pytest.mark.parametrize("entry_point", sorted(ENTRY_POINTS))
+def test_entry_point_import_budget(entry_point):
+    if entry_point in NEEDS_BENTOCTL and importlib.util.find_spec("bentoctl") is None:
+        pytest.skip("bentoctl is not installed")
+    statement, budget_ms = ENTRY_POINTS[entry_point]
+    bentoctl_names = set()
+    if entry_point in NEEDS_BENTOCTL:
+        _, bentoctl_names = import_times(BENTOCTL_IMPORT)
+        statement = f"{BENTOCTL_IMPORT}; {statement}"
+    times, names = import_times(statement)
+
+    heavy_imports = [
+        name
+        for name in names
+        if name.split(".")[0] in HEAVY_MODULES and name not in bentoctl_names
+    ]
+    assert heavy_imports == []
+    package_ms = sum(
+        ms for name, ms in times.items() if name.startswith("bentoctl_azfunctions")
+    )
+    assert package_ms < budget_ms, f"{entry_point} took {package_ms:.1f}ms to import"
+
+
+def test_submodule_import_keeps_the_function():
+    importlib.import_module("bentoctl_azfunctions.create_deployable")
+
+    # importing the submodule sets it on the package, the guard keeps the
+    # function of the same name
+    assert isinstance(bentoctl_azfunctions.create_deployable, types.FunctionType)
+    from bentoctl_azfunctions import create_deployable
+
+    assert create_deployable.__module__ == "bentoctl_azfunctions.create_deployable"
+
+
+def test_other_attributes_can_be_set(monkeypatch):
+    monkeypatch.setattr(bentoctl_azfunctions, "create_deployable", "patched")
+    assert bentoctl_azfunctions.create_deployable == "patched"
+
+    submodule = types.ModuleType("bentoctl_azfunctions.values")
+    monkeypatch.setattr(bentoctl_azfunctions, "values", submodule, raising=False)
+    assert bentoctl_azfunctions.values is submodule
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        bentoctl_azfunctions.does_not_exist
+
+    assert "create_repository" in dir(bentoctl_azfunctions)
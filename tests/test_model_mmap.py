@@ -0,0 +1,39 @@
+import pytest
+
+from bentoctl_azfunctions.azurefunctions import model_mmap
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def patched_numpy(monkeypatch):
+    # restored after the test, enable() patches numpy.load in place
+    monkeypatch.setattr(np, "load", np.load)
+    assert "numpy" in model_mmap.enable()
+
+
+def test_arrays_are_memory_mapped(patched_numpy, tmp_path):
+    path = str(tmp_path / "weights.npy")
+    np.save(path, np.arange(10, dtype=np.float32))
+
+    weights = np.load(path)
+    assert isinstance(weights, np.memmap)
+    assert not weights.flags.writeable
+    assert weights.tolist() == list(range(10))
+
+
+def test_object_arrays_are_loaded_as_before(patched_numpy, tmp_path):
+    path = str(tmp_path / "vocabulary.npy")
+    np.save(path, np.array([{"a": 1}, "b"], dtype=object), allow_pickle=True)
+
+    vocabulary = np.load(path, allow_pickle=True)
+    assert not isinstance(vocabulary, np.memmap)
+    assert vocabulary.tolist() == [{"a": 1}, "b"]
+
+
+def test_open_files_are_not_mapped(patched_numpy, tmp_path):
+    path = tmp_path / "weights.npy"
+    np.save(str(path), np.ones(3))
+
+    with open(path, "rb") as f:
+        assert not isinstance(np.load(f), np.memmap)
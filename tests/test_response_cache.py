@@ -0,0 +1,175 @@
+import pytest
+
+from bentoctl_azfunctions.azurefunctions.response_cache import (
+    CachedResponse,
+    LRUCache,
+    ResponseCache,
+    make_key,
+    make_shared_store,
+    parse_cache_control,
+    response_ttl,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class DictStore:
+    """Shared tier stand-in, keeps the TTL of every entry."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        return None if entry is None else entry[0]
+
+    def set(self, key, value, ttl):
+        self.entries[key] = (value, ttl)
+
+
+class BrokenStore:
+    def get(self, key):
+        raise ConnectionError("unreachable")
+
+    def set(self, key, value, ttl):
+        raise ConnectionError("unreachable")
+
+
+def response(body=b'{"label": 1}'):
+    return CachedResponse(body, 200, {"X-Model": "iris"}, "application/json", "utf-8")
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    assert cache.get("a") == 1
+    cache.set("c", 3, 60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_entries_expire():
+    clock = FakeClock()
+    cache = LRUCache(10, clock=clock)
+    cache.set("a", 1, 5)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_key_covers_the_request():
+    key = make_key("classify", "POST", b"[1]", "a=1", {"Accept": "application/json"})
+
+    assert key.startswith("classify:POST:")
+    assert key == make_key(
+        "/classify/", "POST", b"[1]", "a=1", {"Accept": "application/json"}
+    )
+    assert key != make_key("classify", "POST", b"[2]", "a=1")
+    assert key != make_key("classify", "POST", b"[1]", "a=2")
+    assert key != make_key(
+        "classify", "POST", b"[1]", "a=1", {"Accept": "application/x-npy"}
+    )
+    assert key != make_key("classify", "GET", b"[1]", "a=1")
+
+
+@pytest.mark.parametrize(
+    "cache_control, ttl",
+    [
+        (None, 300),
+        ("max-age=60", 60),
+        ("public, s-maxage=30, max-age=60", 30),
+        ("max-age=3600", 300),
+        ("no-store", 0),
+        ("no-cache", 0),
+        ("private, max-age=60", 0),
+        ("max-age=soon", 0),
+    ],
+)
+def test_response_ttl(cache_control, ttl):
+    assert response_ttl(parse_cache_control(cache_control), 300) == ttl
+
+
+def test_parse_cache_control():
+    assert parse_cache_control('No-Cache, max-age="10"') == {
+        "no-cache": None,
+        "max-age": "10",
+    }
+
+
+def test_local_tier():
+    cache = ResponseCache(LRUCache(10), ttl=300)
+    assert cache.get("k") == (None, None)
+    cache.set("k", response(), 60)
+
+    entry, tier = cache.get("k")
+    assert tier == "local"
+    assert entry.body == b'{"label": 1}'
+    assert cache.counts == {("local", "miss"): 1, ("local", "hit"): 1}
+
+
+def test_shared_tier_is_shared_between_workers():
+    shared = DictStore()
+    worker_a = ResponseCache(LRUCache(10), shared, ttl=300)
+    worker_b = ResponseCache(LRUCache(10), shared, ttl=300)
+    worker_a.set("k", response(), 60)
+    assert shared.entries["k"][1] == 60
+
+    entry, tier = worker_b.get("k")
+    assert tier == "shared"
+    assert entry.headers == {"X-Model": "iris"}
+    assert entry.mimetype == "application/json"
+    # now in worker b's local tier, for what is left of its TTL only
+    _, local_expires_at = worker_b.local._entries["k"]
+    assert local_expires_at - worker_b.local.clock() <= 60
+    assert worker_b.get("k")[1] == "local"
+    assert worker_b.counts[("shared", "hit")] == 1
+
+
+def test_expired_shared_entries_are_misses():
+    shared = DictStore()
+    ResponseCache(LRUCache(10), shared).set("k", response(), 60)
+    value, ttl = shared.entries["k"]
+    expired = CachedResponse.from_bytes(value)
+    expired.expires_at -= 120
+    shared.entries["k"] = (expired.to_bytes(), ttl)
+
+    worker = ResponseCache(LRUCache(10), shared)
+    assert worker.get("k") == (None, None)
+    assert worker.counts[("shared", "miss")] == 1
+
+
+def test_shared_tier_errors_are_misses():
+    cache = ResponseCache(LRUCache(10), BrokenStore())
+    cache.set("k", response(), 60)
+    cache.local = LRUCache(10)
+
+    assert cache.get("k") == (None, None)
+    assert cache.counts[("shared", "miss")] == 1
+
+
+def test_render_prometheus():
+    cache = ResponseCache(LRUCache(10), DictStore())
+    cache.get("k")
+
+    assert cache.render_prometheus().splitlines() == [
+        "# TYPE bentoctl_response_cache_requests_total counter",
+        'bentoctl_response_cache_requests_total{tier="local",result="miss"} 1',
+        'bentoctl_response_cache_requests_total{tier="shared",result="miss"} 1',
+    ]
+
+
+def test_unknown_shared_store():
+    with pytest.raises(ValueError):
+        make_shared_store("memcached", "")
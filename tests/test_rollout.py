@@ -0,0 +1,99 @@
+import json
+import sys
+
+import pytest
+
+from bentoctl_azfunctions.__main__ import main
+
+SPEC = {"resource_group": "iris", "acr_name": "irisacr"}
+
+
+@pytest.fixture
+def deployments_file(tmp_path):
+    pytest.importorskip("cerberus")
+    pytest.importorskip("yaml")
+
+    path = tmp_path / "deployments.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"name": "iris-weu", "spec": dict(SPEC, enable_streaming=True)},
+                {"name": "iris-eus", "spec": dict(SPEC, enable_streaming=True)},
+            ]
+        )
+    )
+    return str(path)
+
+
+def test_build_options_are_forwarded(deployments_file, tmp_path, monkeypatch):
+    from bentoctl_azfunctions import rollout
+
+    calls = []
+    monkeypatch.setattr(
+        rollout, "build_all", lambda *args, **kwargs: calls.append(kwargs) or {}
+    )
+    main(
+        [
+            "--output",
+            str(tmp_path / "report.json"),
+            "rollout",
+            deployments_file,
+            "--bento-path",
+            str(tmp_path / "bento"),
+            "--streaming",
+            "--prewarm",
+        ]
+    )
+
+    build_options = calls[0]["build_options"]
+    assert build_options["streaming"] is True
+    assert build_options["prewarm"] is True
+    assert build_options["fast_start"] is False
+
+
+def test_runtime_mismatch_stops_the_rollout(deployments_file, tmp_path):
+    # the specs ask for the v4 runtime, the deployable would be built for v3
+    with pytest.raises(ValueError, match="enable_streaming=True"):
+        main(
+            [
+                "--output",
+                str(tmp_path / "report.json"),
+                "rollout",
+                deployments_file,
+                "--bento-path",
+                str(tmp_path / "bento"),
+            ]
+        )
+
+
+class Stop(Exception):
+    pass
+
+
+@pytest.mark.parametrize(
+    "skus, sized_for", [(["P2v2", "P2v2"], "P2v2"), (["P2v2", "P3v2"], None)]
+)
+def test_host_json_is_sized_for_the_shared_sku(
+    bento_path, tmp_path, monkeypatch, skus, sized_for
+):
+    pytest.importorskip("bentoctl")
+
+    from bentoctl_azfunctions.create_deployable import create_deployable
+    from bentoctl_azfunctions.rollout import build_all
+
+    calls = []
+
+    def fake_create_deployable(*args, **kwargs):
+        calls.append(kwargs)
+        raise Stop()
+
+    module = sys.modules[create_deployable.__module__]
+    monkeypatch.setattr(module, "create_deployable", fake_create_deployable)
+    deployments = [
+        {"name": f"iris-{i}", "spec": dict(SPEC, premium_plan_sku=sku)}
+        for i, sku in enumerate(skus)
+    ]
+    with pytest.raises(Stop):
+        build_all(bento_path, str(tmp_path / "out"), deployments)
+
+    assert calls[0].get("premium_plan_sku") == sized_for
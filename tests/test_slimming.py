@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from bentoctl_azfunctions.deployable_sync import sync_tree
+from bentoctl_azfunctions.slimming import make_exclude_filter, read_ignore_file
+
+
+@pytest.mark.parametrize(
+    "rel_path, excluded",
+    [
+        ("src/__pycache__/service.cpython-38.pyc", True),
+        ("src/service.pyc", True),
+        ("src/.ipynb_checkpoints/notebook.ipynb", True),
+        ("src/service.py", False),
+        # packages the service imports keep their tests
+        ("src/mypkg/tests/fixtures.py", False),
+        ("tests/test_service.py", False),
+    ],
+)
+def test_default_excludes(rel_path, excluded):
+    assert make_exclude_filter([])(rel_path) is excluded
+
+
+@pytest.mark.parametrize(
+    "pattern, rel_path, excluded",
+    [
+        # without a slash, any path component
+        ("*.ckpt", "models/clf/v1/epoch-1.ckpt", True),
+        ("notebooks/", "src/notebooks/eda.ipynb", True),
+        # a trailing slash only matches directories
+        ("notebooks/", "src/notebooks", False),
+        # a leading slash anchors to the bento root
+        ("/tests/", "tests/test_service.py", True),
+        ("/tests/", "src/mypkg/tests/fixtures.py", False),
+        # so does a slash inside
+        ("src/tests/", "src/tests/test_service.py", True),
+        ("src/tests/", "src/mypkg/tests/fixtures.py", False),
+        ("src/*.md", "src/README.md", True),
+        ("src/*.md", "README.md", False),
+    ],
+)
+def test_ignore_patterns(pattern, rel_path, excluded):
+    assert make_exclude_filter([pattern])(rel_path) is excluded
+
+
+def test_ignore_file_drives_the_sync(bento_path, tmp_path):
+    test_file = os.path.join(bento_path, "src", "mypkg", "tests", "fixtures.py")
+    os.makedirs(os.path.dirname(test_file))
+    with open(test_file, "w") as f:
+        f.write("FIXTURE = 1\n")
+    with open(os.path.join(bento_path, ".bentoctlignore"), "w") as f:
+        f.write("# not needed at runtime\n\n/README.md\nmodels/\n")
+
+    patterns = read_ignore_file(bento_path)
+    assert patterns == ["/README.md", "models/"]
+
+    deployable_path = str(tmp_path / "deployable")
+    sync_tree(bento_path, deployable_path, exclude=make_exclude_filter(patterns))
+    assert os.path.exists(os.path.join(deployable_path, "src", "service.py"))
+    assert os.path.exists(
+        os.path.join(deployable_path, "src", "mypkg", "tests", "fixtures.py")
+    )
+    assert not os.path.exists(os.path.join(deployable_path, "README.md"))
+    assert not os.path.exists(os.path.join(deployable_path, "models"))